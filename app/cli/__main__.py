@@ -0,0 +1,257 @@
+"""Comandos de administracion, se ejecutan con ``python -m app.cli``"""
+import argparse
+import datetime as _dt
+import sys
+from contextlib import ExitStack
+
+from app.cli import roster, tombstones, uuids
+from app.config.db import get_engine
+from app.config.indexes import apply_indexes, check_query_plans
+from app.config.migrations import migrate as apply_migrations
+from app.config.settings import settings
+from app.crud.comercio import reconcile_counters, select_counter_drift
+
+
+def migrate(args: argparse.Namespace) -> int:
+    """Aplica las migraciones pendientes, se corre una vez por despliegue"""
+    migrations = apply_migrations(get_engine())
+    for migration in migrations:
+        print(f"Migracion aplicada: {migration.version} {migration.name}")
+    if not migrations:
+        print("La base de datos ya esta actualizada")
+    return 0
+
+
+def indexes(args: argparse.Namespace) -> int:
+    """Crea los indices que falten en la DB configurada"""
+    with get_engine().begin() as connection:
+        created = apply_indexes(connection)
+    for name in created:
+        print(f"Indice creado: {name}")
+    if not created:
+        print("Todos los indices ya existen")
+    return 0
+
+
+def explain(args: argparse.Namespace) -> int:
+    """Falla si alguna consulta frecuente recorre toda una tabla"""
+    try:
+        scans = check_query_plans(get_engine())
+    except NotImplementedError as error:
+        print(f"No se pueden revisar los planes de ejecucion: {error}")
+        return 2
+    for name, plan in scans.items():
+        print(f"{name}: {' / '.join(plan)}")
+    if scans:
+        print("Hay consultas sin indice, ejecuta: python -m app.cli indexes")
+        return 1
+    print("Todas las consultas usan un indice")
+    return 0
+
+
+def _comercio_id(value: str) -> int:
+    with get_engine().connect() as connection:
+        comercio_id = roster.find_comercio(connection, value)
+    if comercio_id is None:
+        raise SystemExit(f"No existe el comercio {value}")
+    return comercio_id
+
+
+def reconcile(args: argparse.Namespace) -> int:
+    """Recalcula los contadores de empleados de los comercios"""
+    comercio_id = _comercio_id(args.comercio) if args.comercio else None
+    with get_engine().begin() as connection:
+        drift = connection.execute(select_counter_drift(comercio_id)).all()
+        connection.execute(reconcile_counters(comercio_id))
+    for row in drift:
+        print(
+            f"Comercio {row.id}: total {row.empleados_total} -> {row.total}, "
+            f"activos {row.empleados_activos} -> {row.activos}"
+        )
+    if not drift:
+        print("Todos los contadores estaban correctos")
+    return 0
+
+
+def compact(args: argparse.Namespace) -> int:
+    """Remueve los borrados de empleados mas viejos que --days"""
+    before = _dt.datetime.utcnow() - _dt.timedelta(days=args.days)
+    removed = tombstones.compact_tombstones(
+        get_engine(), before, args.batch_size
+    )
+    print(f"Borrados compactados: {removed}")
+    return 0
+
+
+def uuid_migrate(args: argparse.Namespace) -> int:
+    """Convierte los uuid guardados a BINARY(16) o a CHAR(32) por lotes"""
+    engine = get_engine()
+    if engine.dialect.name != "sqlite":
+        print("Solo aplica a SQLite, PostgreSQL usa el tipo uuid nativo")
+        return 1
+    binary = args.to == "binary"
+    # Sin DAPP_UUID_MIXED las busquedas solo usan un formato y no
+    # encontrarian las filas que ya se convirtieron
+    if not settings.uuid_mixed:
+        print(
+            "Se debe correr con DAPP_UUID_MIXED=1, igual que la aplicacion, "
+            "mientras se convierten los uuid",
+            file=sys.stderr,
+        )
+        return 1
+    if binary != settings.uuid_binary:
+        print(
+            f"La aplicacion debe correr con DAPP_UUID_BINARY={int(binary)} "
+            "para guardar los uuid nuevos en el formato de la conversion",
+            file=sys.stderr,
+        )
+    for uuid_column in uuids.UUID_COLUMNS:
+        name = f"{uuid_column.table.name}.{uuid_column.name}"
+        progress = roster.Progress(name, args.report_every)
+        uuids.convert_column(
+            engine,
+            uuid_column,
+            binary,
+            batch_size=args.batch_size,
+            pause=args.pause,
+            progress=progress,
+        )
+        progress.report()
+    if binary:
+        print(
+            "El archivo no se reduce hasta correr VACUUM, que bloquea la DB "
+            "mientras se ejecuta",
+            file=sys.stderr,
+        )
+    return 0
+
+
+def _open(stack: ExitStack, path: str, mode: str):
+    """Abre ``path``, ``-`` es la entrada o salida estandar"""
+    if path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    return stack.enter_context(open(path, mode, newline="", encoding="utf-8"))
+
+
+def export(args: argparse.Namespace) -> int:
+    """Exporta los empleados de un comercio a CSV o NDJSON"""
+    fmt = args.format or roster.guess_format(args.output)
+    comercio_id = _comercio_id(args.comercio)
+    progress = roster.Progress("Exportados", args.report_every)
+    with ExitStack() as stack:
+        output = _open(stack, args.output, "w")
+        roster.export_empleados(
+            get_engine(), comercio_id, output, fmt, args.batch_size, progress
+        )
+    progress.report()
+    return 0
+
+
+def import_(args: argparse.Namespace) -> int:
+    """Importa empleados a un comercio desde CSV o NDJSON"""
+    fmt = args.format or roster.guess_format(args.input)
+    comercio_id = _comercio_id(args.comercio)
+    progress = roster.Progress("Importados", args.report_every)
+    with ExitStack() as stack:
+        source = _open(stack, args.input, "r")
+        rejects = roster.RejectWriter(
+            _open(stack, args.rejects, "w") if args.rejects else None, fmt
+        )
+        result = roster.import_empleados(
+            get_engine(),
+            comercio_id,
+            roster.read_rows(source, fmt),
+            rejects,
+            batch_size=args.batch_size,
+            commit_every=args.commit_every,
+            upsert=args.upsert,
+            progress=progress,
+        )
+    progress.report()
+    print(
+        f"Insertados: {result.inserted}, editados: {result.updated}, "
+        f"rechazados: {result.rejected}",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command in (migrate, indexes, explain):
+        commands.add_parser(
+            command.__name__, help=command.__doc__
+        ).set_defaults(func=command)
+
+    reconcile_parser = commands.add_parser("reconcile", help=reconcile.__doc__)
+    reconcile_parser.set_defaults(func=reconcile)
+    reconcile_parser.add_argument(
+        "--comercio", help="id o api_key del comercio, por defecto todos"
+    )
+
+    compact_parser = commands.add_parser("compact", help=compact.__doc__)
+    compact_parser.set_defaults(func=compact)
+    compact_parser.add_argument(
+        "--days",
+        type=float,
+        default=settings.tombstone_retention_days,
+        help="por defecto DAPP_TOMBSTONE_RETENTION_DAYS",
+    )
+    compact_parser.add_argument("--batch-size", type=int, default=1000)
+
+    uuid_parser = commands.add_parser(
+        "uuid-migrate", help=uuid_migrate.__doc__
+    )
+    uuid_parser.set_defaults(func=uuid_migrate)
+    uuid_parser.add_argument(
+        "--to",
+        choices=("binary", "text"),
+        default="binary" if settings.uuid_binary else "text",
+        help="por defecto segun DAPP_UUID_BINARY",
+    )
+    uuid_parser.add_argument("--batch-size", type=int, default=1000)
+    uuid_parser.add_argument(
+        "--pause", type=float, default=0, help="segundos entre lotes"
+    )
+    uuid_parser.add_argument("--report-every", type=int, default=100000)
+
+    files = {}
+    for command, name, path in (
+        (export, "export", "--output"),
+        (import_, "import", "--input"),
+    ):
+        files[name] = commands.add_parser(name, help=command.__doc__)
+        files[name].set_defaults(func=command)
+        files[name].add_argument(
+            "--comercio", required=True, help="id o api_key del comercio"
+        )
+        files[name].add_argument(
+            path, default="-", help="archivo, - es stdin/stdout"
+        )
+        files[name].add_argument(
+            "--format",
+            choices=roster.FORMATS,
+            help="por defecto segun la extension del archivo",
+        )
+        files[name].add_argument("--batch-size", type=int, default=500)
+        files[name].add_argument("--report-every", type=int, default=10000)
+
+    files["import"].add_argument(
+        "--commit-every", type=int, default=5000, help="filas por transaccion"
+    )
+    files["import"].add_argument(
+        "--rejects", help="archivo para las filas rechazadas con su error"
+    )
+    files["import"].add_argument(
+        "--upsert",
+        action="store_true",
+        help="edita los empleados que ya existen con el mismo uuid",
+    )
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
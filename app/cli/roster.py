@@ -0,0 +1,344 @@
+"""Exportacion e importacion de los empleados de un comercio
+
+Se leen y escriben los archivos fila por fila y se consulta la DB por
+lotes, por lo que la memoria no depende del numero de empleados. Se usa
+SQLAlchemy Core en lugar de una Session para no acumular objetos en el
+identity map.
+"""
+import csv
+import datetime as _dt
+import json
+import sys
+import time
+import uuid as _uuid
+from typing import IO, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.config.exceptions import DuplicatedPinError
+from app.crud.comercio import bump_roster_version
+from app.crud.empleado import select_empleados, select_pin_owners
+from app.models.comercio import Comercio
+from app.models.empleado import Empleado
+from app.schemas.empleado import DATETIME_FORMAT, format_datetime
+
+FORMATS = ("csv", "ndjson")
+FIELDS = ("uuid", "nombre", "apellidos", "pin", "fecha_creacion", "activo")
+INCOMPLETE_DATA = "Incomplete data"
+DUPLICATED_ID = "Duplicated id"
+
+# Longitud maxima de cada columna de texto en main_empleado
+_MAX_LENGTHS = {
+    name: Empleado.__table__.c[name].type.length
+    for name in ("nombre", "apellidos", "pin")
+}
+_FALSE = {"0", "false", "f", "no", ""}
+
+
+class ImportResult(NamedTuple):
+    inserted: int
+    updated: int
+    rejected: int
+    seconds: float
+
+
+def find_comercio(connection: Connection, comercio: str) -> Optional[int]:
+    """Id del comercio por id o por api_key"""
+    if comercio.isdigit():
+        condition = Comercio.id == int(comercio)
+    else:
+        try:
+            condition = Comercio.api_key == _uuid.UUID(comercio)
+        except ValueError:
+            return None
+    return connection.execute(select(Comercio.id).where(condition)).scalar()
+
+
+def guess_format(path: str, default: str = "csv") -> str:
+    return "ndjson" if path.endswith((".ndjson", ".jsonl")) else default
+
+
+class Progress:
+    """Reporta filas por segundo en ``stream`` cada ``every`` filas"""
+
+    def __init__(self, label: str, every: int, stream: IO = sys.stderr):
+        self.label = label
+        self.every = every
+        self.stream = stream
+        self.rows = 0
+        self.start = time.perf_counter()
+        self._next = every
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.start
+
+    def report(self):
+        rate = self.rows / self.seconds if self.seconds else 0
+        print(
+            f"{self.label}: {self.rows} filas, {rate:.0f} filas/s",
+            file=self.stream,
+        )
+
+    def add(self, rows: int = 1):
+        self.rows += rows
+        if self.every and self.rows >= self._next:
+            self._next += self.every
+            self.report()
+
+
+# Exportacion
+
+
+def _export_row(empleado) -> dict:
+    return {
+        "uuid": str(empleado.uuid),
+        "nombre": empleado.nombre,
+        "apellidos": empleado.apellidos,
+        "pin": empleado.pin,
+        "fecha_creacion": format_datetime(empleado.fecha_creacion),
+        "activo": empleado.activo,
+    }
+
+
+def iter_empleados(
+    connection: Connection, comercio_id: int, batch_size: int
+) -> Iterator[dict]:
+    """Empleados del comercio leidos con un cursor del lado del servidor"""
+    result = connection.execution_options(
+        stream_results=True, max_row_buffer=batch_size
+    ).execute(select_empleados(comercio_id))
+    for rows in result.partitions(batch_size):
+        for empleado in rows:
+            yield _export_row(empleado)
+
+
+def write_rows(rows: Iterable[dict], output: IO, fmt: str) -> Iterator[dict]:
+    """Escribe cada fila en ``output`` y la vuelve a regresar"""
+    if fmt == "csv":
+        writer = csv.DictWriter(output, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, "activo": int(row["activo"])})
+            yield row
+    else:
+        for row in rows:
+            output.write(json.dumps(row, ensure_ascii=False) + "\n")
+            yield row
+
+
+def export_empleados(
+    engine: Engine,
+    comercio_id: int,
+    output: IO,
+    fmt: str = "csv",
+    batch_size: int = 1000,
+    progress: Optional[Progress] = None,
+) -> int:
+    """Escribe los empleados del comercio en ``output``, regresa cuantos"""
+    progress = progress or Progress("Exportados", 0)
+    with engine.connect() as connection:
+        rows = iter_empleados(connection, comercio_id, batch_size)
+        for _ in write_rows(rows, output, fmt):
+            progress.add()
+    return progress.rows
+
+
+# Importacion
+
+
+def read_rows(source: IO, fmt: str) -> Iterator[dict]:
+    if fmt == "csv":
+        yield from csv.DictReader(source)
+    else:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+class RejectWriter:
+    """Escribe las filas rechazadas con la razon en la columna ``error``"""
+
+    def __init__(self, output: Optional[IO], fmt: str):
+        self.output = output
+        self.fmt = fmt
+        self.count = 0
+        self._writer = None
+
+    def write(self, row: dict, error: str):
+        self.count += 1
+        if self.output is None:
+            return
+        row = {**row, "error": error}
+        if self.fmt == "ndjson":
+            self.output.write(json.dumps(row, ensure_ascii=False) + "\n")
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(
+                self.output, fieldnames=list(row), extrasaction="ignore"
+            )
+            self._writer.writeheader()
+        self._writer.writerow(row)
+
+
+def _parse_activo(value) -> bool:
+    if isinstance(value, bool) or value is None:
+        return value is not False
+    return str(value).strip().lower() not in _FALSE
+
+
+def _parse_row(row: dict, now: _dt.datetime) -> Optional[dict]:
+    """Valores para main_empleado, None si faltan datos o son invalidos"""
+    values = {}
+    for name, length in _MAX_LENGTHS.items():
+        value = (row.get(name) or "").strip()
+        if not value or len(value) > length:
+            return None
+        values[name] = value
+    try:
+        values["uuid"] = (
+            _uuid.UUID(row["uuid"]) if row.get("uuid") else _uuid.uuid4()
+        )
+        values["fecha_creacion"] = (
+            _dt.datetime.strptime(row["fecha_creacion"], DATETIME_FORMAT)
+            if row.get("fecha_creacion")
+            else now
+        )
+    except (TypeError, ValueError):
+        return None
+    values["activo"] = _parse_activo(row.get("activo"))
+    return values
+
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Las columnas del SET salen de las llaves de los parametros. Se busca por
+# id porque con DAPP_UUID_MIXED el uuid guardado puede estar en el otro
+# formato
+_update_statement = update(Empleado.__table__).where(
+    Empleado.__table__.c.id == bindparam("b_id"),
+)
+
+
+def _import_batch(
+    connection: Connection,
+    comercio_id: int,
+    batch: List[dict],
+    rejects: RejectWriter,
+    upsert: bool,
+    now: _dt.datetime,
+) -> Dict[str, int]:
+    parsed = []
+    for row in batch:
+        values = _parse_row(row, now)
+        if values is None:
+            rejects.write(row, INCOMPLETE_DATA)
+        else:
+            parsed.append((row, values))
+
+    # Dueno actual de cada PIN del lote, se incluyen las filas de los
+    # lotes anteriores porque ya se insertaron en la misma transaccion
+    pins = list({values["pin"] for _, values in parsed})
+    owners = dict(
+        (pin, uuid)
+        for uuid, pin in connection.execute(
+            select_pin_owners(comercio_id, pins)
+        )
+    )
+    uuids = [values["uuid"] for _, values in parsed]
+    existing = dict(
+        connection.execute(
+            select(Empleado.uuid, Empleado.id).where(
+                Empleado.comercio_id == comercio_id, Empleado.uuid.in_(uuids)
+            )
+        ).all()
+    )
+
+    inserts: List[dict] = []
+    updates: List[dict] = []
+    seen = set()
+    for row, values in parsed:
+        uuid, pin = values["uuid"], values["pin"]
+        owner = owners.get(pin)
+        if uuid in seen or (uuid in existing and not upsert):
+            rejects.write(row, DUPLICATED_ID)
+            continue
+        if owner is not None and owner != uuid:
+            rejects.write(row, DuplicatedPinError.msg)
+            continue
+        if uuid in existing:
+            updates.append(
+                {
+                    "b_id": existing[uuid],
+                    "nombre": values["nombre"],
+                    "apellidos": values["apellidos"],
+                    "pin": pin,
+                    "activo": values["activo"],
+                }
+            )
+        else:
+            inserts.append({**values, "comercio_id": comercio_id})
+        seen.add(uuid)
+        owners[pin] = uuid
+
+    if inserts:
+        connection.execute(insert(Empleado.__table__), inserts)
+    if updates:
+        connection.execute(_update_statement, updates)
+    return {"inserted": len(inserts), "updated": len(updates)}
+
+
+def import_empleados(
+    engine: Engine,
+    comercio_id: int,
+    rows: Iterable[dict],
+    rejects: RejectWriter,
+    batch_size: int = 500,
+    commit_every: int = 5000,
+    upsert: bool = False,
+    progress: Optional[Progress] = None,
+) -> ImportResult:
+    """Inserta los empleados de ``rows`` en el comercio
+
+    Se hace commit cada ``commit_every`` filas, cada commit aumenta la
+    version de empleados del comercio. Un PIN que ya usa otro empleado (en
+    la DB o antes en el archivo) se manda a ``rejects``. Con ``upsert`` las
+    filas con el uuid de un empleado existente lo editan.
+    """
+    progress = progress or Progress("Importados", 0)
+    now = _dt.datetime.utcnow()
+    totals = {"inserted": 0, "updated": 0}
+    pending = 0
+    # Si hay un error se cierra la conexion y se revierte solo el ultimo
+    # bloque de ``commit_every`` filas
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        for batch in _batches(rows, batch_size):
+            counts = _import_batch(
+                connection, comercio_id, batch, rejects, upsert, now
+            )
+            for key, count in counts.items():
+                totals[key] += count
+            pending += len(batch)
+            if pending >= commit_every:
+                connection.execute(bump_roster_version(comercio_id))
+                transaction.commit()
+                transaction = connection.begin()
+                pending = 0
+            progress.add(len(batch))
+        if pending:
+            connection.execute(bump_roster_version(comercio_id))
+        transaction.commit()
+    return ImportResult(
+        totals["inserted"], totals["updated"], rejects.count, progress.seconds
+    )
@@ -0,0 +1,37 @@
+"""Compactacion de los borrados de ``GET /empleados/changes``
+
+Se remueven por lotes en transacciones cortas, igual que ``uuid-migrate``,
+y en la misma transaccion se guarda en ``tombstones_purged_seq`` hasta
+donde se compacto cada comercio para rechazar los cursores anteriores.
+"""
+import datetime as _dt
+from typing import Dict
+
+from sqlalchemy.engine import Engine
+
+from app.crud.comercio import raise_purged_seq
+from app.crud.empleado import delete_tombstones, select_expired_tombstones
+
+
+def compact_tombstones(
+    engine: Engine, before: _dt.datetime, batch_size: int = 1000
+) -> int:
+    """Remueve los borrados anteriores a ``before``, regresa cuantos"""
+    removed = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select_expired_tombstones(before, batch_size)
+            ).all()
+            if not rows:
+                break
+            purged: Dict[int, int] = {}
+            for row in rows:
+                purged[row.comercio_id] = max(
+                    purged.get(row.comercio_id, 0), row.change_seq
+                )
+            for comercio_id, change_seq in purged.items():
+                connection.execute(raise_purged_seq(comercio_id, change_seq))
+            connection.execute(delete_tombstones([row.id for row in rows]))
+        removed += len(rows)
+    return removed
@@ -0,0 +1,121 @@
+"""Conversion de los uuid guardados entre CHAR(32) y BINARY(16)
+
+SQLite permite guardar texto y blobs en la misma columna, por lo que las
+filas se reescriben en su lugar sin reconstruir las tablas. Cada lote es
+una transaccion corta que solo bloquea la escritura mientras se actualizan
+``batch_size`` filas, y las filas que ya tienen el formato nuevo se omiten,
+por lo que se puede interrumpir y volver a correr. Ver ``app.models.types``
+para el orden del despliegue.
+"""
+import time
+import uuid as _uuid
+from typing import Optional, Union
+
+from sqlalchemy import bindparam, column, func, select, table, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import Column
+
+from app.cli.roster import Progress
+from app.models.comercio import Comercio
+from app.models.empleado import Empleado
+from app.models.tombstone import EmpleadoTombstone
+
+UUID_COLUMNS = (
+    Comercio.__table__.c.uuid,
+    Comercio.__table__.c.api_key,
+    Empleado.__table__.c.uuid,
+    EmpleadoTombstone.__table__.c.uuid,
+)
+
+
+def _raw_table(uuid_column: Column):
+    """La tabla con columnas sin tipo para leer y escribir los valores tal
+    como estan guardados
+    """
+    return table(
+        uuid_column.table.name, column("id"), column(uuid_column.name)
+    )
+
+
+def _stored_as(binary: bool) -> str:
+    """Resultado de ``typeof()`` de las filas que faltan por convertir"""
+    return "text" if binary else "blob"
+
+
+def convert_value(value: Union[str, bytes], binary: bool) -> Union[str, bytes]:
+    if isinstance(value, bytes):
+        value = _uuid.UUID(bytes=value)
+    else:
+        value = _uuid.UUID(value)
+    return value.bytes if binary else value.hex
+
+
+def count_pending(
+    connection: Connection, uuid_column: Column, binary: bool
+) -> int:
+    """Filas de la columna que siguen en el otro formato"""
+    raw = _raw_table(uuid_column)
+    return connection.execute(
+        select(func.count()).where(
+            func.typeof(raw.c[uuid_column.name]) == _stored_as(binary)
+        )
+    ).scalar()
+
+
+def convert_column(
+    engine: Engine,
+    uuid_column: Column,
+    binary: bool,
+    batch_size: int = 1000,
+    pause: float = 0,
+    progress: Optional[Progress] = None,
+) -> int:
+    """Reescribe la columna en el formato indicado por lotes ordenados por
+    id, regresa las filas convertidas
+
+    ``pause`` son los segundos entre lotes para dejar pasar las escrituras
+    de la aplicacion.
+    """
+    progress = progress or Progress("Convertidos", 0)
+    raw = _raw_table(uuid_column)
+    value = raw.c[uuid_column.name]
+    pending = (
+        select(raw.c.id, value)
+        .where(
+            raw.c.id > bindparam("after"),
+            func.typeof(value) == _stored_as(binary),
+        )
+        .order_by(raw.c.id)
+        .limit(batch_size)
+    )
+    # Solo se cambia la fila si nadie la modifico desde que se leyo
+    rewrite = (
+        update(raw)
+        .where(raw.c.id == bindparam("b_id"), value == bindparam("b_old"))
+        .values({uuid_column.name: bindparam("b_new")})
+    )
+
+    converted = 0
+    after = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(pending, {"after": after}).all()
+            if not rows:
+                break
+            connection.execute(
+                rewrite,
+                [
+                    {
+                        "b_id": row_id,
+                        "b_old": old,
+                        "b_new": convert_value(old, binary),
+                    }
+                    for row_id, old in rows
+                ],
+            )
+        after = rows[-1][0]
+        converted += len(rows)
+        progress.add(len(rows))
+        if pause:
+            time.sleep(pause)
+    return converted
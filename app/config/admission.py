@@ -0,0 +1,215 @@
+"""Control de admision de las rutas de empleados
+
+Se aplica como dependencia del router despues de ``get_auth``, antes de
+que la ruta ocupe un hilo del threadpool o una conexion a la DB:
+
+1. Token bucket por comercio, al excederlo se regresa 429.
+2. Peticiones simultaneas por comercio, incluye las que estan en la cola,
+   al excederlo tambien se regresa 429.
+3. Peticiones simultaneas de todos los comercios, las demas esperan en una
+   cola acotada. Si la cola esta llena o se espera mas de
+   ``queue_timeout`` se regresa 503.
+
+Los rechazos usan los errores de ``app.config.exceptions`` para responder
+con el formato ``{"rc", "msg"}``. El estado es del proceso y solo se
+modifica desde el event loop, las rutas sync no lo tocan.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, Iterable, Tuple
+
+from fastapi import Depends
+
+from app.config.authentication import get_auth, get_auth_async
+from app.config.exceptions import ServiceOverloadedError, TooManyRequestsError
+from app.config.metrics import Counter, Gauge, registry
+from app.config.settings import settings
+from app.schemas.comercio import ComercioSchema
+
+SHED_REASONS = ("rate", "concurrency", "queue_full", "queue_timeout")
+
+shed_requests = registry.register(
+    Counter(
+        "dapp_admission_shed_total",
+        "Peticiones rechazadas por el control de admision",
+        ("reason",),
+    )
+)
+
+
+class TokenBucket:
+    """``rate`` tokens por segundo hasta un maximo de ``burst``"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Toma un token, regresa 0 o los segundos que faltan para uno"""
+        elapsed = now - self.updated
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_concurrency: int,
+        max_inflight: int,
+        max_queue: int,
+        queue_timeout: float,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._timer = timer
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._active: Dict[int, int] = {}
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.inflight = 0
+        self.shed: Dict[str, int] = dict.fromkeys(SHED_REASONS, 0)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _shed(self, reason: str):
+        self.shed[reason] += 1
+        shed_requests.inc(reason)
+
+    def _check_rate(self, comercio_id: int):
+        if not self.rate:
+            return
+        now = self._timer()
+        bucket = self._buckets.get(comercio_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst, now)
+            self._buckets[comercio_id] = bucket
+        wait = bucket.take(now)
+        if wait:
+            self._shed("rate")
+            raise TooManyRequestsError(wait)
+
+    async def _acquire_slot(self):
+        if not self.max_inflight or (
+            self.inflight < self.max_inflight and not self._waiters
+        ):
+            self.inflight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._shed("queue_full")
+            raise ServiceOverloadedError()
+
+        # ``_release_slot`` pasa el lugar al primero de la cola sin
+        # decrementar ``inflight``
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except BaseException as exc:
+            if future.done() and not future.cancelled():
+                # Se asigno el lugar al mismo tiempo que se cancelo
+                self._release_slot()
+            elif future in self._waiters:
+                self._waiters.remove(future)
+            if isinstance(exc, asyncio.TimeoutError):
+                self._shed("queue_timeout")
+                raise ServiceOverloadedError() from None
+            raise
+
+    def _release_slot(self):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.inflight -= 1
+
+    async def acquire(self, comercio_id: int):
+        """Espera un lugar para la peticion o lanza el error del rechazo,
+        si no hay error se debe llamar ``release`` al terminar
+        """
+        self._check_rate(comercio_id)
+        active = self._active.get(comercio_id, 0)
+        if self.max_concurrency and active >= self.max_concurrency:
+            self._shed("concurrency")
+            raise TooManyRequestsError()
+        self._active[comercio_id] = active + 1
+        try:
+            await self._acquire_slot()
+        except BaseException:
+            self._release_comercio(comercio_id)
+            raise
+
+    def _release_comercio(self, comercio_id: int):
+        active = self._active[comercio_id] - 1
+        if active:
+            self._active[comercio_id] = active
+        else:
+            del self._active[comercio_id]
+
+    def release(self, comercio_id: int):
+        self._release_slot()
+        self._release_comercio(comercio_id)
+
+    def gauges(self) -> Iterable[Tuple[Tuple[str], float]]:
+        yield ("inflight",), self.inflight
+        yield ("queued",), self.queued
+        yield ("comercios_active",), len(self._active)
+
+
+admission = AdmissionController(
+    rate=settings.admission_rate,
+    burst=settings.admission_burst,
+    max_concurrency=settings.admission_max_concurrency,
+    max_inflight=settings.admission_max_inflight,
+    max_queue=settings.admission_max_queue,
+    queue_timeout=settings.admission_queue_timeout,
+)
+registry.register(
+    Gauge(
+        "dapp_admission",
+        "Peticiones en curso y en la cola del control de admision",
+        ("stat",),
+        admission.gauges,
+    )
+)
+
+
+async def admit(
+    comercio: ComercioSchema = Depends(get_auth),
+) -> AsyncIterator[None]:
+    """Dependencia de las rutas de empleados, el lugar se libera hasta que
+    se envia la respuesta, incluyendo el streaming
+    """
+    await admission.acquire(comercio.id)
+    try:
+        yield
+    finally:
+        admission.release(comercio.id)
+
+
+async def admit_async(
+    comercio: ComercioSchema = Depends(get_auth_async),
+) -> AsyncIterator[None]:
+    """Version de ``admit`` para las rutas async"""
+    await admission.acquire(comercio.id)
+    try:
+        yield
+    finally:
+        admission.release(comercio.id)
@@ -1,24 +1,73 @@
-from typing import Union
+from typing import Any, Union
 from uuid import UUID
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from sqlalchemy.exc import StatementError
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.config.db import get_db
+from app.config.cache import MISSING, TTLCache
+from app.config.db import (
+    get_async_db,
+    get_async_replica_db,
+    get_db,
+    get_replica_db,
+    wrote_recently,
+)
+from app.config.metrics import register_cache
 from app.models.comercio import Comercio
+from app.schemas.comercio import ComercioSchema
 
 security = HTTPBasic(auto_error=False)
 
+# Cache api_key -> ComercioSchema, las llaves desconocidas se guardan como
+# None por un tiempo corto para que los intentos de fuerza bruta no lleguen
+# a la DB
+AUTH_CACHE_MAXSIZE = 10_000
+AUTH_CACHE_TTL = 60
+AUTH_CACHE_NEGATIVE_TTL = 5
 
-def get_auth(
-    credentials: HTTPBasicCredentials = Depends(security),
-    db: Session = Depends(get_db),
-) -> Comercio:
-    """Funcion de authentication, se usa el username para recibir el api_key
-    El api key se debe enviar como un uuid.hex para que se haga la convercion
+auth_cache = TTLCache(maxsize=AUTH_CACHE_MAXSIZE, ttl=AUTH_CACHE_TTL)
+register_cache("auth", auth_cache.stats)
+
+
+def invalidate_comercio(*api_keys: UUID) -> None:
+    """Remueve del cache de authentication los api_key indicados
+
+    Se debe llamar cuando un comercio se desactiva o se rota su api_key
+    con un UPDATE masivo, ya que esos no disparan los eventos del ORM.
     """
+    for api_key in api_keys:
+        auth_cache.pop(api_key)
+
+
+@event.listens_for(Comercio, "after_update")
+@event.listens_for(Comercio, "after_delete")
+def _invalidate_on_change(mapper, connection, target: Comercio):
+    """Invalida el api_key actual y el anterior en caso de rotacion"""
+    history = inspect(target).attrs.api_key.history
+    api_keys = {target.api_key, *history.deleted}
+    invalidate_comercio(*(key for key in api_keys if key is not None))
+
+    # Se vuelve a invalidar al hacer commit, para que una peticion
+    # concurrente no deje en cache los datos anteriores
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault("auth_cache_invalidate", set()).update(
+            api_keys
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session):
+    api_keys = session.info.pop("auth_cache_invalidate", None)
+    if api_keys:
+        invalidate_comercio(*(key for key in api_keys if key is not None))
+
+
+def _get_api_key(credentials: Union[HTTPBasicCredentials, None]) -> UUID:
+    """Valida las credenciales y regresa el api_key como UUID"""
 
     # En caso de no enviar la authenticacion se debe sobre escribir para
     # que regrese el mismo codigo de error y mensaje en en la anterior API
@@ -31,20 +80,89 @@ def get_auth(
     # Se convierte el string a un UUID valido
     user_id = credentials.username
     try:
-        api_key = UUID(user_id)
+        return UUID(user_id)
     except ValueError:
         raise HTTPException(
             detail="API Key invalido", status_code=status.HTTP_401_UNAUTHORIZED
         )
 
-    # Se intenta obtener el comercio usando el api_key
-    comercio: Union[Comercio, None] = (
-        db.query(Comercio).filter_by(api_key=api_key).first()
-    )
 
-    if not comercio:
+def _cache_comercio(
+    api_key: UUID, comercio_from_db: Union[Comercio, None]
+) -> ComercioSchema:
+    """Guarda en cache una copia desligada de la sesion del comercio, o
+    None por un tiempo corto si no existe
+    """
+    if not comercio_from_db:
+        auth_cache.set(api_key, None, ttl=AUTH_CACHE_NEGATIVE_TTL)
         raise HTTPException(
             detail="API Key invalida", status_code=status.HTTP_401_UNAUTHORIZED
         )
 
+    comercio = ComercioSchema.from_orm(comercio_from_db)
+    auth_cache.set(api_key, comercio)
+    return comercio
+
+
+def _get_cached_comercio(api_key: UUID) -> Any:
+    comercio: Union[ComercioSchema, None] = auth_cache.get(api_key, MISSING)
+    if comercio is None:
+        raise HTTPException(
+            detail="API Key invalida", status_code=status.HTTP_401_UNAUTHORIZED
+        )
     return comercio
+
+
+def get_auth(
+    credentials: HTTPBasicCredentials = Depends(security),
+    db: Session = Depends(get_replica_db),
+) -> ComercioSchema:
+    """Funcion de authentication, se usa el username para recibir el api_key
+    El api key se debe enviar como un uuid.hex para que se haga la convercion
+    """
+    api_key = _get_api_key(credentials)
+
+    # Primero se busca en cache, si no existe se obtiene el comercio usando
+    # el api_key
+    comercio = _get_cached_comercio(api_key)
+    if comercio is MISSING:
+        comercio = _cache_comercio(
+            api_key, db.query(Comercio).filter_by(api_key=api_key).first()
+        )
+    return comercio
+
+
+async def get_auth_async(
+    credentials: HTTPBasicCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_replica_db),
+) -> ComercioSchema:
+    """Version async de get_auth, comparte el mismo cache"""
+    api_key = _get_api_key(credentials)
+
+    comercio = _get_cached_comercio(api_key)
+    if comercio is MISSING:
+        result = await db.execute(
+            select(Comercio).filter_by(api_key=api_key).limit(1)
+        )
+        comercio = _cache_comercio(api_key, result.scalars().first())
+    return comercio
+
+
+def get_read_db(
+    comercio: ComercioSchema = Depends(get_auth),
+    db: Session = Depends(get_db),
+    replica: Session = Depends(get_replica_db),
+) -> Session:
+    """Sesion de las rutas de solo lectura, en una replica salvo que el
+    comercio haya escrito hace poco, ver ``db_read_your_writes``
+    """
+    return db if wrote_recently(comercio.id) else replica
+
+
+async def get_async_read_db(
+    comercio: ComercioSchema = Depends(get_auth_async),
+    db: AsyncSession = Depends(get_async_db),
+    replica: AsyncSession = Depends(get_async_replica_db),
+) -> AsyncSession:
+    """Version async de ``get_read_db``"""
+    return db if wrote_recently(comercio.id) else replica
@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+MISSING = object()
+
+
+class TTLCache:
+    """Cache en memoria con expiracion por TTL y desalojo LRU
+
+    Es seguro entre hilos, las rutas sync de FastAPI corren en el threadpool
+    de Starlette. Se puede guardar ``None`` como valor para cache negativo,
+    normalmente con un ``ttl`` mas corto que el de los valores positivos.
+
+    Con ``weigher`` y ``maxweight`` tambien se limita el tamano total, por
+    ejemplo en bytes, desalojando las entradas menos usadas.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        timer: Callable[[], float] = time.monotonic,
+        maxweight: Optional[int] = None,
+        weigher: Callable[[Any], int] = lambda value: 0,
+    ):
+        self.maxsize = maxsize
+        self.maxweight = maxweight
+        self.ttl = ttl
+        self._timer = timer
+        self._weigher = weigher
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.weight = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Regresa el valor guardado o ``default`` si no existe o expiro"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            expires, value = item
+            if expires <= self._timer():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            if value is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Guarda un valor, desalojando el menos usado si se llena"""
+        expires = self._timer() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (expires, value)
+            self.weight += self._weigher(value)
+            while len(self._data) > self.maxsize or (
+                self.maxweight is not None and self.weight > self.maxweight
+            ):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def _remove(self, key: Hashable) -> Any:
+        item = self._data.pop(key, None)
+        if item is None:
+            return None
+        self.weight -= self._weigher(item[1])
+        return item[1]
+
+    def pop(self, key: Hashable) -> Any:
+        with self._lock:
+            return self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores para dimensionar el cache"""
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "weight": self.weight,
+            "hit_ratio": (
+                (self.hits + self.negative_hits) / lookups if lookups else 0
+            ),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
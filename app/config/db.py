@@ -1,21 +1,189 @@
+import itertools
+from functools import lru_cache
+from typing import List
+
+from fastapi import Depends
 from sqlalchemy import create_engine as _ce
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine as _cae
+from sqlalchemy.orm import Session
 from sqlalchemy.orm import declarative_base as _db
 from sqlalchemy.orm import sessionmaker as _ssmaker
 
-engine = _ce(
-    "sqlite:///db.sqlite3",
-    echo=True,
-    connect_args={"check_same_thread": False},
-)
+from app.config.cache import TTLCache
+from app.config.metrics import instrument_engine
+from app.config.settings import Settings, settings
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_url(database_url: str) -> str:
+    """La misma URL con el driver async del backend"""
+    url = make_url(database_url)
+    return str(url.set(drivername=_ASYNC_DRIVERS[url.get_backend_name()]))
+
+
+def get_async_database_url(settings: Settings) -> str:
+    if settings.async_database_url:
+        return settings.async_database_url
+    return async_url(settings.database_url)
+
+
+def engine_options(url: str, settings: Settings) -> dict:
+    """Argumentos de create_engine segun la configuracion y el backend"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    driver = url.get_driver_name()
+    timeout = settings.db_statement_timeout
+
+    options = {
+        "echo": settings.db_echo,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    connect_args = {}
+    if backend == "sqlite":
+        if driver == "pysqlite":
+            connect_args["check_same_thread"] = False
+        if timeout:
+            connect_args["timeout"] = timeout / 1000
+    else:
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+        )
+        if backend == "postgresql" and timeout:
+            if driver == "asyncpg":
+                connect_args["server_settings"] = {
+                    "statement_timeout": str(timeout)
+                }
+            else:
+                connect_args["options"] = f"-c statement_timeout={timeout}"
+
+    options["connect_args"] = connect_args
+    return options
+
 
 Base = _db()
 
-_Session = _ssmaker(bind=engine)
+# Los engines se crean hasta que se usan, importar la aplicacion no abre
+# conexiones ni hace cambios en el esquema, ver ``python -m app.cli migrate``
+_Session = _ssmaker()
+
+# Con expire_on_commit=False se pueden leer los datos despues del commit
+# sin hacer lazy loads, que no estan permitidos con AsyncSession
+_AsyncSession = _ssmaker(class_=AsyncSession, expire_on_commit=False)
+
+# Las sesiones de las replicas se ligan a una al crearse, ver _next_replica
+_ReadSession = _ssmaker()
+_AsyncReadSession = _ssmaker(class_=AsyncSession, expire_on_commit=False)
+_replica_counter = itertools.count()
+
+# Comercios que escribieron en los ultimos ``db_read_your_writes`` segundos
+_recent_writes = TTLCache(maxsize=100_000, ttl=settings.db_read_your_writes)
+
+
+@lru_cache()
+def get_engine() -> Engine:
+    engine = _ce(
+        settings.database_url,
+        **engine_options(settings.database_url, settings),
+    )
+    instrument_engine(engine, "sync")
+    _Session.configure(bind=engine)
+    return engine
 
 
 def get_db():
+    get_engine()
     db = _Session()
     try:
         yield db
     finally:
         db.close()
+
+
+@lru_cache()
+def get_replica_engines() -> List[Engine]:
+    engines = []
+    for number, url in enumerate(settings.database_replica_urls):
+        engine = _ce(url, **engine_options(url, settings))
+        instrument_engine(engine, f"replica{number}")
+        engines.append(engine)
+    return engines
+
+
+def _next_replica(engines: list):
+    """Reparte las sesiones entre las replicas en orden"""
+    return engines[next(_replica_counter) % len(engines)]
+
+
+def mark_written(comercio_id: int) -> None:
+    """Se llama despues del commit de cada escritura del comercio"""
+    if settings.db_read_your_writes:
+        _recent_writes.set(comercio_id, True)
+
+
+def wrote_recently(comercio_id: int) -> bool:
+    return _recent_writes.get(comercio_id, False)
+
+
+def get_replica_db(db: Session = Depends(get_db)):
+    """Sesion en una replica para lecturas que toleran retraso, sin
+    replicas configuradas es la misma sesion de ``get_db``
+
+    Las sesiones no abren una conexion hasta la primera consulta, por lo que
+    crear ambas no cuesta una conexion.
+    """
+    if not settings.database_replica_urls:
+        yield db
+        return
+    replica = _ReadSession(bind=_next_replica(get_replica_engines()))
+    try:
+        yield replica
+    finally:
+        replica.close()
+
+
+@lru_cache()
+def get_async_engine() -> AsyncEngine:
+    """El engine async se crea hasta que se usa, asi aiosqlite solo es
+    necesario cuando se activa el modo async
+    """
+    url = get_async_database_url(settings)
+    async_engine = _cae(url, **engine_options(url, settings))
+    instrument_engine(async_engine.sync_engine, "async")
+    _AsyncSession.configure(bind=async_engine)
+    return async_engine
+
+
+async def get_async_db():
+    get_async_engine()
+    async with _AsyncSession() as db:
+        yield db
+
+
+@lru_cache()
+def get_async_replica_engines() -> List[AsyncEngine]:
+    engines = []
+    for number, url in enumerate(settings.database_replica_urls):
+        url = async_url(url)
+        async_engine = _cae(url, **engine_options(url, settings))
+        instrument_engine(async_engine.sync_engine, f"async_replica{number}")
+        engines.append(async_engine)
+    return engines
+
+
+async def get_async_replica_db(db: AsyncSession = Depends(get_async_db)):
+    """Version async de ``get_replica_db``"""
+    if not settings.database_replica_urls:
+        yield db
+        return
+    bind = _next_replica(get_async_replica_engines())
+    async with _AsyncReadSession(bind=bind) as replica:
+        yield replica
@@ -2,11 +2,13 @@ from fastapi import HTTPException
 from fastapi.responses import JSONResponse
 
 from .exceptions import BaseException
+from .metrics import errors
 
 
 # HANDLER ERRORS
 def http_exception_handler(_, exc: HTTPException):
     """Cambia la salida del error al formato estandar"""
+    errors.inc(str(exc.status_code * -1))
     return JSONResponse(
         status_code=exc.status_code,
         content={
@@ -18,6 +20,7 @@ def http_exception_handler(_, exc: HTTPException):
 
 def validation_exception_handler(_, exc: HTTPException):
     """Cambia la salida del error al formato estandar cuando faltan datos"""
+    errors.inc("-1004")
     return JSONResponse(
         status_code=200,
         content={
@@ -29,6 +32,7 @@ def validation_exception_handler(_, exc: HTTPException):
 
 def exception_handler(_, exc: Exception):
     """Cambia la salida del error al formato estandar cuando faltan datos"""
+    errors.inc("-654")
     return JSONResponse(
         status_code=200,
         content={
@@ -40,7 +44,9 @@ def exception_handler(_, exc: Exception):
 
 def custom_exception_handler(_, exc: BaseException):
     """Manejo de errores personalizado"""
+    errors.inc(str(exc.rc))
     return JSONResponse(
-        status_code=200,
+        status_code=exc.status_code,
         content=exc.to_dict(),
+        headers=exc.headers,
     )
@@ -1,6 +1,13 @@
+import math
+from typing import Dict, Optional
+
+
 class BaseException(Exception):
     rc: int = -1000
     msg: str = "Error"
+    # Los errores se regresan con 200 salvo los del control de admision
+    status_code: int = 200
+    headers: Optional[Dict[str, str]] = None
 
     def to_dict(self) -> dict:
         return {
@@ -22,3 +29,48 @@ class InvalidEmpleadoError(BaseException):
 class DuplicatedPinError(BaseException):
     rc = -1003
     msg = "Duplicated PIN"
+
+
+class InvalidCursorError(BaseException):
+    rc = -1005
+    msg = "Invalid cursor"
+
+
+class InvalidPinError(BaseException):
+    rc = -1006
+    msg = "Invalid PIN"
+
+
+class InactiveEmpleadoError(BaseException):
+    rc = -1007
+    msg = "Inactive employee"
+
+
+class TooManyRequestsError(BaseException):
+    """El comercio excedio su limite de peticiones o de concurrencia"""
+
+    rc = -1008
+    msg = "Too many requests"
+    status_code = 429
+
+    def __init__(self, retry_after: float = 1):
+        super().__init__()
+        self.headers = {"Retry-After": str(max(1, math.ceil(retry_after)))}
+
+
+class ServiceOverloadedError(BaseException):
+    """La cola global de peticiones esta llena"""
+
+    rc = -1009
+    msg = "Service overloaded"
+    status_code = 503
+    headers = {"Retry-After": "1"}
+
+
+class ExpiredCursorError(BaseException):
+    """Ya se compactaron borrados posteriores al cursor de
+    ``GET /empleados/changes``, el cliente debe sincronizar desde cero
+    """
+
+    rc = -1010
+    msg = "Expired cursor"
@@ -0,0 +1,174 @@
+import re
+import uuid as _uuid
+import warnings
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from sqlalchemy import inspect, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import Select
+
+from app.config.db import Base
+from app.crud.empleado import (
+    select_empleado,
+    select_empleado_by_pin,
+    select_empleados,
+)
+from app.models.comercio import Comercio
+from app.models.empleado import Empleado
+
+# SQLite reporta "SCAN main_empleado" (o "SCAN TABLE ..." en versiones
+# anteriores) cuando recorre toda la tabla o todo un indice, PostgreSQL
+# "Seq Scan on main_empleado" en algun nivel del plan
+_SCANS = {
+    "sqlite": re.compile(r"^SCAN (TABLE )?(?P<table>\w+)"),
+    "postgresql": re.compile(r"Seq Scan on (?P<table>\w+)"),
+}
+
+
+def hot_queries() -> Dict[str, Select]:
+    """Consultas de cada peticion que siempre deben usar un indice
+
+    Solo importa el WHERE, por lo que no se seleccionan columnas que
+    podrian no existir en una DB sin migrar.
+    """
+    uuid = _uuid.UUID(int=0)
+    return {
+        "get_auth": select(Comercio.id).filter_by(api_key=uuid).limit(1),
+        "get_empleados": select_empleados(1),
+        "get_empleados_page": select_empleados(1, after_id=1, limit=101),
+        "get_empleado": select_empleado(1, uuid),
+        "bulk_pins": select(Empleado.pin).where(
+            Empleado.comercio_id == 1, Empleado.pin.in_(["000000"])
+        ),
+        "verify_pin": select_empleado_by_pin(1, "000000"),
+        "search_activo": select_empleados(
+            1, limit=101, conditions=[Empleado.activo.is_(False)]
+        ),
+    }
+
+
+@contextmanager
+def _expression_indexes_ignored() -> Iterator[None]:
+    """Los indices sobre expresiones son los de app.models.search, no se
+    pueden reflejar y no se crean aqui
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings(
+            "ignore", "Skipped unsupported reflection of expression-based"
+        )
+        yield
+
+
+def _index_columns(
+    connection: Connection, table_name: str, primary_key: List[str]
+) -> List[Tuple[str, ...]]:
+    existing: List[Tuple[str, ...]] = []
+    with _expression_indexes_ignored():
+        indexes = inspect(connection).get_indexes(table_name)
+        constraints = inspect(connection).get_unique_constraints(table_name)
+    for index in indexes:
+        existing.append(tuple(index["column_names"]))
+    for constraint in constraints:
+        existing.append(tuple(constraint["column_names"]))
+
+    # En SQLite todo indice incluye el rowid al final, por lo que un indice
+    # (comercio_id) es equivalente a uno (comercio_id, id)
+    if connection.dialect.name == "sqlite" and len(primary_key) == 1:
+        existing += [columns + tuple(primary_key) for columns in existing]
+    return existing
+
+
+def apply_indexes(connection: Connection) -> List[str]:
+    """Crea los indices de los modelos que falten en una DB existente
+
+    Se puede correr varias veces, un indice se omite si ya existe alguno
+    con las mismas columnas aunque tenga otro nombre, como los que creo
+    Django en la DB original. Tambien se omiten los indices de columnas
+    que agrega una migracion posterior, que los crea al agregarlas. Regresa
+    los nombres de los indices creados.
+    """
+    created: List[str] = []
+    for table in Base.metadata.sorted_tables:
+        if not inspect(connection).has_table(table.name):
+            continue
+        primary_key = [column.name for column in table.primary_key]
+        existing = _index_columns(connection, table.name, primary_key)
+        table_columns = {
+            column["name"]
+            for column in inspect(connection).get_columns(table.name)
+        }
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            columns = tuple(column.name for column in index.columns)
+            if columns in existing or not table_columns.issuperset(columns):
+                continue
+            with _expression_indexes_ignored():
+                index.create(connection, checkfirst=True)
+            existing.append(columns)
+            created.append(index.name)
+    return created
+
+
+def _sqlite_plan(connection: Connection, statement: Select) -> List[str]:
+    compiled = statement.compile(
+        dialect=connection.dialect,
+        compile_kwargs={"render_postcompile": True},
+    )
+    # Los valores no importan para el plan de ejecucion
+    params = tuple(None for _ in compiled.positiontup)
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+    return [row[-1] for row in rows]
+
+
+def _postgresql_plan(connection: Connection, statement: Select) -> List[str]:
+    # Con NULL el planificador puede descartar la consulta sin plan, por lo
+    # que se usan los valores de ejemplo de hot_queries como literales
+    compiled = statement.compile(
+        dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+    )
+    rows = connection.exec_driver_sql(f"EXPLAIN {compiled}")
+    return [row[0].strip() for row in rows]
+
+
+def explain_query_plans(engine: Engine) -> Dict[str, List[str]]:
+    """Regresa el plan de ejecucion de cada consulta de ``hot_queries``
+
+    Esta soportado en SQLite con EXPLAIN QUERY PLAN y en PostgreSQL con
+    EXPLAIN, en otro backend se lanza NotImplementedError.
+    """
+    dialect_name = engine.dialect.name
+    if dialect_name not in _SCANS:
+        raise NotImplementedError(
+            f"Solo se soporta EXPLAIN en {', '.join(sorted(_SCANS))}"
+        )
+
+    plans: Dict[str, List[str]] = {}
+    with engine.connect() as connection:
+        if dialect_name == "sqlite":
+            for name, statement in hot_queries().items():
+                plans[name] = _sqlite_plan(connection, statement)
+            return plans
+
+        transaction = connection.begin()
+        try:
+            # En tablas pequenas PostgreSQL prefiere el Seq Scan aunque
+            # exista el indice, asi solo lo usa si no tiene otra opcion
+            connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            for name, statement in hot_queries().items():
+                plans[name] = _postgresql_plan(connection, statement)
+        finally:
+            transaction.rollback()
+    return plans
+
+
+def check_query_plans(engine: Engine) -> Dict[str, List[str]]:
+    """Regresa las consultas que recorren toda una tabla con su plan, un
+    diccionario vacio significa que todas usan un indice
+    """
+    plans = explain_query_plans(engine)
+    scan = _SCANS[engine.dialect.name]
+    return {
+        name: plan
+        for name, plan in plans.items()
+        if any(scan.search(step) for step in plan)
+    }
@@ -0,0 +1,374 @@
+"""Metricas en formato de texto de Prometheus para ``GET /metrics``
+
+No se usa ``prometheus_client``, solo se necesitan contadores, histogramas
+y gauges que se calculan al momento de leerlos. Cada observacion toma un
+lock por metrica, el formato de texto solo se genera en ``render``.
+"""
+import abc
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], **extra) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs)
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Labels = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    @abc.abstractmethod
+    def samples(self) -> List[str]:
+        """Lineas de la metrica sin el encabezado"""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Labels = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in sorted(values)
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Labels = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = (*buckets, float("inf"))
+        # Por etiquetas: conteo por bucket (no acumulado), suma y total
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                labels, ([0] * len(self.buckets), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    def count(self, *labels: str) -> int:
+        counts, _ = self._values.get(labels, ((), None))
+        return sum(counts)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [
+                (labels, list(counts), total[0])
+                for labels, (counts, total) in self._values.items()
+            ]
+        lines = []
+        for labels, counts, total in sorted(values):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                label = _labels(self.labelnames, labels, le=_number(bound))
+                lines.append(f"{self.name}_bucket{label} {cumulative}")
+            label = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label} {_number(total)}")
+            lines.append(f"{self.name}_count{label} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Gauge que se calcula al leer las metricas
+
+    ``collect`` regresa pares (etiquetas, valor), asi no se paga nada en
+    las peticiones por valores como el tamano del pool o de los caches.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Labels,
+        collect: Callable[[], Iterable[Tuple[Labels, float]]],
+    ):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in self.collect()
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            samples = metric.samples()
+            if samples:
+                lines += metric.header() + samples
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(
+    Counter(
+        "dapp_http_requests_total",
+        "Peticiones por ruta y codigo HTTP",
+        ("method", "route", "status"),
+    )
+)
+http_latency = registry.register(
+    Histogram(
+        "dapp_http_request_duration_seconds",
+        "Duracion de las peticiones por ruta, incluye el cuerpo",
+        ("method", "route"),
+    )
+)
+db_statements_per_request = registry.register(
+    Histogram(
+        "dapp_db_statements_per_request",
+        "Sentencias SQL ejecutadas por peticion",
+        ("method", "route"),
+        buckets=STATEMENT_BUCKETS,
+    )
+)
+db_time_per_request = registry.register(
+    Histogram(
+        "dapp_db_seconds_per_request",
+        "Tiempo acumulado en la DB por peticion",
+        ("method", "route"),
+    )
+)
+db_statements = registry.register(
+    Counter(
+        "dapp_db_statements_total",
+        "Sentencias SQL ejecutadas, incluye las que no son de una peticion",
+    )
+)
+db_seconds = registry.register(
+    Counter("dapp_db_seconds_total", "Tiempo total en la DB")
+)
+pool_checkout_wait = registry.register(
+    Histogram(
+        "dapp_db_pool_checkout_wait_seconds",
+        "Espera para obtener una conexion del pool",
+        ("engine",),
+    )
+)
+errors = registry.register(
+    Counter("dapp_errors_total", "Errores regresados por rc", ("rc",))
+)
+
+# Pools instrumentados, se leen al generar las metricas
+_pools: Dict[str, Pool] = {}
+# Caches con ``stats()``, ver ``register_cache``
+_caches: Dict[str, Callable[[], dict]] = {}
+
+
+def _pool_stats() -> Iterable[Tuple[Labels, float]]:
+    for name, pool in list(_pools.items()):
+        for stat in ("size", "checkedout", "checkedin", "overflow"):
+            method = getattr(pool, stat, None)
+            if method is not None:
+                yield (name, stat), method()
+
+
+def _cache_stats() -> Iterable[Tuple[Labels, float]]:
+    for name, stats in list(_caches.items()):
+        for stat, value in stats().items():
+            if value is not None:
+                yield (name, stat), value
+
+
+registry.register(
+    Gauge(
+        "dapp_db_pool",
+        "Estado del pool de conexiones (size, checkedout, overflow)",
+        ("engine", "stat"),
+        _pool_stats,
+    )
+)
+registry.register(
+    Gauge(
+        "dapp_cache",
+        "Estadisticas de los caches en memoria del proceso",
+        ("cache", "stat"),
+        _cache_stats,
+    )
+)
+
+
+def register_cache(name: str, stats: Callable[[], dict]):
+    _caches[name] = stats
+
+
+# [sentencias, segundos] de la peticion actual, lo inicializa el middleware
+_request_db: ContextVar[Optional[List[float]]] = ContextVar(
+    "dapp_request_db", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, params, context, many):
+    conn.info.setdefault("dapp_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, params, context, many):
+    elapsed = time.perf_counter() - conn.info["dapp_query_start"].pop()
+    db_statements.inc()
+    db_seconds.inc(amount=elapsed)
+    stats = _request_db.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+def _time_checkouts(pool: Pool, name: str):
+    # No hay evento antes del checkout, se mide envolviendo ``connect``.
+    # Si el engine se recrea con dispose() el nuevo pool ya no se mide
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - start, name)
+
+    pool.connect = timed_connect
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Registra los eventos de SQL y el pool del engine en las metricas
+
+    Para un AsyncEngine se debe pasar ``engine.sync_engine``.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    _time_checkouts(engine.pool, name)
+    _pools[name] = engine.pool
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mide cada peticion por ruta
+
+    Se etiqueta con el path de la ruta (``/empleados/{uuid}``) y no con el
+    de la peticion para no crear una serie por uuid.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[Callable, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if endpoint not in self._routes:
+            for route in scope["app"].routes:
+                self._routes[getattr(route, "endpoint", None)] = route.path
+        return self._routes.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        stats = [0, 0.0]
+        token = _request_db.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_db.reset(token)
+            method, route = scope["method"], self._route(scope)
+            http_requests.inc(method, route, str(status))
+            http_latency.observe(elapsed, method, route)
+            db_statements_per_request.observe(stats[0], method, route)
+            db_time_per_request.observe(stats[1], method, route)
@@ -0,0 +1,150 @@
+"""Migraciones versionadas del esquema
+
+Se aplican una vez por despliegue con ``python -m app.cli migrate``, la
+aplicacion nunca hace cambios en el esquema al importarse. Cada migracion
+se registra en ``dapp_schema_version`` y debe poder correr sobre la DB
+original (creada por Django) o sobre una DB nueva.
+"""
+import datetime as _dt
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    inspect,
+)
+from sqlalchemy.engine import Connection, Engine
+
+from app.config.db import Base
+from app.config.indexes import apply_indexes
+from app.crud.comercio import reconcile_counters
+
+# Se importan los modelos para registrar sus tablas en Base.metadata
+from app.models import Comercio, Empleado, EmpleadoTombstone
+from app.models.changes import create_change_triggers, initialize_change_seqs
+from app.models.counters import create_counter_triggers
+from app.models.search import create_search_indexes, rebuild_search_indexes
+
+_metadata = MetaData()
+
+schema_version = Table(
+    "dapp_schema_version",
+    _metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(100), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+def _initial(connection: Connection) -> None:
+    """Crea las tablas que no existan"""
+    Base.metadata.create_all(connection)
+
+
+def _indexes(connection: Connection) -> None:
+    apply_indexes(connection)
+
+
+def _add_column(connection: Connection, column: Column) -> None:
+    """Agrega una columna del modelo si todavia no existe en la tabla"""
+    table = column.table
+    columns = inspect(connection).get_columns(table.name)
+    if column.name in {existing["name"] for existing in columns}:
+        return
+
+    # SQLAlchemy no tiene un constructor de ALTER TABLE, se usa la misma
+    # definicion de la columna que genera CREATE TABLE
+    compiler = connection.dialect.ddl_compiler(connection.dialect, None)
+    specification = compiler.get_column_specification(column)
+    connection.exec_driver_sql(
+        f"ALTER TABLE {table.name} ADD COLUMN {specification}"
+    )
+
+
+def _roster_version(connection: Connection) -> None:
+    _add_column(connection, Comercio.__table__.c.roster_version)
+
+
+def _search(connection: Connection) -> None:
+    apply_indexes(connection)
+    create_search_indexes(connection)
+
+
+def _counters(connection: Connection) -> None:
+    _add_column(connection, Comercio.__table__.c.empleados_total)
+    _add_column(connection, Comercio.__table__.c.empleados_activos)
+    create_counter_triggers(connection)
+    connection.execute(reconcile_counters())
+
+
+def _changes(connection: Connection) -> None:
+    _add_column(connection, Empleado.__table__.c.change_seq)
+    _add_column(connection, Comercio.__table__.c.change_seq)
+    _add_column(connection, Comercio.__table__.c.tombstones_purged_seq)
+    EmpleadoTombstone.__table__.create(connection, checkfirst=True)
+    apply_indexes(connection)
+    initialize_change_seqs(connection)
+    create_change_triggers(connection)
+
+
+def _search_by_comercio(connection: Connection) -> None:
+    rebuild_search_indexes(connection)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "esquema inicial", _initial),
+    Migration(2, "indices de consultas frecuentes", _indexes),
+    Migration(3, "version de empleados por comercio", _roster_version),
+    Migration(4, "busqueda de empleados", _search),
+    Migration(5, "contadores de empleados", _counters),
+    Migration(6, "cambios de empleados", _changes),
+    Migration(7, "busqueda de empleados por comercio", _search_by_comercio),
+]
+
+
+def applied_versions(connection: Connection) -> List[int]:
+    schema_version.create(connection, checkfirst=True)
+    return [
+        version
+        for (version,) in connection.execute(
+            schema_version.select()
+            .with_only_columns(schema_version.c.version)
+            .order_by(schema_version.c.version)
+        )
+    ]
+
+
+def migrate(engine: Engine) -> List[Migration]:
+    """Aplica las migraciones pendientes, cada una en su transaccion
+
+    Regresa las migraciones aplicadas, una lista vacia si la DB ya estaba
+    en la ultima version.
+    """
+    with engine.begin() as connection:
+        applied = set(applied_versions(connection))
+
+    migrations: List[Migration] = []
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            continue
+        with engine.begin() as connection:
+            migration.apply(connection)
+            connection.execute(
+                schema_version.insert().values(
+                    version=migration.version,
+                    name=migration.name,
+                    applied_at=_dt.datetime.utcnow(),
+                )
+            )
+        migrations.append(migration)
+    return migrations
@@ -0,0 +1,47 @@
+from typing import Any, Dict, Optional, Tuple
+
+from app.config.cache import MISSING, TTLCache
+from app.config.metrics import register_cache
+from app.config.settings import settings
+
+# (activo, JSON del empleado) o None si el PIN no existe en el comercio
+PinEntry = Optional[Tuple[bool, bytes]]
+
+
+class PinCache:
+    """Cache de ``POST /empleados/verify-pin`` por comercio y PIN
+
+    Las llaves incluyen la ``roster_version`` del comercio, que la ruta lee
+    en cada peticion con una consulta por llave primaria. Cualquier
+    escritura en cualquier worker aumenta la version, por lo que un
+    empleado desactivado, removido o con otro PIN deja de validarse en la
+    siguiente peticion; las entradas de versiones anteriores solo esperan a
+    ser desalojadas.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.negative_ttl = negative_ttl
+
+    def get(self, comercio_id: int, version: int, pin: str) -> Any:
+        """Regresa el ``PinEntry`` guardado o ``MISSING``"""
+        return self._cache.get((comercio_id, version, pin), MISSING)
+
+    def put(self, comercio_id: int, version: int, pin: str, entry: PinEntry):
+        """``version`` se debe leer antes de consultar el empleado"""
+        ttl = self.negative_ttl if entry is None else None
+        self._cache.set((comercio_id, version, pin), entry, ttl=ttl)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, float]:
+        return self._cache.stats()
+
+
+pin_cache = PinCache(
+    maxsize=settings.pin_cache_maxsize,
+    ttl=settings.pin_cache_ttl,
+    negative_ttl=settings.pin_cache_negative_ttl,
+)
+register_cache("pin", pin_cache.stats)
@@ -0,0 +1,121 @@
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+import orjson
+
+from app.config.cache import TTLCache
+from app.config.metrics import register_cache
+from app.config.settings import settings
+from app.schemas.empleado import serialize_empleado
+
+# Costo aproximado en memoria de cada entrada del indice por uuid
+_INDEX_ENTRY_BYTES = 150
+
+
+class Roster:
+    """Listado de empleados de un comercio ya serializado
+
+    Se guarda un solo ``bytes`` con el JSON de todos los empleados separados
+    por comas y la posicion de cada uno por uuid, en lugar de objetos del
+    ORM o de pydantic por empleado.
+    """
+
+    __slots__ = ("version", "body", "index")
+
+    def __init__(self, version: int, rows: Iterable):
+        fragments = []
+        self.index: Dict[str, Tuple[int, int]] = {}
+        start = 0
+        for row in rows:
+            fragment = orjson.dumps(serialize_empleado(row))
+            self.index[str(row.uuid)] = (start, start + len(fragment))
+            fragments.append(fragment)
+            start += len(fragment) + 1
+        self.version = version
+        self.body = b",".join(fragments)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.body) + _INDEX_ENTRY_BYTES * len(self.index)
+
+    def list_response(self) -> bytes:
+        """Mismo contenido que EmpleadosResponse sin paginar"""
+        return b'{"rc":0,"msg":"Ok","data":[%s],"next_cursor":null}' % (
+            self.body
+        )
+
+    def empleado_response(self, uuid: str) -> Optional[bytes]:
+        """Mismo contenido que EmpleadoResponse, None si no existe"""
+        try:
+            position = self.index.get(str(UUID(uuid)))
+        except ValueError:
+            return None
+        if position is None:
+            return None
+        start, end = position
+        return b'{"rc":0,"msg":"Ok","data":%s}' % self.body[start:end]
+
+
+class RosterCache:
+    """Cache por comercio de los empleados serializados
+
+    Las rutas de escritura deben llamar ``invalidate`` despues del commit.
+    Como el cache es por proceso, las rutas de lectura pasan a ``get`` la
+    ``roster_version`` del comercio, una lectura por llave primaria, y un
+    listado de otra version no se usa; asi las escrituras de otros workers
+    se ven en la siguiente peticion y no hasta que expira el ``ttl``.
+    """
+
+    def __init__(self, maxsize: int, maxbytes: int, ttl: float):
+        self._cache = TTLCache(
+            maxsize=maxsize,
+            ttl=ttl,
+            maxweight=maxbytes,
+            weigher=lambda roster: roster.nbytes,
+        )
+        self._lock = threading.Lock()
+        self._generations: Dict[int, int] = {}
+
+    def get(
+        self, comercio_id: int, version: Optional[int] = None
+    ) -> Optional[Roster]:
+        """Listado guardado, None si no existe o es de otra ``version``"""
+        roster = self._cache.get(comercio_id, None)
+        if roster is None or version is None or roster.version == version:
+            return roster
+        return None
+
+    def generation(self, comercio_id: int) -> int:
+        """Se debe leer antes de consultar la DB y pasar a ``put``"""
+        return self._generations.get(comercio_id, 0)
+
+    def put(self, comercio_id: int, roster: Roster, generation: int):
+        """Guarda el listado si no hubo escrituras mientras se consultaba"""
+        with self._lock:
+            if self._generations.get(comercio_id, 0) == generation:
+                self._cache.set(comercio_id, roster)
+
+    def invalidate(self, comercio_id: int):
+        with self._lock:
+            self._generations[comercio_id] = (
+                self._generations.get(comercio_id, 0) + 1
+            )
+            self._cache.pop(comercio_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, float]:
+        stats = self._cache.stats()
+        stats["bytes"] = stats.pop("weight")
+        stats["maxbytes"] = self._cache.maxweight
+        return stats
+
+
+roster_cache = RosterCache(
+    maxsize=settings.roster_cache_maxsize,
+    maxbytes=settings.roster_cache_maxbytes,
+    ttl=settings.roster_cache_ttl,
+)
+register_cache("roster", roster_cache.stats)
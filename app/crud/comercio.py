@@ -0,0 +1,98 @@
+from typing import Optional
+
+from sqlalchemy import func, select, true, update
+from sqlalchemy.sql import Select, Update
+
+from app.models.comercio import Comercio
+from app.models.empleado import Empleado
+
+
+def bump_roster_version(comercio_id: int) -> Update:
+    """Aumenta la version de empleados del comercio, se debe ejecutar en
+    la misma transaccion que el cambio en los empleados
+    """
+    return (
+        update(Comercio)
+        .where(Comercio.id == comercio_id)
+        .values(roster_version=Comercio.roster_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def select_roster_version(comercio_id: int) -> Select:
+    return select(Comercio.roster_version).where(Comercio.id == comercio_id)
+
+
+def select_roster_status(comercio_id: int) -> Select:
+    """Version y numero de empleados del comercio en una sola consulta"""
+    return select(Comercio.roster_version, Comercio.empleados_total).where(
+        Comercio.id == comercio_id
+    )
+
+
+def select_change_status(comercio_id: int) -> Select:
+    """Secuencia de cambios actual y la de los borrados compactados"""
+    return select(Comercio.change_seq, Comercio.tombstones_purged_seq).where(
+        Comercio.id == comercio_id
+    )
+
+
+def raise_purged_seq(comercio_id: int, change_seq: int) -> Update:
+    """Registra que se compactaron los borrados hasta ``change_seq``"""
+    return (
+        update(Comercio)
+        .where(
+            Comercio.id == comercio_id,
+            Comercio.tombstones_purged_seq < change_seq,
+        )
+        .values(tombstones_purged_seq=change_seq)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def select_empleados_stats(comercio_id: int) -> Select:
+    return select(Comercio.empleados_total, Comercio.empleados_activos).where(
+        Comercio.id == comercio_id
+    )
+
+
+def _count_empleados(activo: Optional[bool] = None):
+    """Conteo de los empleados de cada comercio para ``reconcile``"""
+    condition = true() if activo is None else Empleado.activo == activo
+    return (
+        select(func.count(Empleado.id))
+        .where(Empleado.comercio_id == Comercio.id, condition)
+        .scalar_subquery()
+    )
+
+
+def select_counter_drift(comercio_id: Optional[int] = None) -> Select:
+    """Comercios cuyos contadores no coinciden con sus empleados, recorre
+    todos los empleados, solo se usa en ``python -m app.cli reconcile``
+    """
+    total = _count_empleados().label("total")
+    activos = _count_empleados(True).label("activos")
+    statement = select(
+        Comercio.id,
+        Comercio.empleados_total,
+        Comercio.empleados_activos,
+        total,
+        activos,
+    ).where(
+        (Comercio.empleados_total != total)
+        | (Comercio.empleados_activos != activos)
+    )
+    if comercio_id is not None:
+        statement = statement.where(Comercio.id == comercio_id)
+    return statement.order_by(Comercio.id)
+
+
+def reconcile_counters(comercio_id: Optional[int] = None) -> Update:
+    """Recalcula los contadores de empleados de uno o todos los comercios"""
+    statement = update(Comercio).values(
+        empleados_total=_count_empleados(),
+        empleados_activos=_count_empleados(True),
+    )
+    if comercio_id is not None:
+        statement = statement.where(Comercio.id == comercio_id)
+    return statement.execution_options(synchronize_session=False)
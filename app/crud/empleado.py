@@ -0,0 +1,275 @@
+import datetime as _dt
+import re
+import sqlite3
+import types
+from typing import List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import String, delete, func, literal_column, select, update
+from sqlalchemy.dialects.postgresql.base import PGCompiler
+from sqlalchemy.engine import Dialect
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import ColumnElement, Delete, Select, Update
+
+from app.models.empleado import Empleado
+from app.models.search import FTS_TABLE, TSVECTOR, fts
+from app.models.tombstone import EmpleadoTombstone
+
+# SQLite soporta RETURNING desde la 3.35
+_SQLITE_RETURNING = sqlite3.sqlite_version_info >= (3, 35)
+
+# Mayor que cualquier caracter, limite superior de un rango por prefijo
+_MAX_CHAR = "\U0010ffff"
+_WORD = re.compile(r"\w+")
+
+# Columnas que necesitan las respuestas, se consultan como tuplas en lugar
+# de entidades para no pagar el identity map ni los lazy loads del ORM.
+# El id solo se usa para el cursor de la paginacion
+EMPLEADO_COLUMNS = (
+    Empleado.id,
+    Empleado.uuid,
+    Empleado.nombre,
+    Empleado.apellidos,
+    Empleado.pin,
+    Empleado.fecha_creacion,
+    Empleado.activo,
+)
+
+
+def _prefix(dialect_name: str, column, prefix: str) -> ColumnElement:
+    """Valores de ``column`` que empiezan con ``prefix`` sin importar
+    mayusculas, usa el indice sobre ``lower(column)``
+    """
+    if dialect_name == "postgresql":
+        escaped = re.sub(r"([\\%_])", r"\\\1", prefix.lower())
+        return func.lower(column).like(escaped + "%", escape="\\")
+    # SQLite solo usa el indice con comparaciones de rango
+    lower = func.lower(prefix, type_=String)
+    return func.lower(column).between(lower, lower + _MAX_CHAR)
+
+
+def _text_search(
+    dialect_name: str, comercio_id: int, q: str
+) -> Optional[ColumnElement]:
+    """Empleados con todas las palabras de ``q`` como prefijo de alguna
+    palabra del nombre o apellidos
+
+    En SQLite el comercio es parte del MATCH para que FTS5 solo regrese
+    los empleados del comercio en lugar de los de toda la tabla.
+    """
+    words = _WORD.findall(q)
+    if not words:
+        return None
+    if dialect_name == "postgresql":
+        query = " & ".join(f"{word}:*" for word in words)
+        return literal_column(TSVECTOR).op("@@")(
+            func.to_tsquery("simple", query)
+        )
+    match = (
+        f'comercio_id : "{int(comercio_id)}" AND {{nombre apellidos}} : ('
+        + " ".join(f'"{word}"*' for word in words)
+        + ")"
+    )
+    return Empleado.id.in_(
+        select(fts.c.rowid).where(fts.c[FTS_TABLE].op("MATCH")(match))
+    )
+
+
+def search_conditions(
+    dialect_name: str,
+    comercio_id: int,
+    activo: Optional[bool] = None,
+    nombre: Optional[str] = None,
+    apellidos: Optional[str] = None,
+    q: Optional[str] = None,
+) -> List[ColumnElement]:
+    """Filtros de ``GET /empleados``, todos se combinan con AND"""
+    conditions: List[ColumnElement] = []
+    if activo is not None:
+        conditions.append(Empleado.activo == activo)
+    if nombre:
+        conditions.append(_prefix(dialect_name, Empleado.nombre, nombre))
+    if apellidos:
+        conditions.append(_prefix(dialect_name, Empleado.apellidos, apellidos))
+    if q:
+        condition = _text_search(dialect_name, comercio_id, q)
+        if condition is not None:
+            conditions.append(condition)
+    return conditions
+
+
+def select_empleados(
+    comercio_id: int,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    conditions: Sequence[ColumnElement] = (),
+) -> Select:
+    """Empleados del comercio ordenados por id, despues de ``after_id``"""
+    statement = select(*EMPLEADO_COLUMNS).where(
+        Empleado.comercio_id == comercio_id, *conditions
+    )
+    if after_id is not None:
+        statement = statement.where(Empleado.id > after_id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement.order_by(Empleado.id)
+
+
+def select_empleado(comercio_id: int, uuid: str) -> Select:
+    """Un empleado del comercio por su uuid
+
+    Un uuid invalido genera StatementError al ejecutarse.
+    """
+    return (
+        select(*EMPLEADO_COLUMNS)
+        .where(Empleado.comercio_id == comercio_id, Empleado.uuid == uuid)
+        .limit(1)
+    )
+
+
+def supports_returning(dialect: Dialect) -> bool:
+    """Si el backend soporta ``UPDATE ... RETURNING``
+
+    SQLAlchemy 1.4 no lo compila en SQLite aunque SQLite lo soporta desde
+    la 3.35, en ese caso se agrega con ``_sqlite_update``.
+    """
+    if dialect.name == "sqlite":
+        return _SQLITE_RETURNING
+    return dialect.full_returning
+
+
+@compiles(Update, "sqlite")
+def _sqlite_update(element: Update, compiler, **kw) -> str:
+    """Compila el RETURNING de un UPDATE en SQLite igual que en PostgreSQL,
+    las columnas quedan en el mapa de resultados y se convierten con sus
+    tipos
+    """
+    if element._returning and _SQLITE_RETURNING:
+        compiler.returning_clause = types.MethodType(
+            PGCompiler.returning_clause, compiler
+        )
+    return compiler.visit_update(element, **kw)
+
+
+def update_empleado(
+    comercio_id: int, uuid: str, values: dict, returning: bool
+) -> Update:
+    """Edita un empleado del comercio en un solo UPDATE
+
+    Con ``returning`` regresa las columnas de la respuesta, solo se debe
+    usar si el backend lo soporta (``supports_returning``).
+    """
+    statement = (
+        update(Empleado)
+        .where(Empleado.comercio_id == comercio_id, Empleado.uuid == uuid)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if returning:
+        statement = statement.returning(*EMPLEADO_COLUMNS)
+    return statement
+
+
+def select_empleado_by_pin(comercio_id: int, pin: str) -> Select:
+    """Usa el indice unico (pin, comercio_id)"""
+    return select(*EMPLEADO_COLUMNS).where(
+        Empleado.comercio_id == comercio_id, Empleado.pin == pin
+    )
+
+
+def select_empleados_by_uuid(
+    comercio_id: int, uuids: Sequence[UUID]
+) -> Select:
+    """Empleados del comercio con alguno de los ``uuids``"""
+    return select(*EMPLEADO_COLUMNS).where(
+        Empleado.comercio_id == comercio_id, Empleado.uuid.in_(uuids)
+    )
+
+
+def select_pin_owners(comercio_id: int, pins: Sequence[str]) -> Select:
+    """Uuid y pin de los empleados del comercio que usan alguno de los
+    ``pins``
+    """
+    return select(Empleado.uuid, Empleado.pin).where(
+        Empleado.comercio_id == comercio_id, Empleado.pin.in_(pins)
+    )
+
+
+def update_empleados(
+    comercio_id: int, uuids: Sequence[UUID], values: dict
+) -> Update:
+    """Aplica los mismos ``values`` a varios empleados en un solo UPDATE"""
+    return (
+        update(Empleado)
+        .where(Empleado.comercio_id == comercio_id, Empleado.uuid.in_(uuids))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_empleados(comercio_id: int, uuids: Sequence[UUID]) -> Delete:
+    return (
+        delete(Empleado)
+        .where(Empleado.comercio_id == comercio_id, Empleado.uuid.in_(uuids))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def select_empleado_changes(
+    comercio_id: int, after_seq: int, until_seq: int, limit: int
+) -> Select:
+    """Empleados creados o editados despues de ``after_seq`` y hasta
+    ``until_seq`` en el orden de la secuencia de cambios
+
+    ``until_seq`` es la secuencia que se leyo antes de la consulta, los
+    cambios posteriores se regresan en la siguiente llamada para no mover
+    el cursor sobre un cambio que esta consulta no vio.
+    """
+    return (
+        select(*EMPLEADO_COLUMNS, Empleado.change_seq)
+        .where(
+            Empleado.comercio_id == comercio_id,
+            Empleado.change_seq > after_seq,
+            Empleado.change_seq <= until_seq,
+        )
+        .order_by(Empleado.change_seq)
+        .limit(limit)
+    )
+
+
+def select_tombstones(
+    comercio_id: int, after_seq: int, until_seq: int, limit: int
+) -> Select:
+    """Empleados removidos despues de ``after_seq`` y hasta ``until_seq``"""
+    return (
+        select(EmpleadoTombstone.uuid, EmpleadoTombstone.change_seq)
+        .where(
+            EmpleadoTombstone.comercio_id == comercio_id,
+            EmpleadoTombstone.change_seq > after_seq,
+            EmpleadoTombstone.change_seq <= until_seq,
+        )
+        .order_by(EmpleadoTombstone.change_seq)
+        .limit(limit)
+    )
+
+
+def select_expired_tombstones(before: _dt.datetime, limit: int) -> Select:
+    """Borrados anteriores a ``before`` para ``python -m app.cli compact``"""
+    return (
+        select(
+            EmpleadoTombstone.id,
+            EmpleadoTombstone.comercio_id,
+            EmpleadoTombstone.change_seq,
+        )
+        .where(EmpleadoTombstone.fecha_borrado < before)
+        .order_by(EmpleadoTombstone.fecha_borrado)
+        .limit(limit)
+    )
+
+
+def delete_tombstones(ids: Sequence[int]) -> Delete:
+    return (
+        delete(EmpleadoTombstone)
+        .where(EmpleadoTombstone.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    )
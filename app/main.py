@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from app.config.exception_handler import (
@@ -9,16 +10,43 @@ from app.config.exception_handler import (
     validation_exception_handler,
 )
 from app.config.exceptions import BaseException
-from app.routes.empleado import empleado
+from app.config.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from app.config.settings import settings
+from app.routes.empleado import empleado, empleado_need_id
+from app.routes.empleado_async import empleado_async, replace_routes
 
-app = FastAPI()
 
-# Include exceptions handlers
-app.add_exception_handler(StarletteHTTPException, http_exception_handler)
-app.add_exception_handler(RequestValidationError, validation_exception_handler)
-app.add_exception_handler(BaseException, custom_exception_handler)
-app.add_exception_handler(Exception, exception_handler)
+def metrics():
+    """Metricas del proceso en formato de texto de Prometheus"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
 
 
-# Include routes
-app.include_router(empleado)
+def create_app(
+    db_async: bool = settings.db_async,
+    metrics_enabled: bool = settings.metrics_enabled,
+) -> FastAPI:
+    app = FastAPI()
+
+    # Include exceptions handlers
+    app.add_exception_handler(StarletteHTTPException, http_exception_handler)
+    app.add_exception_handler(
+        RequestValidationError, validation_exception_handler
+    )
+    app.add_exception_handler(BaseException, custom_exception_handler)
+    app.add_exception_handler(Exception, exception_handler)
+
+    if metrics_enabled:
+        app.add_middleware(MetricsMiddleware)
+        app.add_api_route("/metrics", metrics, include_in_schema=False)
+
+    # Include routes
+    app.include_router(empleado_need_id)
+    if db_async:
+        app.include_router(replace_routes(empleado, empleado_async))
+    else:
+        app.include_router(empleado)
+
+    return app
+
+
+app = create_app()
@@ -1,2 +1,6 @@
+# Registra los indices de busqueda y los triggers de los contadores y de
+# los cambios que se crean junto con main_empleado
+from . import changes, counters, search  # noqa: F401,E402
 from .comercio import Comercio
 from .empleado import Empleado
+from .tombstone import EmpleadoTombstone
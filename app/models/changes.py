@@ -0,0 +1,112 @@
+"""Secuencia de cambios de los empleados mantenida con triggers
+
+Cada INSERT, DELETE o cambio de un empleado aumenta
+``main_comercio.change_seq`` y guarda el nuevo valor en
+``main_empleado.change_seq``, o en ``main_empleado_tombstone`` si se
+removio, sin importar si viene de una ruta, de las rutas bulk o de
+``python -m app.cli import``. ``GET /empleados/changes`` regresa lo que
+cambio despues de un valor de la secuencia.
+
+La secuencia se aumenta con un UPDATE a la fila del comercio, que queda
+bloqueada hasta el commit, por lo que los cambios de un comercio se
+confirman en el mismo orden que su secuencia y un cliente no se puede
+saltar un cambio que todavia no se confirmaba.
+
+Se crean junto con ``main_empleado`` en ``create_all`` y en DBs existentes
+con la migracion de cambios, ver ``app.config.migrations``. Los borrados
+viejos se compactan con ``python -m app.cli compact``.
+"""
+from typing import Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+
+from .empleado import Empleado
+
+# Columnas que un cliente sincroniza, cambiar otra (como convertir el uuid
+# con uuid-migrate) no es un cambio
+_TRACKED = ("nombre", "apellidos", "pin", "activo", "comercio_id")
+
+_BUMP = (
+    "UPDATE main_comercio SET change_seq = change_seq + 1 "
+    "WHERE id = {row}.comercio_id"
+)
+_SEQ = "(SELECT change_seq FROM main_comercio WHERE id = {row}.comercio_id)"
+_STAMP = (
+    f"UPDATE main_empleado SET change_seq = {_SEQ.format(row='new')} "
+    "WHERE id = new.id"
+)
+_TOMBSTONE = (
+    "INSERT INTO main_empleado_tombstone (comercio_id, uuid, change_seq, "
+    "fecha_borrado) VALUES (old.comercio_id, old.uuid, "
+    f"{_SEQ.format(row='old')}, CURRENT_TIMESTAMP)"
+)
+_CHANGED = " OR ".join(
+    f"old.{column} IS NOT new.{column}" for column in _TRACKED
+)
+
+_SQLITE_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS main_empleado_changes_ai AFTER INSERT ON "
+    f"main_empleado BEGIN {_BUMP.format(row='new')}; {_STAMP}; END",
+    "CREATE TRIGGER IF NOT EXISTS main_empleado_changes_au AFTER UPDATE OF "
+    f"{', '.join(_TRACKED)} ON main_empleado WHEN {_CHANGED} BEGIN "
+    f"{_BUMP.format(row='new')}; {_STAMP}; END",
+    "CREATE TRIGGER IF NOT EXISTS main_empleado_changes_ad AFTER DELETE ON "
+    f"main_empleado BEGIN {_BUMP.format(row='old')}; {_TOMBSTONE}; END",
+    # Un empleado que cambia de comercio se remueve del anterior
+    "CREATE TRIGGER IF NOT EXISTS main_empleado_changes_am AFTER UPDATE OF "
+    "comercio_id ON main_empleado WHEN old.comercio_id IS NOT "
+    f"new.comercio_id BEGIN {_BUMP.format(row='old')}; {_TOMBSTONE}; END",
+]
+
+_POSTGRESQL_DDL = [
+    "CREATE OR REPLACE FUNCTION main_empleado_changes() RETURNS trigger AS "
+    "$$ DECLARE seq bigint; BEGIN "
+    "IF TG_OP = 'UPDATE' AND "
+    f"ROW({', '.join(f'OLD.{column}' for column in _TRACKED)}) IS NOT "
+    f"DISTINCT FROM ROW({', '.join(f'NEW.{column}' for column in _TRACKED)})"
+    " THEN RETURN NEW; END IF; "
+    "IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND "
+    "OLD.comercio_id <> NEW.comercio_id) THEN "
+    f"{_BUMP.format(row='OLD')} RETURNING change_seq INTO seq; "
+    "INSERT INTO main_empleado_tombstone (comercio_id, uuid, change_seq, "
+    "fecha_borrado) VALUES (OLD.comercio_id, OLD.uuid, seq, "
+    "now() AT TIME ZONE 'utc'); END IF; "
+    "IF TG_OP = 'DELETE' THEN RETURN OLD; END IF; "
+    f"{_BUMP.format(row='NEW')} RETURNING change_seq INTO NEW.change_seq; "
+    "RETURN NEW; END $$ LANGUAGE plpgsql",
+    "DROP TRIGGER IF EXISTS main_empleado_changes ON main_empleado",
+    "CREATE TRIGGER main_empleado_changes BEFORE INSERT OR DELETE OR UPDATE "
+    f"OF {', '.join(_TRACKED)} ON main_empleado FOR EACH ROW "
+    "EXECUTE FUNCTION main_empleado_changes()",
+]
+
+CHANGES_DDL: Dict[str, List[str]] = {
+    "sqlite": _SQLITE_DDL,
+    "postgresql": _POSTGRESQL_DDL,
+}
+
+# Los empleados que ya existian se toman como cambios en el orden de su id
+_INITIALIZE = [
+    "UPDATE main_empleado SET change_seq = id WHERE change_seq = 0",
+    "UPDATE main_comercio SET change_seq = COALESCE((SELECT "
+    "MAX(change_seq) FROM main_empleado WHERE comercio_id = "
+    "main_comercio.id), 0)",
+]
+
+
+def create_change_triggers(connection: Connection) -> None:
+    """Crea los triggers de la secuencia, se puede correr varias veces"""
+    for statement in CHANGES_DDL.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+def initialize_change_seqs(connection: Connection) -> None:
+    """Asigna la secuencia a los empleados creados antes de los triggers"""
+    for statement in _INITIALIZE:
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Empleado.__table__, "after_create")
+def _after_create(target, connection, **kw):
+    create_change_triggers(connection)
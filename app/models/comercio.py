@@ -1,7 +1,7 @@
 import datetime as _dt
 import uuid as _uuid
 
-from sqlalchemy import Column
+from sqlalchemy import Column, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.sqltypes import (
     CHAR,
@@ -11,9 +11,9 @@ from sqlalchemy.sql.sqltypes import (
     Integer,
     String,
 )
-from sqlalchemy_utils import UUIDType
 
-from app.config.db import Base, engine
+from app.config.db import Base
+from app.models.types import StoredUUID
 
 
 class Comercio(Base):
@@ -24,20 +24,46 @@ class Comercio(Base):
         primary_key=True,
         autoincrement=True,
     )
-    uuid = Column(UUIDType(binary=False), default=_uuid.uuid4, nullable=False)
+    uuid = Column(StoredUUID(), default=_uuid.uuid4, nullable=False)
     nombre = Column(String(100), nullable=False)
     activo = Column(Boolean(), default=True, nullable=False)
     email_contacto = Column(String(50))
     telefono_contacto = Column(String(15))
-    api_key = Column(
-        UUIDType(binary=False), default=_uuid.uuid4, nullable=False
-    )
+    api_key = Column(StoredUUID(), default=_uuid.uuid4, nullable=False)
     fecha_creacion = Column(
         DateTime, default=_dt.datetime.utcnow, nullable=False
     )
+    # Aumenta con cada cambio en los empleados del comercio, se usa como
+    # ETag de las rutas de lectura
+    roster_version = Column(
+        Integer, default=0, server_default="0", nullable=False
+    )
+    # Los mantienen los triggers de app.models.counters
+    empleados_total = Column(
+        Integer, default=0, server_default="0", nullable=False
+    )
+    empleados_activos = Column(
+        Integer, default=0, server_default="0", nullable=False
+    )
+
+    # Aumenta con cada cambio de un empleado del comercio, la mantienen los
+    # triggers de app.models.changes. Es el cursor de GET /empleados/changes
+    change_seq = Column(
+        BigInteger, default=0, server_default="0", nullable=False
+    )
+    # Mayor change_seq de los borrados que ya se compactaron, un cursor
+    # anterior ya no puede ver todos los borrados
+    tombstones_purged_seq = Column(
+        BigInteger, default=0, server_default="0", nullable=False
+    )
 
     empleados = relationship("Empleado", back_populates="comercio")
 
+    __table_args__ = (
+        # get_auth busca el comercio por api_key en cada peticion
+        Index("main_comercio_api_key_uniq", "api_key", unique=True),
+    )
+
     def __repr__(self):
         return (
             f"Comercio(id={self.id!r}, "
@@ -45,6 +71,3 @@ class Comercio(Base):
             f"email_contacto={self.email_contacto!r}), "
             f"api_key={self.api_key!r})"
         )
-
-
-Base.metadata.create_all(engine)
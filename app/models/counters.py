@@ -0,0 +1,70 @@
+"""Contadores de empleados por comercio mantenidos con triggers
+
+``main_comercio.empleados_total`` y ``empleados_activos`` se actualizan en
+la misma transaccion que cada INSERT, DELETE o cambio de ``activo`` en
+``main_empleado``, sin importar si viene de una ruta, de las rutas bulk o
+de ``python -m app.cli import``. Si se desajustan, por ejemplo por SQL
+manual con los triggers desactivados, se recalculan con
+``python -m app.cli reconcile``.
+
+Se crean junto con ``main_empleado`` en ``create_all`` y en DBs existentes
+con la migracion de contadores, ver ``app.config.migrations``.
+"""
+from typing import Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+
+from .empleado import Empleado
+
+_ADD = (
+    "UPDATE main_comercio SET empleados_total = empleados_total + 1, "
+    "empleados_activos = empleados_activos + "
+    "(CASE WHEN {row}.activo THEN 1 ELSE 0 END) WHERE id = {row}.comercio_id"
+)
+_REMOVE = (
+    "UPDATE main_comercio SET empleados_total = empleados_total - 1, "
+    "empleados_activos = empleados_activos - "
+    "(CASE WHEN {row}.activo THEN 1 ELSE 0 END) WHERE id = {row}.comercio_id"
+)
+
+_SQLITE_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS main_empleado_counters_ai AFTER INSERT ON "
+    f"main_empleado BEGIN {_ADD.format(row='new')}; END",
+    "CREATE TRIGGER IF NOT EXISTS main_empleado_counters_ad AFTER DELETE ON "
+    f"main_empleado BEGIN {_REMOVE.format(row='old')}; END",
+    "CREATE TRIGGER IF NOT EXISTS main_empleado_counters_au AFTER UPDATE OF "
+    "activo, comercio_id ON main_empleado WHEN old.activo IS NOT new.activo "
+    "OR old.comercio_id IS NOT new.comercio_id BEGIN "
+    f"{_REMOVE.format(row='old')}; {_ADD.format(row='new')}; END",
+]
+
+_POSTGRESQL_DDL = [
+    "CREATE OR REPLACE FUNCTION main_empleado_counters() RETURNS trigger AS "
+    "$$ BEGIN "
+    "IF TG_OP = 'UPDATE' AND OLD.activo IS NOT DISTINCT FROM NEW.activo "
+    "AND OLD.comercio_id = NEW.comercio_id THEN RETURN NULL; END IF; "
+    f"IF TG_OP <> 'INSERT' THEN {_REMOVE.format(row='OLD')}; END IF; "
+    f"IF TG_OP <> 'DELETE' THEN {_ADD.format(row='NEW')}; END IF; "
+    "RETURN NULL; END $$ LANGUAGE plpgsql",
+    "DROP TRIGGER IF EXISTS main_empleado_counters ON main_empleado",
+    "CREATE TRIGGER main_empleado_counters AFTER INSERT OR DELETE OR UPDATE "
+    "OF activo, comercio_id ON main_empleado FOR EACH ROW "
+    "EXECUTE FUNCTION main_empleado_counters()",
+]
+
+COUNTERS_DDL: Dict[str, List[str]] = {
+    "sqlite": _SQLITE_DDL,
+    "postgresql": _POSTGRESQL_DDL,
+}
+
+
+def create_counter_triggers(connection: Connection) -> None:
+    """Crea los triggers de los contadores, se puede correr varias veces"""
+    for statement in COUNTERS_DDL.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Empleado.__table__, "after_create")
+def _after_create(target, connection, **kw):
+    create_counter_triggers(connection)
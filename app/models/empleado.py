@@ -1,7 +1,7 @@
 import datetime as _dt
 import uuid as _uuid
 
-from sqlalchemy import Column, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.sqltypes import (
     CHAR,
@@ -11,16 +11,16 @@ from sqlalchemy.sql.sqltypes import (
     Integer,
     String,
 )
-from sqlalchemy_utils import UUIDType
 
-from app.config.db import Base, engine
+from app.config.db import Base
+from app.models.types import StoredUUID
 
 
 class Empleado(Base):
     __tablename__ = "main_empleado"
 
     id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
-    uuid = Column(UUIDType(binary=False), default=_uuid.uuid4)
+    uuid = Column(StoredUUID(), default=_uuid.uuid4)
     nombre = Column(String(40), nullable=False)
     apellidos = Column(String(40), nullable=False)
     pin = Column(String(6), nullable=False)
@@ -31,6 +31,11 @@ class Empleado(Base):
     comercio_id = Column(
         BigInteger, ForeignKey("main_comercio.id"), nullable=False
     )
+    # Secuencia del comercio en el ultimo cambio del empleado, la asignan
+    # los triggers de app.models.changes
+    change_seq = Column(
+        BigInteger, default=0, server_default="0", nullable=False
+    )
 
     comercio = relationship("Comercio", back_populates="empleados")
 
@@ -45,7 +50,17 @@ class Empleado(Base):
         UniqueConstraint(
             "pin", "comercio_id", name="main_empleado_pin_comercio_id_uniq"
         ),
+        # Listado y paginacion por id de los empleados de un comercio
+        Index("main_empleado_comercio_id_id_idx", "comercio_id", "id"),
+        # Busqueda de un empleado por uuid en las rutas /empleados/{uuid}
+        Index("main_empleado_comercio_id_uuid_idx", "comercio_id", "uuid"),
+        # Filtro ?activo= de GET /empleados, los indices de busqueda por
+        # texto estan en app.models.search
+        Index("main_empleado_comercio_id_activo_idx", "comercio_id", "activo"),
+        # Cambios de un comercio despues de un cursor, GET /empleados/changes
+        Index(
+            "main_empleado_comercio_id_change_seq_idx",
+            "comercio_id",
+            "change_seq",
+        ),
     )
-
-
-Base.metadata.create_all(engine)
@@ -0,0 +1,113 @@
+"""Indices de busqueda de empleados que SQLAlchemy no puede declarar
+
+En SQLite la busqueda de texto usa una tabla FTS5 con el contenido de
+``main_empleado`` sincronizada con triggers, y los prefijos de nombre y
+apellidos un indice sobre ``lower()``. La tabla FTS5 tambien indexa el
+``comercio_id`` para que la busqueda solo regrese los empleados del
+comercio y no los de todos, y los prefijos de 1 a 3 letras para que
+``q=a`` no tenga que unir las listas de todas las palabras que empiezan
+con ``a``. En PostgreSQL se usa un indice GIN
+sobre ``to_tsvector`` y uno ``text_pattern_ops`` para los prefijos.
+
+Se crean junto con ``main_empleado`` en ``create_all`` y en DBs existentes
+con las migraciones de busqueda, ver ``app.config.migrations``.
+"""
+from typing import Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import column, table
+
+from .empleado import Empleado
+
+FTS_TABLE = "main_empleado_fts"
+
+# Tabla FTS5 para las consultas, ``rank`` no se usa porque se ordena por id
+fts = table(FTS_TABLE, column("rowid"), column(FTS_TABLE))
+
+# Debe ser identica en la consulta y en el indice para que se use
+TSVECTOR = (
+    "to_tsvector('simple', "
+    "main_empleado.nombre || ' ' || main_empleado.apellidos)"
+)
+
+# Columnas de la tabla FTS5, deben existir en ``main_empleado``
+FTS_COLUMNS = "nombre, apellidos, comercio_id"
+_NEW = "new.id, new.nombre, new.apellidos, new.comercio_id"
+_OLD = "'delete', old.id, old.nombre, old.apellidos, old.comercio_id"
+_FTS_TRIGGERS = (
+    "main_empleado_fts_ai",
+    "main_empleado_fts_ad",
+    "main_empleado_fts_au",
+)
+
+_SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{FTS_COLUMNS}, content='main_empleado', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')",
+    "CREATE TRIGGER IF NOT EXISTS main_empleado_fts_ai AFTER INSERT ON "
+    f"main_empleado BEGIN INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) "
+    f"VALUES ({_NEW}); END",
+    "CREATE TRIGGER IF NOT EXISTS main_empleado_fts_ad AFTER DELETE ON "
+    f"main_empleado BEGIN INSERT INTO {FTS_TABLE}"
+    f"({FTS_TABLE}, rowid, {FTS_COLUMNS}) VALUES ({_OLD}); END",
+    "CREATE TRIGGER IF NOT EXISTS main_empleado_fts_au AFTER UPDATE OF "
+    f"{FTS_COLUMNS} ON main_empleado BEGIN INSERT INTO "
+    f"{FTS_TABLE}({FTS_TABLE}, rowid, {FTS_COLUMNS}) VALUES ({_OLD}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) VALUES ({_NEW}); END",
+    "CREATE INDEX IF NOT EXISTS main_empleado_comercio_id_nombre_idx "
+    "ON main_empleado (comercio_id, lower(nombre))",
+    "CREATE INDEX IF NOT EXISTS main_empleado_comercio_id_apellidos_idx "
+    "ON main_empleado (comercio_id, lower(apellidos))",
+    # Carga las filas que ya existian en la tabla
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+_POSTGRESQL_DDL = [
+    "CREATE INDEX IF NOT EXISTS main_empleado_search_idx "
+    f"ON main_empleado USING gin ({TSVECTOR.replace('main_empleado.', '')})",
+    "CREATE INDEX IF NOT EXISTS main_empleado_comercio_id_nombre_idx "
+    "ON main_empleado (comercio_id, lower(nombre) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS main_empleado_comercio_id_apellidos_idx "
+    "ON main_empleado (comercio_id, lower(apellidos) text_pattern_ops)",
+]
+
+SEARCH_DDL: Dict[str, List[str]] = {
+    "sqlite": _SQLITE_DDL,
+    "postgresql": _POSTGRESQL_DDL,
+}
+
+
+def create_search_indexes(connection: Connection) -> None:
+    """Crea los indices de busqueda del backend, se puede correr varias
+    veces
+    """
+    for statement in SEARCH_DDL.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+def drop_search_indexes(connection: Connection) -> None:
+    # Los triggers e indices se eliminan junto con main_empleado
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def rebuild_search_indexes(connection: Connection) -> None:
+    """Vuelve a crear la tabla FTS5 y sus triggers con las columnas
+    actuales, en PostgreSQL solo crea los indices que falten
+    """
+    if connection.dialect.name == "sqlite":
+        for trigger in _FTS_TRIGGERS:
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+        drop_search_indexes(connection)
+    create_search_indexes(connection)
+
+
+@event.listens_for(Empleado.__table__, "after_create")
+def _after_create(target, connection, **kw):
+    create_search_indexes(connection)
+
+
+@event.listens_for(Empleado.__table__, "after_drop")
+def _after_drop(target, connection, **kw):
+    drop_search_indexes(connection)
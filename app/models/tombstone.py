@@ -0,0 +1,43 @@
+import datetime as _dt
+
+from sqlalchemy import Column, ForeignKey, Index
+from sqlalchemy.sql.sqltypes import BigInteger, DateTime, Integer
+
+from app.config.db import Base
+from app.models.types import StoredUUID
+
+
+class EmpleadoTombstone(Base):
+    """Empleado removido, lo crean los triggers de app.models.changes para
+    que ``GET /empleados/changes`` reporte el borrado
+    """
+
+    __tablename__ = "main_empleado_tombstone"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    comercio_id = Column(
+        BigInteger, ForeignKey("main_comercio.id"), nullable=False
+    )
+    uuid = Column(StoredUUID(), nullable=False)
+    change_seq = Column(BigInteger, nullable=False)
+    fecha_borrado = Column(
+        DateTime, default=_dt.datetime.utcnow, nullable=False
+    )
+
+    def __repr__(self):
+        return (
+            f"EmpleadoTombstone(id={self.id!r}, "
+            f"uuid={self.uuid!r}, "
+            f"change_seq={self.change_seq!r})"
+        )
+
+    __table_args__ = (
+        # Cambios de un comercio despues de un cursor
+        Index(
+            "main_empleado_tombstone_comercio_id_change_seq_idx",
+            "comercio_id",
+            "change_seq",
+        ),
+        # python -m app.cli compact
+        Index("main_empleado_tombstone_fecha_borrado_idx", "fecha_borrado"),
+    )
@@ -0,0 +1,95 @@
+"""Tipos de columna compartidos por los modelos
+
+Los uuid se guardan como CHAR(32) (``uuid.hex``, el formato de la DB
+original de Django) o como BINARY(16) con ``DAPP_UUID_BINARY=1``, que
+reduce a la mitad las llaves y los indices en SQLite. En PostgreSQL se usa
+el tipo ``uuid`` nativo y la configuracion no aplica.
+
+Para cambiar una DB existente de formato sin detener la aplicacion:
+
+1. Desplegar con el formato nuevo y ``DAPP_UUID_MIXED=1``: se escribe en el
+   formato nuevo y las busquedas por uuid aceptan los dos formatos.
+2. Correr ``python -m app.cli uuid-migrate``, que reescribe las filas por
+   lotes y se puede interrumpir y volver a correr.
+3. Desplegar sin ``DAPP_UUID_MIXED``.
+"""
+import uuid as _uuid
+from typing import Any, Iterable, List
+
+from sqlalchemy import bindparam
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BindParameter, ClauseElement
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy_utils import UUIDType
+
+from app.config.settings import settings
+
+# Tipos de los parametros de cada formato durante la migracion
+_TEXT = UUIDType(binary=False)
+_BINARY = UUIDType(binary=True)
+
+
+class StoredUUID(UUIDType):
+    """``UUIDType`` que lee los uuid en cualquiera de los dos formatos
+
+    ``binary`` y ``mixed`` se leen de ``settings`` en cada uso. Con
+    ``mixed`` las comparaciones ``==`` e ``in_`` con valores de Python
+    buscan el uuid en los dos formatos, en SQLite es una busqueda mas en el
+    mismo indice.
+    """
+
+    cache_ok = True
+
+    def __init__(self):
+        self.native = True
+
+    @property
+    def binary(self) -> bool:
+        return settings.uuid_binary
+
+    @property
+    def mixed(self) -> bool:
+        return settings.uuid_mixed
+
+    # Se omiten los procesadores de BINARY(16) porque fallan con las filas
+    # que siguen como texto
+    def bind_processor(self, dialect):
+        process = self.process_bind_param
+        return lambda value: process(value, dialect)
+
+    def result_processor(self, dialect, coltype):
+        process = self.process_result_value
+        return lambda value: process(value, dialect)
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, _uuid.UUID):
+            return value
+        if isinstance(value, bytes):
+            return _uuid.UUID(bytes=value)
+        return _uuid.UUID(value)
+
+    class comparator_factory(TypeDecorator.Comparator):
+        def operate(self, op, *other, **kwargs):
+            if self.type.mixed and op in (operators.eq, operators.in_op):
+                values = [other[0]] if op is operators.eq else other[0]
+                if isinstance(values, (list, tuple)) and _plain(values):
+                    other = (_both_formats(values),)
+                    op = operators.in_op
+            return super().operate(op, *other, **kwargs)
+
+
+def _plain(values: List[Any]) -> bool:
+    return bool(values) and not any(
+        value is None or isinstance(value, ClauseElement) for value in values
+    )
+
+
+def _both_formats(values: Iterable[Any]) -> List[BindParameter]:
+    """Un parametro por formato, un uuid invalido genera StatementError al
+    ejecutarse igual que con un solo formato
+    """
+    return [
+        bindparam(None, value, type_=type_)
+        for value in values
+        for type_ in (_TEXT, _BINARY)
+    ]
@@ -1,36 +1,494 @@
-from typing import List, Union
+import base64
+import binascii
+import collections
+import datetime as _dt
+import heapq
+import itertools
+import types
+import uuid as _uuid
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Union
 
-from fastapi import APIRouter, Depends
+import orjson
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import insert
+from sqlalchemy.engine import Row
 from sqlalchemy.exc import IntegrityError, StatementError
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import ColumnElement, Select
 
-from app.config.authentication import get_auth
-from app.config.db import get_db
+from app.config.admission import admit
+from app.config.authentication import get_auth, get_read_db
+from app.config.cache import MISSING
+from app.config.db import get_db, mark_written
 from app.config.exceptions import (
+    BaseException,
     DuplicatedPinError,
+    ExpiredCursorError,
+    InactiveEmpleadoError,
+    InvalidCursorError,
     InvalidEmpleadoError,
+    InvalidPinError,
     NoEmpleadoError,
 )
-from app.models.comercio import Comercio
+from app.config.pin_cache import PinEntry, pin_cache
+from app.config.roster_cache import Roster, roster_cache
+from app.crud.comercio import (
+    bump_roster_version,
+    select_change_status,
+    select_empleados_stats,
+    select_roster_status,
+    select_roster_version,
+)
+from app.crud.empleado import (
+    delete_empleados,
+    search_conditions,
+    select_empleado,
+    select_empleado_by_pin,
+    select_empleado_changes,
+    select_empleados,
+    select_empleados_by_uuid,
+    select_pin_owners,
+    select_tombstones,
+    supports_returning,
+)
+from app.crud.empleado import update_empleado as update_empleado_statement
+from app.crud.empleado import update_empleados
 from app.models.empleado import Empleado
+from app.schemas.comercio import ComercioSchema
 from app.schemas.empleado import (
     BaseResponse,
+    BulkEmpleadosResponse,
     EmpleadoResponse,
+    EmpleadosChangesResponse,
     EmpleadoSchema,
     EmpleadosResponse,
+    EmpleadosStats,
+    EmpleadosStatsResponse,
     NewEmpleado,
+    PatchEmpleado,
     UpdateEmpleado,
+    VerifyPin,
+    serialize_empleado,
 )
 
+# Todas las rutas pasan por el control de admision, ver app.config.admission
 empleado = APIRouter(
     tags=["Empleados"],
+    dependencies=[Depends(admit)],
 )
+# Rutas que solo regresan un error, sin autenticacion ni admision
+empleado_need_id = APIRouter(include_in_schema=False)
 _empleados_exclude = {"data": {"__all__": {"nombre", "apellidos", "uuid"}}}
 _empleado_exclude = {"data": {"nombre", "apellidos", "uuid"}}
+_bulk_exclude = {"data": {"__all__": _empleado_exclude}}
+_changes_exclude = {"data": {"empleados": _empleados_exclude["data"]}}
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 500
+STREAM_JSON_START = b'{"rc":0,"msg":"Ok","data":['
+STREAM_JSON_END = b'],"next_cursor":null}'
+
+# SQLite limita el numero de parametros por sentencia
+BULK_BATCH_SIZE = 100
+
+
+def _after_write(comercio_id: int):
+    """Se llama despues del commit de cada escritura en los empleados"""
+    roster_cache.invalidate(comercio_id)
+    mark_written(comercio_id)
+
+
+def _batches(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _encode_cursor(empleado_id: int) -> str:
+    """El cursor es opaco para el cliente, solo contiene el ultimo id"""
+    return base64.urlsafe_b64encode(str(empleado_id).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidCursorError()
+
+
+def _search_filters(
+    activo: Optional[bool] = None,
+    nombre: Optional[str] = Query(None, max_length=40),
+    apellidos: Optional[str] = Query(None, max_length=40),
+    q: Optional[str] = Query(None, max_length=100),
+) -> dict:
+    """Filtros de busqueda de ``GET /empleados``
+
+    ``nombre`` y ``apellidos`` son prefijos y ``q`` busca cada palabra
+    como prefijo de alguna palabra del nombre completo, sin importar
+    mayusculas. Ver ``search_conditions``.
+    """
+    filters = dict(activo=activo, nombre=nombre, apellidos=apellidos, q=q)
+    # Se omiten los filtros vacios, ``activo=false`` si se conserva
+    return {
+        key: value for key, value in filters.items() if value or value is False
+    }
+
+
+def _list_statement(
+    comercio_id: int,
+    limit: Optional[int],
+    cursor: Optional[str],
+    conditions: Sequence[ColumnElement] = (),
+) -> Select:
+    if limit is None and cursor is None:
+        return select_empleados(comercio_id, conditions=conditions)
+
+    # Se pide un registro extra para saber si existe otra pagina
+    return select_empleados(
+        comercio_id,
+        after_id=None if cursor is None else _decode_cursor(cursor),
+        limit=(limit or DEFAULT_PAGE_SIZE) + 1,
+        conditions=conditions,
+    )
+
+
+def _list_response(
+    empleados_from_db: List[Row],
+    limit: Optional[int],
+    cursor: Optional[str],
+) -> ORJSONResponse:
+    """Respuesta de EmpleadosResponse sin volver a validar con pydantic"""
+    next_cursor: Union[str, None] = None
+    if limit is not None or cursor is not None:
+        limit = limit or DEFAULT_PAGE_SIZE
+        if len(empleados_from_db) > limit:
+            empleados_from_db = empleados_from_db[:limit]
+            next_cursor = _encode_cursor(empleados_from_db[-1].id)
+
+    return ORJSONResponse(
+        {
+            "rc": 0,
+            "msg": "Ok",
+            "data": [serialize_empleado(e) for e in empleados_from_db],
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+def _changes_since(
+    since: Optional[str], change_seq: int, purged_seq: int
+) -> int:
+    """Valor de la secuencia del cursor ``since``, 0 si no se envia
+
+    Si ya se compactaron borrados posteriores al cursor, o el cursor es
+    mayor que la secuencia actual (por ejemplo despues de restaurar un
+    respaldo), el cliente debe volver a sincronizar sin ``since``.
+    """
+    if since is None:
+        return 0
+    after_seq = _decode_cursor(since)
+    if after_seq < 0:
+        raise InvalidCursorError()
+    if after_seq < purged_seq or after_seq > change_seq:
+        raise ExpiredCursorError()
+    return after_seq
+
+
+def _changes_response(
+    empleados: List[Row], tombstones: List[Row], change_seq: int, limit: int
+) -> ORJSONResponse:
+    """Une los cambios y los borrados en el orden de la secuencia y corta
+    en ``limit``, el cursor es el ultimo cambio que se regresa
+
+    Las consultas se limitan a ``change_seq``, la secuencia que se leyo
+    antes que ellas, y el cursor nunca la rebasa: un cambio que se confirma
+    entre las consultas puede aparecer en una y no en la otra, si el cursor
+    lo rebasara el cliente no volveria a recibir el cambio de la otra.
+    """
+    changes = list(
+        itertools.islice(
+            heapq.merge(
+                ((row, False) for row in empleados),
+                ((row, True) for row in tombstones),
+                key=lambda change: change[0].change_seq,
+            ),
+            limit + 1,
+        )
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if has_more:
+        change_seq = changes[-1][0].change_seq
+
+    return ORJSONResponse(
+        {
+            "rc": 0,
+            "msg": "Ok",
+            "data": {
+                "empleados": [
+                    serialize_empleado(row)
+                    for row, deleted in changes
+                    if not deleted
+                ],
+                "deleted": [
+                    str(row.uuid) for row, deleted in changes if deleted
+                ],
+            },
+            "next_cursor": _encode_cursor(change_seq),
+            "has_more": has_more,
+        }
+    )
+
+
+def _empleado_response(empleado: Union[Empleado, Row]) -> ORJSONResponse:
+    """Respuesta de EmpleadoResponse sin volver a validar con pydantic"""
+    return ORJSONResponse(
+        {"rc": 0, "msg": "Ok", "data": serialize_empleado(empleado)}
+    )
+
+
+def _is_full_list(
+    limit: Optional[int],
+    cursor: Optional[str],
+    stream: bool,
+    ndjson: bool,
+    filters: dict,
+) -> bool:
+    """El listado completo sin paginar es el unico que se guarda en cache"""
+    return (
+        limit is None
+        and cursor is None
+        and not stream
+        and not ndjson
+        and not filters
+    )
+
+
+def _roster_response(roster: Roster, etag: str) -> Response:
+    return Response(
+        roster.list_response(),
+        media_type="application/json",
+        headers={"ETag": etag},
+    )
+
+
+def _cached_empleado_response(
+    roster: Roster, uuid: str, etag: str
+) -> Response:
+    """Respuesta desde el cache, que tiene a todos los empleados del
+    comercio, por lo que un UUID que no esta no existe
+    """
+    body = roster.empleado_response(uuid)
+    if body is None:
+        raise InvalidEmpleadoError()
+    return Response(
+        body,
+        media_type="application/json",
+        headers={"ETag": etag},
+    )
 
 
-@empleado.put("/empleados", include_in_schema=False)
-@empleado.delete("/empleados", include_in_schema=False)
+def _pin_entry(empleado: Optional[Row]) -> PinEntry:
+    if empleado is None:
+        return None
+    return empleado.activo, orjson.dumps(serialize_empleado(empleado))
+
+
+def _verify_pin_response(entry: PinEntry) -> Response:
+    """Mismo contenido que EmpleadoResponse si el PIN es de un empleado
+    activo
+    """
+    if entry is None:
+        raise InvalidPinError()
+    activo, body = entry
+    if not activo:
+        raise InactiveEmpleadoError()
+    return Response(
+        b'{"rc":0,"msg":"Ok","data":%s}' % body,
+        media_type="application/json",
+    )
+
+
+def _roster_etag(comercio_id: int, version: int, ndjson: bool = False):
+    """ETag fuerte de las rutas de lectura, cambia con cada escritura en
+    los empleados del comercio
+    """
+    suffix = "-ndjson" if ndjson else ""
+    return f'"{comercio_id}-{version}{suffix}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match usa comparacion debil, se ignora el prefijo W/
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def _not_modified(etag: str, headers: Optional[dict] = None) -> Response:
+    return Response(status_code=304, headers={**(headers or {}), "ETag": etag})
+
+
+def _update_values(empleado: UpdateEmpleado) -> dict:
+    return {
+        "nombre": empleado.nombre,
+        "apellidos": empleado.apellidos,
+        "pin": empleado.pin,
+        # La unica forma en que activo sea false es que venga 0 como string
+        # Esto es por que asi estaba en el antiguo sistema y se debe respetar
+        "activo": empleado.activo != "0",
+    }
+
+
+def _patch_values(empleado: PatchEmpleado) -> dict:
+    values = {
+        field: getattr(empleado, field)
+        for field in ("nombre", "apellidos", "pin")
+        if getattr(empleado, field) is not None
+    }
+    if empleado.activo != "NO_EXISTS":
+        values["activo"] = empleado.activo != "0"
+    return values
+
+
+def _parse_uuids(ids: Sequence[str]) -> List[Optional[_uuid.UUID]]:
+    """Uuid de cada id de la peticion, None si es invalido o repetido"""
+    seen: Set[_uuid.UUID] = set()
+    uuids: List[Optional[_uuid.UUID]] = []
+    for value in ids:
+        try:
+            uuid = _uuid.UUID(value)
+        except (TypeError, ValueError):
+            uuid = None
+        if uuid in seen:
+            uuid = None
+        seen.add(uuid)
+        uuids.append(uuid)
+    return uuids
+
+
+def _existing_empleados(
+    db: Session, comercio_id: int, uuids: Sequence[Optional[_uuid.UUID]]
+) -> Dict[_uuid.UUID, Row]:
+    valid = [uuid for uuid in uuids if uuid is not None]
+    return {
+        empleado.uuid: empleado
+        for batch in _batches(valid, BULK_BATCH_SIZE)
+        for empleado in db.execute(
+            select_empleados_by_uuid(comercio_id, batch)
+        )
+    }
+
+
+def _accept_pin_changes(
+    new_pins: Dict[_uuid.UUID, str], holders: Dict[str, _uuid.UUID]
+) -> List[_uuid.UUID]:
+    """Empleados de ``new_pins`` que pueden tomar su PIN nuevo, en el orden
+    en que se deben editar
+
+    ``holders`` es el empleado que tiene cada PIN antes de la peticion. Un
+    PIN queda libre hasta que se acepta el cambio del empleado que lo
+    tiene, los demas esperan a ese cambio en el orden de la peticion. Los
+    que no se aceptan, como un PIN que conserva otro empleado, uno que se
+    repite o los intercambios entre empleados, se reportan como
+    Duplicated PIN; editar en este orden no choca con el indice unico.
+    """
+    accepted: Dict[_uuid.UUID, None] = {}
+    claimed: Set[str] = set()
+    waiting: Dict[_uuid.UUID, List[_uuid.UUID]] = {}
+    pending = collections.deque(new_pins)
+    while pending:
+        uuid = pending.popleft()
+        pin = new_pins[uuid]
+        if pin in claimed:
+            continue
+        holder = holders.get(pin)
+        if holder is not None and holder not in accepted:
+            if holder in new_pins:
+                waiting.setdefault(holder, []).append(uuid)
+            continue
+        claimed.add(pin)
+        accepted[uuid] = None
+        # Los que esperaban el PIN que se libera se revisan antes que el
+        # resto para conservar el orden de la peticion
+        pending.extendleft(reversed(waiting.pop(uuid, [])))
+    return list(accepted)
+
+
+def _error_response(error: BaseException) -> dict:
+    """Fila de una respuesta bulk con el mismo formato que el error de las
+    rutas de un empleado, sin ``data``
+    """
+    return error.to_dict()
+
+
+def _bulk_row(empleado: Optional[Any] = None) -> dict:
+    """Fila de una respuesta bulk sin error, ``data`` solo si hay empleado"""
+    row = {"rc": 0, "msg": "Ok"}
+    if empleado is not None:
+        row["data"] = serialize_empleado(empleado)
+    return row
+
+
+def _bulk_response(rows: List[dict]) -> ORJSONResponse:
+    """Respuesta de BulkEmpleadosResponse sin volver a validar con pydantic"""
+    return ORJSONResponse({"rc": 0, "msg": "Ok", "data": rows})
+
+
+def _render_empleado(empleado: Row) -> bytes:
+    return orjson.dumps(serialize_empleado(empleado))
+
+
+def _stream_statement(
+    comercio_id: int, conditions: Sequence[ColumnElement] = ()
+) -> Select:
+    """Consulta para el streaming, se lee por bloques de un cursor del
+    servidor en lugar de cargar todo el listado
+    """
+    return select_empleados(
+        comercio_id, conditions=conditions
+    ).execution_options(stream_results=True)
+
+
+def _render_chunk(empleados: Sequence[Row], ndjson: bool, first: bool):
+    """Serializa un bloque del streaming
+
+    En JSON se regresa el mismo sobre que EmpleadosResponse, en NDJSON
+    cada linea tiene el formato de EmpleadoResponse.
+    """
+    if ndjson:
+        return b"".join(
+            b'{"rc":0,"msg":"Ok","data":%s}\n' % _render_empleado(empleado)
+            for empleado in empleados
+        )
+    chunk = b",".join(_render_empleado(empleado) for empleado in empleados)
+    return chunk if first else b"," + chunk
+
+
+def _stream_empleados(
+    db: Session, statement: Select, ndjson: bool
+) -> Iterator[bytes]:
+    result = db.execute(statement)
+    if not ndjson:
+        yield STREAM_JSON_START
+
+    first = True
+    for empleados in result.partitions(STREAM_BATCH_SIZE):
+        yield _render_chunk(empleados, ndjson, first)
+        first = False
+
+    if not ndjson:
+        yield STREAM_JSON_END
+
+
+@empleado_need_id.put("/empleados")
+@empleado_need_id.delete("/empleados")
 def need_id():
     raise NoEmpleadoError()
 
@@ -40,15 +498,154 @@ def need_id():
     response_model=EmpleadosResponse,
     response_model_exclude=_empleados_exclude,
 )
-def get_empleados(comercio: Comercio = Depends(get_auth)):
-    """Regresa todos los empleados"""
-    empleados: List[EmpleadoSchema] = []
-    for empleado in comercio.empleados:
-        empleados.append(EmpleadoSchema.from_orm(empleado))
-    response = EmpleadosResponse(data=empleados)
+def get_empleados(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    filters: dict = Depends(_search_filters),
+    db: Session = Depends(get_read_db),
+    comercio: ComercioSchema = Depends(get_auth),
+):
+    """Regresa todos los empleados
+
+    Si se envia ``limit`` o ``cursor`` se pagina por id, el siguiente
+    cursor se regresa en ``next_cursor`` y es null en la ultima pagina.
+    Sin esos parametros se regresan todos como en la anterior API.
+
+    Con ``?stream=1`` o ``Accept: application/x-ndjson`` se regresa todo
+    el listado por streaming sin cargarlo en memoria, en ese modo se
+    ignoran ``limit`` y ``cursor``.
+
+    Se regresa un ETag, si coincide con ``If-None-Match`` se responde 304
+    sin consultar los empleados.
+
+    Se puede filtrar con ``activo``, los prefijos ``nombre`` y
+    ``apellidos`` y el texto ``q``, tambien al paginar o con streaming.
+
+    El listado completo se guarda ya serializado en ``roster_cache``.
+    """
+    ndjson = bool(accept) and NDJSON_MEDIA_TYPE in accept
+    full = _is_full_list(limit, cursor, stream, ndjson, filters)
+    generation = roster_cache.generation(comercio.id)
+    # La version se lee antes que los empleados, si hay una escritura en
+    # medio el cliente recibe datos mas nuevos que su ETag y no al reves.
+    # Tambien decide si sirve el listado del cache, que pudo quedar viejo
+    # por una escritura en otro worker
+    version = db.execute(select_roster_version(comercio.id)).scalar()
+    etag = _roster_etag(comercio.id, version, ndjson)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+
+    roster = roster_cache.get(comercio.id, version) if full else None
+    if roster is not None:
+        return _roster_response(roster, etag)
+
+    conditions = search_conditions(
+        db.get_bind().dialect.name, comercio.id, **filters
+    )
+    if stream or ndjson:
+        return StreamingResponse(
+            _stream_empleados(
+                db, _stream_statement(comercio.id, conditions), ndjson
+            ),
+            media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json",
+            headers={"ETag": etag},
+        )
+
+    statement = _list_statement(comercio.id, limit, cursor, conditions)
+    empleados_from_db: List[Row] = db.execute(statement).all()
+    if full:
+        roster = Roster(version, empleados_from_db)
+        roster_cache.put(comercio.id, roster, generation)
+        return _roster_response(roster, etag)
+
+    response = _list_response(empleados_from_db, limit, cursor)
+    response.headers["ETag"] = etag
     return response
 
 
+@empleado.head("/empleados", include_in_schema=False)
+def head_empleados(
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+    comercio: ComercioSchema = Depends(get_auth),
+):
+    """Regresa el ETag y el numero de empleados en X-Total-Count"""
+    version, total = db.execute(select_roster_status(comercio.id)).one()
+    etag = _roster_etag(comercio.id, version)
+    headers = {"X-Total-Count": str(total)}
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag, headers)
+    return Response(headers={**headers, "ETag": etag})
+
+
+def _stats_response(total: int, activos: int) -> EmpleadosStatsResponse:
+    return EmpleadosStatsResponse(
+        data=EmpleadosStats(
+            total=total, activos=activos, inactivos=total - activos
+        )
+    )
+
+
+@empleado.get("/empleados/stats", response_model=EmpleadosStatsResponse)
+def get_empleados_stats(
+    db: Session = Depends(get_read_db),
+    comercio: ComercioSchema = Depends(get_auth),
+):
+    """Numero de empleados del comercio, activos e inactivos
+
+    Se leen los contadores de ``main_comercio`` que mantienen los triggers
+    de ``app.models.counters``, no se cuentan los empleados.
+    """
+    total, activos = db.execute(select_empleados_stats(comercio.id)).one()
+    return _stats_response(total, activos)
+
+
+@empleado.get(
+    "/empleados/changes",
+    response_model=EmpleadosChangesResponse,
+    response_model_exclude=_changes_exclude,
+)
+def get_empleados_changes(
+    since: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    comercio: ComercioSchema = Depends(get_auth),
+):
+    """Empleados creados, editados o removidos despues del cursor ``since``
+
+    Sin ``since`` se regresan todos los empleados. Se debe guardar
+    ``next_cursor`` y enviarlo como ``since`` en la siguiente llamada,
+    mientras ``has_more`` sea true hay mas cambios. El cliente aplica
+    ``deleted`` y despues ``empleados``.
+
+    Si el cursor es anterior a los borrados que se compactaron (ver
+    ``DAPP_TOMBSTONE_RETENTION_DAYS``) se regresa Expired cursor y el
+    cliente debe volver a sincronizar sin ``since``.
+    """
+    change_seq, purged_seq = db.execute(
+        select_change_status(comercio.id)
+    ).one()
+    after_seq = _changes_since(since, change_seq, purged_seq)
+    if after_seq == change_seq:
+        return _changes_response([], [], change_seq, limit)
+
+    empleados = db.execute(
+        select_empleado_changes(comercio.id, after_seq, change_seq, limit + 1)
+    ).all()
+    # En la primera sincronizacion no hay nada que remover
+    tombstones = (
+        db.execute(
+            select_tombstones(comercio.id, after_seq, change_seq, limit + 1)
+        ).all()
+        if since is not None
+        else []
+    )
+    return _changes_response(empleados, tombstones, change_seq, limit)
+
+
 @empleado.get(
     "/empleados/{uuid}",
     response_model=EmpleadoResponse,
@@ -56,39 +653,207 @@ def get_empleados(comercio: Comercio = Depends(get_auth)):
 )
 def get_empleado(
     uuid: str,
-    db: Session = Depends(get_db),
-    comercio: Comercio = Depends(get_auth),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+    comercio: ComercioSchema = Depends(get_auth),
 ):
     """Obtiene un empleado por su UUID"""
+    version = db.execute(select_roster_version(comercio.id)).scalar()
+    etag = _roster_etag(comercio.id, version)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+
+    roster = roster_cache.get(comercio.id, version)
+    if roster is not None:
+        return _cached_empleado_response(roster, uuid, etag)
+
     try:
-        empleado_from_db: Union[Empleado, None] = (
-            db.query(Empleado).filter_by(uuid=uuid, comercio=comercio).first()
-        )
+        empleado_from_db: Union[Row, None] = db.execute(
+            select_empleado(comercio.id, uuid)
+        ).first()
     except StatementError:
         raise InvalidEmpleadoError()
 
     if not empleado_from_db:
         raise InvalidEmpleadoError()
 
-    empleado: EmpleadoSchema = EmpleadoSchema.from_orm(empleado_from_db)
-    return EmpleadoResponse(data=empleado)
+    response = _empleado_response(empleado_from_db)
+    response.headers["ETag"] = etag
+    return response
+
+
+@empleado.post(
+    "/empleados/verify-pin",
+    response_model=EmpleadoResponse,
+    response_model_exclude=_empleado_exclude,
+)
+def verify_pin(
+    payload: VerifyPin,
+    db: Session = Depends(get_read_db),
+    comercio: ComercioSchema = Depends(get_auth),
+):
+    """Valida que el PIN sea de un empleado activo del comercio
+
+    Es la consulta de los relojes checadores, se resuelve con el indice
+    unico (pin, comercio_id) y se guarda en ``pin_cache`` por la
+    ``roster_version`` del comercio, que se lee en cada peticion para ver
+    las escrituras de todos los workers. Un PIN que no existe regresa
+    Invalid PIN y el de un empleado inactivo Inactive employee.
+    """
+    version = db.execute(select_roster_version(comercio.id)).scalar()
+    entry = pin_cache.get(comercio.id, version, payload.pin)
+    if entry is MISSING:
+        empleado_from_db: Optional[Row] = db.execute(
+            select_empleado_by_pin(comercio.id, payload.pin)
+        ).first()
+        entry = _pin_entry(empleado_from_db)
+        pin_cache.put(comercio.id, version, payload.pin, entry)
+    return _verify_pin_response(entry)
+
+
+@empleado.patch(
+    "/empleados/bulk",
+    response_model=BulkEmpleadosResponse,
+    response_model_exclude=_bulk_exclude,
+)
+def update_empleados_bulk(
+    empleados: List[PatchEmpleado],
+    db: Session = Depends(get_db),
+    comercio: ComercioSchema = Depends(get_auth),
+):
+    """Edita varios empleados en una sola transaccion
+
+    Los empleados con los mismos cambios se editan con un solo UPDATE. Un
+    id invalido, repetido o que no existe se reporta como Invalid id y un
+    PIN que ya usa otro empleado como Duplicated PIN, sin afectar al resto.
+    Se puede tomar el PIN de un empleado que lo cambia en la misma
+    peticion, pero no intercambiarlo, ver ``_accept_pin_changes``.
+    """
+    uuids = _parse_uuids([empleado.id for empleado in empleados])
+    existing = _existing_empleados(db, comercio.id, uuids)
+    changes: List[Optional[dict]] = [
+        _patch_values(empleado) if uuid in existing else None
+        for empleado, uuid in zip(empleados, uuids)
+    ]
+
+    new_pins: Dict[_uuid.UUID, str] = {}
+    for uuid, values in zip(uuids, changes):
+        if values and values.get("pin", existing[uuid].pin) != (
+            existing[uuid].pin
+        ):
+            new_pins[uuid] = values["pin"]
+    pins = list(set(new_pins.values()))
+    holders: Dict[str, _uuid.UUID] = {
+        pin: owner
+        for batch in _batches(pins, BULK_BATCH_SIZE)
+        for (owner, pin) in db.execute(select_pin_owners(comercio.id, batch))
+    }
+    accepted = _accept_pin_changes(new_pins, holders)
+    accepted_pins = set(accepted)
+
+    # None en results son los empleados que si se editan
+    results: List[Optional[dict]] = []
+    groups: Dict[tuple, List[_uuid.UUID]] = {}
+    for uuid, values in zip(uuids, changes):
+        if values is None:
+            results.append(_error_response(InvalidEmpleadoError()))
+        elif uuid in new_pins and uuid not in accepted_pins:
+            results.append(_error_response(DuplicatedPinError()))
+        else:
+            results.append(None)
+            if values and uuid not in new_pins:
+                groups.setdefault(tuple(sorted(values.items())), []).append(
+                    uuid
+                )
+    # Cada PIN nuevo es distinto, por lo que esos cambios son grupos de un
+    # empleado que se editan en el orden en que se aceptaron
+    values_by_uuid = dict(zip(uuids, changes))
+    for uuid in accepted:
+        groups[tuple(sorted(values_by_uuid[uuid].items()))] = [uuid]
+
+    updated = [uuid for uuid, result in zip(uuids, results) if result is None]
+    try:
+        for values, group in groups.items():
+            for batch in _batches(group, BULK_BATCH_SIZE):
+                db.execute(update_empleados(comercio.id, batch, dict(values)))
+        if groups:
+            db.execute(bump_roster_version(comercio.id))
+        rows = _existing_empleados(db, comercio.id, updated)
+        db.commit()
+        if groups:
+            _after_write(comercio.id)
+    except IntegrityError:
+        # Otra peticion tomo uno de los PIN despues de la consulta
+        db.rollback()
+        raise DuplicatedPinError()
+
+    return _bulk_response(
+        [
+            result or _bulk_row(rows[uuid])
+            for uuid, result in zip(uuids, results)
+        ]
+    )
+
+
+@empleado.delete(
+    "/empleados/bulk",
+    response_model=BulkEmpleadosResponse,
+    response_model_exclude=_bulk_exclude,
+)
+def delete_empleados_bulk(
+    ids: List[str],
+    db: Session = Depends(get_db),
+    comercio: ComercioSchema = Depends(get_auth),
+):
+    """Remueve varios empleados por su UUID en una sola transaccion
+
+    Un id invalido, repetido o que no existe se reporta como Invalid id
+    sin afectar al resto.
+    """
+    uuids = _parse_uuids(ids)
+    existing = list(_existing_empleados(db, comercio.id, uuids))
+    for batch in _batches(existing, BULK_BATCH_SIZE):
+        db.execute(delete_empleados(comercio.id, batch))
+    if existing:
+        db.execute(bump_roster_version(comercio.id))
+    db.commit()
+    if existing:
+        _after_write(comercio.id)
+
+    deleted = set(existing)
+    return _bulk_response(
+        [
+            _bulk_row()
+            if uuid in deleted
+            else _error_response(InvalidEmpleadoError())
+            for uuid in uuids
+        ]
+    )
 
 
 @empleado.delete("/empleados/{uuid}", response_model=BaseResponse)
 def delete_empleado(
     uuid: str,
     db: Session = Depends(get_db),
-    comercio: Comercio = Depends(get_auth),
+    comercio: ComercioSchema = Depends(get_auth),
 ):
     """Remueve un empleado por su UUID"""
     try:
         deletes = (
-            db.query(Empleado).filter_by(uuid=uuid, comercio=comercio).delete()
+            db.query(Empleado)
+            .filter_by(uuid=uuid, comercio_id=comercio.id)
+            .delete()
         )
+        if deletes:
+            db.execute(bump_roster_version(comercio.id))
         db.commit()
     except StatementError:
+        db.rollback()
         raise InvalidEmpleadoError()
 
+    if deletes:
+        _after_write(comercio.id)
+
     if not deletes:
         raise InvalidEmpleadoError()
 
@@ -104,26 +869,93 @@ def delete_empleado(
 def create_empleado(
     empleado: NewEmpleado,
     db: Session = Depends(get_db),
-    comercio: Comercio = Depends(get_auth),
+    comercio: ComercioSchema = Depends(get_auth),
 ):
     """Crea un nuevo empleado"""
     new_empleado: Empleado = Empleado(
         nombre=empleado.nombre,
         apellidos=empleado.apellidos,
         pin=empleado.pin,
-        comercio=comercio,
+        comercio_id=comercio.id,
     )
     db.add(new_empleado)
     try:
+        db.flush()
+        # Se lee antes del commit, despues el objeto expira y leerlo
+        # volveria a consultar la fila
+        empleado_schema = EmpleadoSchema.from_orm(new_empleado)
+        db.execute(bump_roster_version(comercio.id))
         db.commit()
+        _after_write(comercio.id)
     except IntegrityError:
         db.rollback()
         raise DuplicatedPinError()
-    empleado_schema = EmpleadoSchema.from_orm(new_empleado)
     response = EmpleadoResponse(data=empleado_schema)
     return response
 
 
+@empleado.post(
+    "/empleados/bulk",
+    response_model=BulkEmpleadosResponse,
+    response_model_exclude=_bulk_exclude,
+)
+def create_empleados(
+    empleados: List[NewEmpleado],
+    db: Session = Depends(get_db),
+    comercio: ComercioSchema = Depends(get_auth),
+):
+    """Crea varios empleados en una sola transaccion
+
+    Los PIN que ya existen en el comercio o que se repiten en la peticion
+    se reportan como Duplicated PIN sin afectar al resto.
+    """
+    pins: List[str] = list({empleado.pin for empleado in empleados})
+    used_pins: Set[str] = set()
+    for batch in _batches(pins, BULK_BATCH_SIZE):
+        used_pins.update(
+            pin
+            for (pin,) in db.query(Empleado.pin).filter(
+                Empleado.comercio_id == comercio.id, Empleado.pin.in_(batch)
+            )
+        )
+
+    fecha_creacion = _dt.datetime.utcnow()
+    results: List[dict] = []
+    new_empleados: List[dict] = []
+    for empleado in empleados:
+        if empleado.pin in used_pins:
+            results.append(_error_response(DuplicatedPinError()))
+            continue
+
+        used_pins.add(empleado.pin)
+        new_empleado = {
+            "uuid": _uuid.uuid4(),
+            "nombre": empleado.nombre,
+            "apellidos": empleado.apellidos,
+            "pin": empleado.pin,
+            "fecha_creacion": fecha_creacion,
+            "activo": True,
+            "comercio_id": comercio.id,
+        }
+        new_empleados.append(new_empleado)
+        results.append(_bulk_row(types.SimpleNamespace(**new_empleado)))
+
+    try:
+        for batch in _batches(new_empleados, BULK_BATCH_SIZE):
+            db.execute(insert(Empleado.__table__).values(batch))
+        if new_empleados:
+            db.execute(bump_roster_version(comercio.id))
+        db.commit()
+        if new_empleados:
+            _after_write(comercio.id)
+    except IntegrityError:
+        # Solo pasa si otra peticion agrego el mismo PIN al mismo tiempo
+        db.rollback()
+        raise DuplicatedPinError()
+
+    return _bulk_response(results)
+
+
 @empleado.put(
     "/empleados/{uuid}",
     response_model=EmpleadoResponse,
@@ -133,32 +965,40 @@ def update_empleado(
     uuid: str,
     empleado: UpdateEmpleado,
     db: Session = Depends(get_db),
-    comercio: Comercio = Depends(get_auth),
+    comercio: ComercioSchema = Depends(get_auth),
 ):
-    """Edita los datos de un empleado por su UUID"""
+    """Edita los datos de un empleado por su UUID
+
+    Se edita con un solo UPDATE, con RETURNING si el backend lo soporta o
+    si no leyendo la fila editada en la misma transaccion.
+    """
+    values = _update_values(empleado)
+    returning = supports_returning(db.get_bind().dialect)
     try:
-        empleado_from_db: Union[Empleado, None] = (
-            db.query(Empleado).filter_by(uuid=uuid, comercio=comercio).first()
+        result = db.execute(
+            update_empleado_statement(comercio.id, uuid, values, returning)
         )
+        if returning:
+            empleado_from_db: Union[Row, None] = result.first()
+        elif result.rowcount:
+            empleado_from_db = db.execute(
+                select_empleado(comercio.id, uuid)
+            ).first()
+        else:
+            empleado_from_db = None
+        if empleado_from_db:
+            db.execute(bump_roster_version(comercio.id))
+        db.commit()
+        if empleado_from_db:
+            _after_write(comercio.id)
+    except IntegrityError:
+        db.rollback()
+        raise DuplicatedPinError()
     except StatementError:
+        db.rollback()
         raise InvalidEmpleadoError()
 
     if not empleado_from_db:
         raise InvalidEmpleadoError()
 
-    empleado_from_db.nombre = empleado.nombre
-    empleado_from_db.apellidos = empleado.apellidos
-    empleado_from_db.pin = empleado.pin
-    # La unica forma en que activo sea false es que venga 0 como string
-    # Esto es por que asi estaba en el antiguo sistema y se debe respetar
-    empleado_from_db.activo = empleado.activo != "0"
-    db.add(empleado_from_db)
-
-    try:
-        db.commit()
-    except IntegrityError:
-        db.rollback()
-        raise DuplicatedPinError()
-
-    empleado: EmpleadoSchema = EmpleadoSchema.from_orm(empleado_from_db)
-    return EmpleadoResponse(data=empleado)
+    return _empleado_response(empleado_from_db)
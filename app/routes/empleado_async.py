@@ -0,0 +1,369 @@
+from typing import AsyncIterator, List, Optional, Union
+
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError, StatementError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.config.admission import admit_async
+from app.config.authentication import get_async_read_db, get_auth_async
+from app.config.cache import MISSING
+from app.config.db import get_async_db
+from app.config.exceptions import DuplicatedPinError, InvalidEmpleadoError
+from app.config.pin_cache import pin_cache
+from app.config.roster_cache import Roster, roster_cache
+from app.crud.comercio import (
+    bump_roster_version,
+    select_change_status,
+    select_empleados_stats,
+    select_roster_version,
+)
+from app.crud.empleado import (
+    search_conditions,
+    select_empleado,
+    select_empleado_by_pin,
+    select_empleado_changes,
+    select_tombstones,
+    supports_returning,
+)
+from app.crud.empleado import update_empleado as update_empleado_statement
+from app.models.empleado import Empleado
+from app.routes.empleado import (
+    MAX_PAGE_SIZE,
+    NDJSON_MEDIA_TYPE,
+    STREAM_BATCH_SIZE,
+    STREAM_JSON_END,
+    STREAM_JSON_START,
+    _after_write,
+    _cached_empleado_response,
+    _changes_exclude,
+    _changes_response,
+    _changes_since,
+    _empleado_exclude,
+    _empleado_response,
+    _empleados_exclude,
+    _etag_matches,
+    _is_full_list,
+    _list_response,
+    _list_statement,
+    _not_modified,
+    _pin_entry,
+    _render_chunk,
+    _roster_etag,
+    _roster_response,
+    _search_filters,
+    _stats_response,
+    _stream_statement,
+    _update_values,
+    _verify_pin_response,
+)
+from app.schemas.comercio import ComercioSchema
+from app.schemas.empleado import (
+    BaseResponse,
+    EmpleadoResponse,
+    EmpleadosChangesResponse,
+    EmpleadoSchema,
+    EmpleadosResponse,
+    EmpleadosStatsResponse,
+    NewEmpleado,
+    UpdateEmpleado,
+    VerifyPin,
+)
+
+# Versiones async de las rutas de empleados, se usan en lugar de las sync
+# cuando se configura DAPP_DB_ASYNC, ver ``replace_routes``
+empleado_async = APIRouter(
+    tags=["Empleados"],
+    dependencies=[Depends(admit_async)],
+)
+
+
+def replace_routes(router: APIRouter, overrides: APIRouter) -> APIRouter:
+    """Regresa un router con las rutas de ``router`` en el mismo orden pero
+    usando las de ``overrides`` cuando coinciden el path y los metodos
+
+    Se respeta el orden para que las rutas fijas como ``/empleados/bulk``
+    se sigan resolviendo antes que ``/empleados/{uuid}``.
+    """
+    replacements = {
+        (route.path, frozenset(route.methods)): route
+        for route in overrides.routes
+    }
+    merged = APIRouter()
+    for route in router.routes:
+        key = (route.path, frozenset(getattr(route, "methods", None) or ()))
+        merged.routes.append(replacements.get(key, route))
+    return merged
+
+
+async def _stream_empleados(
+    db: AsyncSession, statement: Select, ndjson: bool
+) -> AsyncIterator[bytes]:
+    result = await db.stream(statement)
+    if not ndjson:
+        yield STREAM_JSON_START
+
+    first = True
+    async for empleados in result.partitions(STREAM_BATCH_SIZE):
+        yield _render_chunk(empleados, ndjson, first)
+        first = False
+
+    if not ndjson:
+        yield STREAM_JSON_END
+
+
+@empleado_async.get(
+    "/empleados",
+    response_model=EmpleadosResponse,
+    response_model_exclude=_empleados_exclude,
+)
+async def get_empleados(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    filters: dict = Depends(_search_filters),
+    db: AsyncSession = Depends(get_async_read_db),
+    comercio: ComercioSchema = Depends(get_auth_async),
+):
+    """Regresa todos los empleados"""
+    ndjson = bool(accept) and NDJSON_MEDIA_TYPE in accept
+    full = _is_full_list(limit, cursor, stream, ndjson, filters)
+    generation = roster_cache.generation(comercio.id)
+    version = (await db.execute(select_roster_version(comercio.id))).scalar()
+    etag = _roster_etag(comercio.id, version, ndjson)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+
+    roster = roster_cache.get(comercio.id, version) if full else None
+    if roster is not None:
+        return _roster_response(roster, etag)
+
+    conditions = search_conditions(
+        db.get_bind().dialect.name, comercio.id, **filters
+    )
+    if stream or ndjson:
+        return StreamingResponse(
+            _stream_empleados(
+                db, _stream_statement(comercio.id, conditions), ndjson
+            ),
+            media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json",
+            headers={"ETag": etag},
+        )
+
+    statement = _list_statement(comercio.id, limit, cursor, conditions)
+    result = await db.execute(statement)
+    empleados_from_db: List[Row] = result.all()
+    if full:
+        roster = Roster(version, empleados_from_db)
+        roster_cache.put(comercio.id, roster, generation)
+        return _roster_response(roster, etag)
+
+    response = _list_response(empleados_from_db, limit, cursor)
+    response.headers["ETag"] = etag
+    return response
+
+
+@empleado_async.get("/empleados/stats", response_model=EmpleadosStatsResponse)
+async def get_empleados_stats(
+    db: AsyncSession = Depends(get_async_read_db),
+    comercio: ComercioSchema = Depends(get_auth_async),
+):
+    """Numero de empleados del comercio, activos e inactivos"""
+    result = await db.execute(select_empleados_stats(comercio.id))
+    total, activos = result.one()
+    return _stats_response(total, activos)
+
+
+@empleado_async.get(
+    "/empleados/changes",
+    response_model=EmpleadosChangesResponse,
+    response_model_exclude=_changes_exclude,
+)
+async def get_empleados_changes(
+    since: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_read_db),
+    comercio: ComercioSchema = Depends(get_auth_async),
+):
+    """Empleados creados, editados o removidos despues del cursor"""
+    result = await db.execute(select_change_status(comercio.id))
+    change_seq, purged_seq = result.one()
+    after_seq = _changes_since(since, change_seq, purged_seq)
+    if after_seq == change_seq:
+        return _changes_response([], [], change_seq, limit)
+
+    result = await db.execute(
+        select_empleado_changes(comercio.id, after_seq, change_seq, limit + 1)
+    )
+    empleados = result.all()
+    tombstones = []
+    if since is not None:
+        result = await db.execute(
+            select_tombstones(comercio.id, after_seq, change_seq, limit + 1)
+        )
+        tombstones = result.all()
+    return _changes_response(empleados, tombstones, change_seq, limit)
+
+
+@empleado_async.get(
+    "/empleados/{uuid}",
+    response_model=EmpleadoResponse,
+    response_model_exclude=_empleado_exclude,
+)
+async def get_empleado(
+    uuid: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
+    comercio: ComercioSchema = Depends(get_auth_async),
+):
+    """Obtiene un empleado por su UUID"""
+    version = (await db.execute(select_roster_version(comercio.id))).scalar()
+    etag = _roster_etag(comercio.id, version)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+
+    roster = roster_cache.get(comercio.id, version)
+    if roster is not None:
+        return _cached_empleado_response(roster, uuid, etag)
+
+    try:
+        result = await db.execute(select_empleado(comercio.id, uuid))
+    except StatementError:
+        raise InvalidEmpleadoError()
+
+    empleado_from_db: Union[Row, None] = result.first()
+    if not empleado_from_db:
+        raise InvalidEmpleadoError()
+
+    response = _empleado_response(empleado_from_db)
+    response.headers["ETag"] = etag
+    return response
+
+
+@empleado_async.post(
+    "/empleados/verify-pin",
+    response_model=EmpleadoResponse,
+    response_model_exclude=_empleado_exclude,
+)
+async def verify_pin(
+    payload: VerifyPin,
+    db: AsyncSession = Depends(get_async_read_db),
+    comercio: ComercioSchema = Depends(get_auth_async),
+):
+    """Valida que el PIN sea de un empleado activo del comercio"""
+    version = (await db.execute(select_roster_version(comercio.id))).scalar()
+    entry = pin_cache.get(comercio.id, version, payload.pin)
+    if entry is MISSING:
+        result = await db.execute(
+            select_empleado_by_pin(comercio.id, payload.pin)
+        )
+        entry = _pin_entry(result.first())
+        pin_cache.put(comercio.id, version, payload.pin, entry)
+    return _verify_pin_response(entry)
+
+
+@empleado_async.delete("/empleados/{uuid}", response_model=BaseResponse)
+async def delete_empleado(
+    uuid: str,
+    db: AsyncSession = Depends(get_async_db),
+    comercio: ComercioSchema = Depends(get_auth_async),
+):
+    """Remueve un empleado por su UUID"""
+    try:
+        result = await db.execute(
+            delete(Empleado).filter_by(uuid=uuid, comercio_id=comercio.id)
+        )
+        if result.rowcount:
+            await db.execute(bump_roster_version(comercio.id))
+        await db.commit()
+    except StatementError:
+        await db.rollback()
+        raise InvalidEmpleadoError()
+
+    if result.rowcount:
+        _after_write(comercio.id)
+
+    if not result.rowcount:
+        raise InvalidEmpleadoError()
+
+    return BaseResponse()
+
+
+@empleado_async.post(
+    "/empleados",
+    response_model=EmpleadoResponse,
+    status_code=200,
+    response_model_exclude=_empleado_exclude,
+)
+async def create_empleado(
+    empleado: NewEmpleado,
+    db: AsyncSession = Depends(get_async_db),
+    comercio: ComercioSchema = Depends(get_auth_async),
+):
+    """Crea un nuevo empleado"""
+    new_empleado: Empleado = Empleado(
+        nombre=empleado.nombre,
+        apellidos=empleado.apellidos,
+        pin=empleado.pin,
+        comercio_id=comercio.id,
+    )
+    db.add(new_empleado)
+    try:
+        await db.flush()
+        await db.execute(bump_roster_version(comercio.id))
+        await db.commit()
+        _after_write(comercio.id)
+    except IntegrityError:
+        await db.rollback()
+        raise DuplicatedPinError()
+    empleado_schema = EmpleadoSchema.from_orm(new_empleado)
+    response = EmpleadoResponse(data=empleado_schema)
+    return response
+
+
+@empleado_async.put(
+    "/empleados/{uuid}",
+    response_model=EmpleadoResponse,
+    response_model_exclude=_empleado_exclude,
+)
+async def update_empleado(
+    uuid: str,
+    empleado: UpdateEmpleado,
+    db: AsyncSession = Depends(get_async_db),
+    comercio: ComercioSchema = Depends(get_auth_async),
+):
+    """Edita los datos de un empleado por su UUID"""
+    values = _update_values(empleado)
+    returning = supports_returning(db.get_bind().dialect)
+    try:
+        result = await db.execute(
+            update_empleado_statement(comercio.id, uuid, values, returning)
+        )
+        if returning:
+            empleado_from_db: Union[Row, None] = result.first()
+        elif result.rowcount:
+            result = await db.execute(select_empleado(comercio.id, uuid))
+            empleado_from_db = result.first()
+        else:
+            empleado_from_db = None
+        if empleado_from_db:
+            await db.execute(bump_roster_version(comercio.id))
+        await db.commit()
+        if empleado_from_db:
+            _after_write(comercio.id)
+    except IntegrityError:
+        await db.rollback()
+        raise DuplicatedPinError()
+    except StatementError:
+        await db.rollback()
+        raise InvalidEmpleadoError()
+
+    if not empleado_from_db:
+        raise InvalidEmpleadoError()
+
+    return _empleado_response(empleado_from_db)
@@ -0,0 +1,21 @@
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class ComercioSchema(BaseModel):
+    """Copia de solo lectura del comercio, desligada de la sesion de la DB
+
+    Es lo que regresa ``get_auth``, por lo que se puede guardar en cache y
+    compartir entre peticiones sin tocar la DB.
+    """
+
+    id: int
+    uuid: UUID
+    nombre: str
+    activo: bool
+    api_key: UUID
+
+    class Config:
+        orm_mode = True
+        allow_mutation = False
@@ -5,6 +5,13 @@ from uuid import UUID
 from fastapi.exceptions import RequestValidationError
 from pydantic import BaseModel, root_validator
 
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+def format_datetime(value: _dt.datetime) -> str:
+    """Formato de fechas que regresaba la anterior API"""
+    return value.strftime(DATETIME_FORMAT)
+
 
 class EmpleadoSchema(BaseModel):
     id: Optional[str]
@@ -41,6 +48,23 @@ class EmpleadoSchema(BaseModel):
         }
 
 
+def serialize_empleado(empleado: Any) -> dict:
+    """Salida de EmpleadoSchema sin nombre, apellidos ni uuid
+
+    Se construye directo de los valores de la fila (entidad del ORM o Row)
+    para no validar dos veces con pydantic en las rutas de lectura, debe
+    regresar exactamente lo mismo que EmpleadoResponse con el exclude.
+    """
+    fecha_creacion = empleado.fecha_creacion
+    return {
+        "id": str(empleado.uuid),
+        "nombre_completo": f"{empleado.nombre} {empleado.apellidos}",
+        "pin": empleado.pin,
+        "fecha_creacion": fecha_creacion and format_datetime(fecha_creacion),
+        "activo": empleado.activo,
+    }
+
+
 class NewEmpleado(BaseModel):
     nombre: str
     apellidos: str
@@ -80,13 +104,41 @@ class UpdateEmpleado(BaseModel):
         }
 
 
+class PatchEmpleado(BaseModel):
+    """Cambios a un empleado en ``PATCH /empleados/bulk``, solo se editan
+    los campos que se envian
+    """
+
+    id: str
+    nombre: Optional[str]
+    apellidos: Optional[str]
+    pin: Optional[str]
+    # Igual que en UpdateEmpleado solo "0" desactiva al empleado
+    activo: Any = "NO_EXISTS"
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "id": "0f348928-3463-4e2d-b677-b9acc8f89438",
+                "activo": "0",
+            }
+        }
+
+
+class VerifyPin(BaseModel):
+    pin: str
+
+    class Config:
+        schema_extra = {"example": {"pin": "000000"}}
+
+
 class BaseResponse(BaseModel):
     rc: Optional[int] = 0
     msg: Optional[str] = "Ok"
 
     class Config:
         json_encoders = {
-            _dt.datetime: lambda v: v.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            _dt.datetime: format_datetime,
         }
 
 
@@ -96,3 +148,34 @@ class EmpleadoResponse(BaseResponse):
 
 class EmpleadosResponse(BaseResponse):
     data: Optional[List[EmpleadoSchema]]
+    next_cursor: Optional[str]
+
+
+class BulkEmpleadosResponse(BaseResponse):
+    """Resultado por cada empleado, en el mismo orden de la peticion"""
+
+    data: Optional[List[EmpleadoResponse]]
+
+
+class EmpleadosChanges(BaseModel):
+    """Empleados creados o editados y ids de los removidos"""
+
+    empleados: List[EmpleadoSchema]
+    deleted: List[str]
+
+
+class EmpleadosChangesResponse(BaseResponse):
+    data: Optional[EmpleadosChanges]
+    # Se envia como ``since`` en la siguiente sincronizacion
+    next_cursor: Optional[str]
+    has_more: bool = False
+
+
+class EmpleadosStats(BaseModel):
+    total: int
+    activos: int
+    inactivos: int
+
+
+class EmpleadosStatsResponse(BaseResponse):
+    data: Optional[EmpleadosStats]
@@ -0,0 +1,526 @@
+"""Prueba de carga de las rutas de empleados
+
+Crea una DB SQLite temporal con ``--comercios`` x ``--empleados``, ejecuta
+cada ruta de ``app.routes.empleado`` (y ``get_auth``) con ``--concurrency``
+peticiones simultaneas llamando a la aplicacion ASGI en el mismo proceso y
+guarda por escenario throughput, latencia p50/p95/p99, sentencias SQL por
+peticion y el pico de memoria (RSS) del proceso.
+
+    python benchmarks/load.py --empleados 5000 --output base.json
+    python benchmarks/load.py --empleados 5000 --compare base.json
+
+Con ``--compare`` se imprime la diferencia contra una corrida anterior y se
+regresa 1 si la p95 o las sentencias por peticion de algun escenario
+empeoran mas de ``--threshold``. Tambien se regresa 1 si algun escenario
+no cumple su objetivo de ``LATENCY_TARGETS``. La configuracion de la
+aplicacion se toma de las variables ``DAPP_*``, por ejemplo
+``DAPP_ROSTER_CACHE_TTL=0`` mide el listado sin cache.
+"""
+import argparse
+import asyncio
+import base64
+import datetime as _dt
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid as _uuid
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# (method, path, query, headers, body)
+Request = Tuple[str, str, str, Dict[str, str], Optional[bytes]]
+
+
+class Scenario(NamedTuple):
+    name: str
+    build: Callable[[int], Request]
+    expected: Tuple[int, ...] = (200,)
+    # Si se define ignora --concurrency, por ejemplo 1 para medir la
+    # latencia sin la espera de las demas peticiones
+    concurrency: Optional[int] = None
+
+
+class Result(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    elapsed: float
+
+
+def _auth(api_key: str) -> Dict[str, str]:
+    token = base64.b64encode(f"{api_key}:".encode()).decode()
+    return {"authorization": f"Basic {token}"}
+
+
+def _json(payload) -> bytes:
+    return json.dumps(payload).encode()
+
+
+async def asgi_request(app, request: Request) -> Result:
+    """Llama a la aplicacion ASGI sin pasar por la red"""
+    method, path, query, headers, body = request
+    headers = {**headers}
+    if body is not None:
+        headers["content-type"] = "application/json"
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 80),
+    }
+    done = asyncio.Event()
+    sent_body = False
+    status = 0
+    response_headers: Dict[str, str] = {}
+    chunks: List[bytes] = []
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": body or b""}
+        # StreamingResponse espera la desconexion mientras envia el cuerpo
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update(
+                (k.decode(), v.decode()) for k, v in message["headers"]
+            )
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = time.perf_counter() - start
+    done.set()
+    return Result(status, response_headers, b"".join(chunks), elapsed)
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo reporta en KB y macOS en bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def percentile(quantiles: List[float], value: int) -> float:
+    return round(quantiles[value - 1] * 1000, 3)
+
+
+def seed(engine, comercios: int, empleados: int) -> List[dict]:
+    """Crea los comercios con sus empleados, regresa su api_key y uuids"""
+    from sqlalchemy import insert
+
+    from app.config.migrations import migrate
+    from app.models.comercio import Comercio
+    from app.models.empleado import Empleado
+
+    migrate(engine)
+    now = _dt.datetime.utcnow()
+    seeded: List[dict] = []
+    with engine.begin() as connection:
+        for number in range(comercios):
+            api_key = _uuid.uuid4()
+            comercio_id = connection.execute(
+                insert(Comercio.__table__).values(
+                    uuid=_uuid.uuid4(),
+                    nombre=f"Comercio {number}",
+                    activo=True,
+                    api_key=api_key,
+                    fecha_creacion=now,
+                    roster_version=0,
+                )
+            ).inserted_primary_key[0]
+            rows = [
+                {
+                    "uuid": _uuid.uuid4(),
+                    "nombre": f"Nombre {pin}",
+                    "apellidos": f"Apellidos {pin}",
+                    "pin": f"{pin:06}",
+                    "fecha_creacion": now,
+                    "activo": True,
+                    "comercio_id": comercio_id,
+                }
+                for pin in range(empleados)
+            ]
+            connection.execute(insert(Empleado.__table__), rows)
+            seeded.append(
+                {
+                    "api_key": api_key.hex,
+                    "uuids": [str(row["uuid"]) for row in rows],
+                    "created": [],
+                }
+            )
+    return seeded
+
+
+def scenarios(comercios: List[dict], etags: List[str]) -> List[Scenario]:
+    """Primero las lecturas y despues las escrituras, los DELETE borran lo
+    que crean los POST para no afectar a los demas escenarios
+    """
+    pins = itertools.count(900000)
+
+    def pick(i: int) -> Tuple[dict, Dict[str, str]]:
+        comercio = comercios[i % len(comercios)]
+        return comercio, _auth(comercio["api_key"])
+
+    def get(path: str, query: str = "", **headers):
+        def build(i: int) -> Request:
+            _, auth = pick(i)
+            return ("GET", path, query, {**auth, **headers}, None)
+
+        return build
+
+    def not_modified(i: int) -> Request:
+        _, auth = pick(i)
+        headers = {**auth, "if-none-match": etags[i % len(etags)]}
+        return ("GET", "/empleados", "", headers, None)
+
+    def head(i: int) -> Request:
+        _, auth = pick(i)
+        return ("HEAD", "/empleados", "", auth, None)
+
+    def invalid_auth(i: int) -> Request:
+        return ("GET", "/empleados", "", _auth(_uuid.uuid4().hex), None)
+
+    def need_id(i: int) -> Request:
+        _, auth = pick(i)
+        return ("PUT", "/empleados", "", auth, None)
+
+    def get_empleado(i: int) -> Request:
+        comercio, auth = pick(i)
+        uuid = random.choice(comercio["uuids"])
+        return ("GET", f"/empleados/{uuid}", "", auth, None)
+
+    def verify_pin(i: int) -> Request:
+        comercio, auth = pick(i)
+        pin = f"{random.randrange(len(comercio['uuids'])):06}"
+        return ("POST", "/empleados/verify-pin", "", auth, _json({"pin": pin}))
+
+    def new_empleado() -> dict:
+        pin = f"{next(pins):06}"
+        return {"nombre": "Nuevo", "apellidos": pin, "pin": pin}
+
+    def create(i: int) -> Request:
+        _, auth = pick(i)
+        return ("POST", "/empleados", "", auth, _json(new_empleado()))
+
+    def create_bulk(i: int) -> Request:
+        _, auth = pick(i)
+        payload = [new_empleado() for _ in range(10)]
+        return ("POST", "/empleados/bulk", "", auth, _json(payload))
+
+    def update(i: int) -> Request:
+        comercio, auth = pick(i)
+        index = random.randrange(len(comercio["uuids"]))
+        payload = {
+            "nombre": "Editado",
+            "apellidos": "Apellidos",
+            "pin": f"{index:06}",
+            "activo": None,
+        }
+        path = f"/empleados/{comercio['uuids'][index]}"
+        return ("PUT", path, "", auth, _json(payload))
+
+    def update_bulk(i: int) -> Request:
+        comercio, auth = pick(i)
+        uuids = random.sample(comercio["uuids"], 10)
+        payload = [{"id": uuid, "activo": "0"} for uuid in uuids]
+        return ("PATCH", "/empleados/bulk", "", auth, _json(payload))
+
+    def delete(i: int) -> Request:
+        comercio, auth = pick(i)
+        uuid = comercio["created"].pop()
+        return ("DELETE", f"/empleados/{uuid}", "", auth, None)
+
+    def delete_bulk(i: int) -> Request:
+        comercio, auth = pick(i)
+        ids = [comercio["created"].pop() for _ in range(10)]
+        return ("DELETE", "/empleados/bulk", "", auth, _json(ids))
+
+    return [
+        Scenario("get_auth_invalid", invalid_auth, (401,)),
+        Scenario("need_id", need_id),
+        Scenario("get_empleados", get("/empleados")),
+        Scenario("get_empleados_page", get("/empleados", "limit=100")),
+        Scenario("get_empleados_stream", get("/empleados", "stream=1")),
+        Scenario(
+            "get_empleados_ndjson",
+            get("/empleados", accept="application/x-ndjson"),
+        ),
+        Scenario("get_empleados_304", not_modified, (304,)),
+        Scenario("head_empleados", head),
+        Scenario("get_empleados_stats", get("/empleados/stats")),
+        Scenario("get_empleados_changes", get("/empleados/changes")),
+        Scenario("get_empleado", get_empleado),
+        Scenario("verify_pin", verify_pin),
+        Scenario("verify_pin_latency", verify_pin, concurrency=1),
+        Scenario("create_empleado", create),
+        Scenario("create_empleados_bulk", create_bulk),
+        Scenario("update_empleado", update),
+        Scenario("update_empleados_bulk", update_bulk),
+        Scenario("delete_empleado", delete),
+        Scenario("delete_empleados_bulk", delete_bulk),
+    ]
+
+
+def _remember_created(comercios: List[dict], i: int, result: Result):
+    """Guarda los uuids que crean los POST para borrarlos despues"""
+    data = json.loads(result.body).get("data")
+    rows = data if isinstance(data, list) else [{"data": data}]
+    comercios[i % len(comercios)]["created"].extend(
+        row["data"]["id"] for row in rows if row.get("data")
+    )
+
+
+async def run_scenario(
+    app,
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+    on_result: Callable[[int, Result], None],
+) -> Tuple[List[Result], float]:
+    counter = itertools.count()
+    results: List[Result] = []
+
+    async def worker():
+        for i in iter(lambda: next(counter), None):
+            if i >= requests:
+                return
+            result = await asgi_request(app, scenario.build(i))
+            on_result(i, result)
+            results.append(result)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - start
+
+
+def summarize(
+    results: List[Result], wall: float, statements: int, expected
+) -> dict:
+    latencies = sorted(result.elapsed for result in results)
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    statuses = Counter(result.status for result in results)
+    return {
+        "requests": len(results),
+        "errors": sum(
+            count
+            for status, count in statuses.items()
+            if status not in expected
+        ),
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "throughput_rps": round(len(results) / wall, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": percentile(quantiles, 50),
+        "p95_ms": percentile(quantiles, 95),
+        "p99_ms": percentile(quantiles, 99),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "sql_per_request": round(statements / len(results), 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+async def run(args: argparse.Namespace, db_path: str) -> dict:
+    os.environ["DAPP_DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["DAPP_DB_ASYNC"] = "1" if args.db_async else "0"
+    # Se mide el costo de las rutas, no el limite por comercio. Se puede
+    # definir la variable para medir el control de admision
+    os.environ.setdefault("DAPP_ADMISSION_RATE", "0")
+
+    from sqlalchemy import event
+
+    from app.config.db import get_async_engine, get_engine
+    from app.main import create_app
+
+    engine = get_engine()
+    start = time.perf_counter()
+    comercios = seed(engine, args.comercios, args.empleados)
+    seed_seconds = time.perf_counter() - start
+
+    statements = Counter()
+
+    def count_statement(*_):
+        statements["total"] += 1
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    if args.db_async:
+        sync_engine = get_async_engine().sync_engine
+        event.listen(sync_engine, "before_cursor_execute", count_statement)
+
+    app = create_app(args.db_async)
+    # El ETag de cada comercio para el escenario 304, esto tambien llena
+    # los caches antes de medir
+    etags = []
+    for comercio in comercios:
+        request = ("GET", "/empleados", "", _auth(comercio["api_key"]), None)
+        etags.append((await asgi_request(app, request)).headers["etag"])
+
+    def on_result(name: str):
+        def callback(i: int, result: Result):
+            if name.startswith("create") and result.status == 200:
+                _remember_created(comercios, i, result)
+
+        return callback
+
+    report: Dict[str, dict] = {}
+    for scenario in scenarios(comercios, etags):
+        if args.only and scenario.name not in args.only:
+            continue
+        statements.clear()
+        results, wall = await run_scenario(
+            app,
+            scenario,
+            args.requests,
+            scenario.concurrency or args.concurrency,
+            on_result(scenario.name),
+        )
+        report[scenario.name] = summarize(
+            results, wall, statements["total"], scenario.expected
+        )
+        print(_format_row(scenario.name, report[scenario.name]))
+
+    return {
+        "meta": {
+            "date": _dt.datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "comercios": args.comercios,
+            "empleados": args.empleados,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "db_async": args.db_async,
+            "seed_seconds": round(seed_seconds, 2),
+            "settings": {
+                key: value
+                for key, value in sorted(os.environ.items())
+                if key.startswith("DAPP_") and key != "DAPP_DATABASE_URL"
+            },
+        },
+        "scenarios": report,
+    }
+
+
+# Latencia maxima en ms por escenario. Con --concurrency la latencia de
+# un solo proceso incluye la espera por las demas peticiones, por lo que
+# el objetivo de los relojes checadores se mide sin concurrencia
+LATENCY_TARGETS = {"verify_pin_latency": {"p99_ms": 10.0}}
+
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "sql_per_request")
+
+
+def _format_row(name: str, row: dict) -> str:
+    return (
+        f"{name:<24} {row['throughput_rps']:>9.1f} req/s"
+        f"  p50 {row['p50_ms']:>8.2f}  p95 {row['p95_ms']:>8.2f}"
+        f"  p99 {row['p99_ms']:>8.2f} ms  sql {row['sql_per_request']:>5}"
+        f"  rss {row['peak_rss_mb']:>7.1f} MB  errores {row['errors']}"
+    )
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Imprime el cambio de cada metrica y regresa los escenarios cuya
+    p95 o sentencias SQL por peticion empeoraron mas de ``threshold``
+    """
+    regressions: List[str] = []
+    for name, row in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if not before:
+            continue
+        changes = []
+        for metric in METRICS:
+            old, new = before[metric], row[metric]
+            change = (new - old) / old if old else 0.0
+            changes.append(f"{metric} {change:+.0%}")
+            # Para el throughput lo peor es que baje, para el resto que suba
+            worse = -change if metric == "throughput_rps" else change
+            if metric in ("p95_ms", "sql_per_request") and worse > threshold:
+                regressions.append(f"{name} {metric} {old} -> {new}")
+        print(f"{name:<24} " + "  ".join(changes))
+    return regressions
+
+
+def check_targets(report: dict) -> List[str]:
+    """Escenarios que no cumplen su objetivo de ``LATENCY_TARGETS``"""
+    missed: List[str] = []
+    for name, targets in LATENCY_TARGETS.items():
+        row = report["scenarios"].get(name)
+        if not row:
+            continue
+        for metric, limit in targets.items():
+            if row[metric] > limit:
+                missed.append(f"{name} {metric} {row[metric]} > {limit}")
+    return missed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--comercios", type=int, default=5)
+    parser.add_argument("--empleados", type=int, default=1000)
+    parser.add_argument(
+        "--requests", type=int, default=200, help="peticiones por escenario"
+    )
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--async", dest="db_async", action="store_true")
+    parser.add_argument(
+        "--only", nargs="+", help="ejecuta solo estos escenarios"
+    )
+    parser.add_argument("--output", help="archivo JSON con los resultados")
+    parser.add_argument("--compare", help="JSON de una corrida anterior")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.empleados < 10 or args.empleados > 900000:
+        parser.error("--empleados debe estar entre 10 y 900000")
+
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "load.sqlite3")
+        report = asyncio.run(run(args, db_path))
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+    failures = []
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(json.load(baseline), report, args.threshold)
+        for regression in regressions:
+            print(f"Regresion: {regression}")
+        failures += regressions
+    for missed in check_targets(report):
+        print(f"Objetivo no cumplido: {missed}")
+        failures.append(missed)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
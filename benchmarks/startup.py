@@ -0,0 +1,181 @@
+"""Mide el arranque de ``--workers`` workers simultaneos
+
+Compara importar la aplicacion contra el comportamiento anterior a
+``python -m app.cli migrate``, donde cada import de los modelos ejecutaba
+``Base.metadata.create_all`` sobre la base de datos compartida:
+
+- ``actual``: ``import app.main``, no toca la base de datos.
+- ``actual + create_all``: el mismo arbol ejecutando ``create_all`` en el
+  import, aisla el costo del DDL sin los cambios posteriores.
+- el arbol anterior (el padre del commit que agrego
+  ``app/config/migrations.py``, o ``--baseline``) extraido con
+  ``git archive`` en un directorio temporal. Tiene menos modulos, por lo
+  que su import es mas barato por razones ajenas al DDL.
+
+En cada corrida se copia la DB original (o una vacia con ``--empty``) y se
+lanzan todos los workers a la vez, como uvicorn o gunicorn con varios
+workers. Los escenarios se alternan en cada corrida. Se reporta el tiempo
+hasta que todos terminan y el de cada worker, con la desviacion estandar
+para distinguir la diferencia del ruido, y los errores de los workers que
+fallaron (por ejemplo ``database is locked`` o ``table already exists``
+cuando varios crean el esquema a la vez).
+
+    python benchmarks/startup.py --workers 8 --runs 20 --empty
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, NamedTuple, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cada worker reporta cuanto tardo su import, sin contar el interprete
+WORKER = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "import app.main\n"
+    "{setup}"
+    "print((time.perf_counter() - start) * 1000)\n"
+)
+CREATE_ALL = (
+    "from app.config.db import Base, get_engine\n"
+    "Base.metadata.create_all(get_engine())\n"
+)
+
+
+class Run(NamedTuple):
+    wall: float
+    workers: List[float]
+    errors: List[str]
+
+
+def default_baseline() -> str:
+    commit = subprocess.run(
+        [
+            "git",
+            "log",
+            "--diff-filter=A",
+            "--format=%H",
+            "--",
+            "app/config/migrations.py",
+        ],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()[-1]
+    return f"{commit}^"
+
+
+def extract(ref: str, directory: str) -> str:
+    """Extrae ``app`` de ``ref`` en ``directory`` y regresa su raiz"""
+    archive = os.path.join(directory, "tree.tar")
+    subprocess.run(
+        ["git", "archive", "--output", archive, ref, "app"],
+        cwd=ROOT,
+        check=True,
+    )
+    tree = os.path.join(directory, "tree")
+    with tarfile.open(archive) as tar:
+        tar.extractall(tree)
+    return tree
+
+
+def start_workers(tree: str, code: str, workers: int, empty: bool) -> Run:
+    with tempfile.TemporaryDirectory() as cwd:
+        if not empty:
+            shutil.copy(os.path.join(ROOT, "db.sqlite3"), cwd)
+        env = {
+            **os.environ,
+            "PYTHONPATH": tree,
+            "DAPP_DATABASE_URL": "sqlite:///db.sqlite3",
+        }
+        start = time.perf_counter()
+        processes = [
+            subprocess.Popen(
+                [sys.executable, "-c", code],
+                cwd=cwd,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            for _ in range(workers)
+        ]
+        outputs = [process.communicate() for process in processes]
+        wall = (time.perf_counter() - start) * 1000
+    timings, errors = [], []
+    for process, (stdout, stderr) in zip(processes, outputs):
+        if process.returncode == 0:
+            timings.append(float(stdout))
+        else:
+            # SQLAlchemy agrega una linea con el link de ayuda al final
+            lines = [
+                line for line in stderr.strip().splitlines() if "Error" in line
+            ]
+            errors.append(lines[-1] if lines else "sin salida")
+    return Run(wall, timings, errors)
+
+
+def _summary(timings: List[float]) -> str:
+    if not timings:
+        return "sin datos"
+    stdev = statistics.stdev(timings) if len(timings) > 1 else 0.0
+    return (
+        f"mediana {statistics.median(timings):7.1f}  "
+        f"media {statistics.mean(timings):7.1f} +/- {stdev:5.1f}  "
+        f"min {min(timings):7.1f}  max {max(timings):7.1f} ms"
+    )
+
+
+def report(name: str, runs: List[Run]) -> None:
+    workers = [timing for run in runs for timing in run.workers]
+    errors = Counter(error for run in runs for error in run.errors)
+    print(name)
+    print(f"  todos    {_summary([run.wall for run in runs])}")
+    print(f"  worker   {_summary(workers)}")
+    print(f"  fallidos {sum(errors.values())}")
+    for error, count in errors.most_common():
+        print(f"    {count:4} {error[:100]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--baseline", help="ref de git del arbol anterior")
+    parser.add_argument(
+        "--empty", action="store_true", help="arrancar con una DB vacia"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = args.baseline or default_baseline()
+        scenarios: Dict[str, Tuple[str, str]] = {
+            "actual": (ROOT, WORKER.format(setup="")),
+            "actual + create_all": (ROOT, WORKER.format(setup=CREATE_ALL)),
+            f"anterior ({baseline})": (
+                extract(baseline, directory),
+                WORKER.format(setup=""),
+            ),
+        }
+        runs: Dict[str, List[Run]] = {name: [] for name in scenarios}
+        for _ in range(args.runs):
+            for name, (tree, code) in scenarios.items():
+                runs[name].append(
+                    start_workers(tree, code, args.workers, args.empty)
+                )
+        print(f"{args.workers} workers, {args.runs} corridas")
+        for name, scenario_runs in runs.items():
+            report(name, scenario_runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Compara guardar los uuid como CHAR(32) o como BINARY(16) en SQLite
+
+Crea una DB temporal con ``--empleados`` repartidos en ``--comercios``,
+mide el tamano del archivo y las busquedas por uuid de
+``GET /empleados/{uuid}`` en texto, durante la migracion
+(``DAPP_UUID_MIXED``) y en binario, y el tiempo de
+``python -m app.cli uuid-migrate``.
+
+    python benchmarks/uuid_storage.py --empleados 200000
+"""
+import argparse
+import datetime as _dt
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid as _uuid
+from typing import Callable, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from app.cli import uuids  # noqa: E402
+from app.config.migrations import migrate  # noqa: E402
+from app.config.settings import settings  # noqa: E402
+from app.crud.empleado import select_empleado  # noqa: E402
+
+
+def populate(path: str, comercios: int, empleados: int) -> None:
+    now = _dt.datetime.utcnow().isoformat(" ")
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executemany(
+            "INSERT INTO main_comercio (id, uuid, nombre, activo, api_key, "
+            "fecha_creacion) VALUES (?, ?, ?, 1, ?, ?)",
+            [
+                (
+                    number,
+                    _uuid.uuid4().hex,
+                    f"Comercio {number}",
+                    _uuid.uuid4().hex,
+                    now,
+                )
+                for number in range(1, comercios + 1)
+            ],
+        )
+        connection.executemany(
+            "INSERT INTO main_empleado (uuid, nombre, apellidos, pin, "
+            "fecha_creacion, activo, comercio_id) "
+            "VALUES (?, ?, ?, ?, ?, 1, ?)",
+            (
+                (
+                    _uuid.uuid4().hex,
+                    "Empleado",
+                    str(number),
+                    f"{number:06}"[-6:],
+                    now,
+                    number % comercios + 1,
+                )
+                for number in range(empleados)
+            ),
+        )
+    connection.close()
+
+
+def sample(path: str, size: int) -> List[tuple]:
+    """``size`` pares (comercio_id, uuid) existentes"""
+    connection = sqlite3.connect(path)
+    rows = connection.execute(
+        "SELECT comercio_id, uuid FROM main_empleado ORDER BY random() "
+        "LIMIT ?",
+        (size,),
+    ).fetchall()
+    connection.close()
+    return [
+        (
+            comercio_id,
+            _uuid.UUID(bytes=value)
+            if isinstance(value, bytes)
+            else _uuid.UUID(value),
+        )
+        for comercio_id, value in rows
+    ]
+
+
+def _median_micros(run: Callable[[], None], keys: List[tuple], rounds: int):
+    timings = []
+    for _ in range(rounds):
+        random.shuffle(keys)
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) / len(keys) * 1e6)
+    return statistics.median(timings)
+
+
+def lookups(engine: Engine, keys: List[tuple], rounds: int) -> float:
+    """Mediana en microsegundos de ``select_empleado`` con SQLAlchemy"""
+
+    def run():
+        for comercio_id, uuid in keys:
+            row = connection.execute(
+                select_empleado(comercio_id, uuid)
+            ).first()
+            assert row is not None and row.uuid == uuid
+
+    with engine.connect() as connection:
+        return _median_micros(run, keys, rounds)
+
+
+def raw_lookups(path: str, keys: List[tuple], rounds: int) -> float:
+    """Lo mismo con sqlite3 para medir solo el indice, con los formatos de
+    la configuracion actual
+    """
+    formats = [lambda uuid: uuid.bytes] if settings.uuid_binary else []
+    if settings.uuid_mixed or not settings.uuid_binary:
+        formats.append(lambda uuid: uuid.hex)
+    query = (
+        "SELECT id, uuid FROM main_empleado WHERE comercio_id = ? AND uuid "
+        f"IN ({', '.join('?' * len(formats))}) LIMIT 1"
+    )
+
+    def run():
+        for comercio_id, uuid in keys:
+            params = [comercio_id] + [format(uuid) for format in formats]
+            assert connection.execute(query, params).fetchone() is not None
+
+    connection = sqlite3.connect(path)
+    try:
+        return _median_micros(run, keys, rounds)
+    finally:
+        connection.close()
+
+
+def vacuum(path: str) -> None:
+    connection = sqlite3.connect(path)
+    connection.execute("VACUUM")
+    connection.close()
+
+
+def report(
+    name: str, path: str, engine: Engine, keys: List[tuple], rounds: int
+) -> None:
+    size = os.path.getsize(path) / 1024 / 1024
+    micros = lookups(engine, keys, rounds)
+    raw = raw_lookups(path, keys, rounds)
+    print(
+        f"{name:<18} {size:8.1f} MB  {micros:7.1f} us/busqueda  "
+        f"{raw:5.1f} us con sqlite3"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--comercios", type=int, default=10)
+    parser.add_argument("--empleados", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "db.sqlite3")
+        engine = create_engine(f"sqlite:///{path}")
+        migrate(engine)
+        populate(path, args.comercios, args.empleados)
+        vacuum(path)
+        keys = sample(path, args.lookups)
+
+        settings.uuid_binary, settings.uuid_mixed = False, False
+        report("texto", path, engine, keys, args.rounds)
+
+        settings.uuid_binary, settings.uuid_mixed = True, True
+        report("mixto (texto)", path, engine, keys, args.rounds)
+        start = time.perf_counter()
+        for uuid_column in uuids.UUID_COLUMNS:
+            uuids.convert_column(
+                engine, uuid_column, True, batch_size=args.batch_size
+            )
+        seconds = time.perf_counter() - start
+        report("mixto (binario)", path, engine, keys, args.rounds)
+
+        settings.uuid_mixed = False
+        report("binario", path, engine, keys, args.rounds)
+        vacuum(path)
+        report("binario + VACUUM", path, engine, keys, args.rounds)
+        engine.dispose()
+        print(
+            f"uuid-migrate: {seconds:.1f} s, "
+            f"{args.empleados / seconds:.0f} filas/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,21 @@
+from contextlib import contextmanager
+from typing import Iterator, List
 from uuid import UUID
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, delete, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy_utils import create_database, database_exists
 
+from app.config.authentication import auth_cache
 from app.config.db import Base, get_db
+from app.config.pin_cache import pin_cache
+from app.config.roster_cache import roster_cache
 from app.main import app
 from app.models.comercio import Comercio
+from app.models.empleado import Empleado
+from app.models.tombstone import EmpleadoTombstone
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///db_test.sqlite3"
 
@@ -42,16 +49,83 @@ Base.metadata.create_all(bind=engine)
 client = TestClient(app)
 
 
-@pytest.fixture
-def add_comercio():
-    db = TestingSessionLocal()
-    comercio = Comercio(
+def _new_comercio() -> Comercio:
+    return Comercio(
         id=1,
         uuid=UUID("993385d0519d459da8e47e48238a7e8f"),
         nombre="Comercio 1",
         activo=True,
         api_key=UUID("5a25c9f25c334f4197df4d2aafca5fd9"),
     )
-    db.add(comercio)
+
+
+@pytest.fixture
+def add_comercio():
+    db = TestingSessionLocal()
+    db.add(_new_comercio())
     db.commit()
     db.close()
+
+
+@pytest.fixture(scope="module")
+def comercio():
+    """El comercio de ``add_comercio`` para los modulos fuera de
+    test_empleado, que pueden correr antes o despues de ella
+
+    Si ya existe no lo modifica. Si no existe lo agrega y al terminar el
+    modulo lo remueve con sus empleados y borrados, para que
+    ``add_comercio`` lo vuelva a agregar sin datos de otras pruebas.
+    """
+    db = TestingSessionLocal()
+    added = db.get(Comercio, 1) is None
+    if added:
+        db.add(_new_comercio())
+        db.commit()
+    db.close()
+    yield
+    if not added:
+        return
+    with engine.begin() as connection:
+        connection.execute(delete(Empleado).filter_by(comercio_id=1))
+        connection.execute(delete(EmpleadoTombstone).filter_by(comercio_id=1))
+        connection.execute(delete(Comercio).filter_by(id=1))
+    auth_cache.clear()
+    roster_cache.clear()
+    pin_cache.clear()
+
+
+@pytest.fixture
+def query_budget():
+    """Limita las sentencias SQL que se ejecutan en el ``engine`` de pruebas
+
+        with query_budget(2):
+            client.get("/empleados", auth=auth)
+
+    Falla si dentro del bloque se ejecutan mas de ``maximum`` sentencias y
+    muestra cuales fueron. Regresa la lista de sentencias del bloque.
+    """
+    statements: List[str] = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    @contextmanager
+    def budget(maximum: int) -> Iterator[List[str]]:
+        executed: List[str] = []
+        start = len(statements)
+        yield executed
+        executed += statements[start:]
+        if len(executed) > maximum:
+            listing = "\n".join(
+                f"  {number}. {' '.join(statement.split())}"
+                for number, statement in enumerate(executed, 1)
+            )
+            pytest.fail(
+                f"Se ejecutaron {len(executed)} sentencias SQL, el maximo "
+                f"es {maximum}:\n{listing}",
+                pytrace=False,
+            )
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield budget
+    event.remove(engine, "before_cursor_execute", count)
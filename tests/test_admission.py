@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from requests.auth import HTTPBasicAuth
+from starlette.testclient import TestClient
+
+from app.config.admission import AdmissionController, TokenBucket, admission
+from app.config.exceptions import ServiceOverloadedError, TooManyRequestsError
+from app.main import app
+
+client = TestClient(app)
+
+auth = HTTPBasicAuth(username="5a25c9f25c334f4197df4d2aafca5fd9", password="")
+
+
+def _controller(**kwargs) -> AdmissionController:
+    options = dict(
+        rate=0,
+        burst=0,
+        max_concurrency=0,
+        max_inflight=0,
+        max_queue=0,
+        queue_timeout=1,
+    )
+    return AdmissionController(**{**options, **kwargs})
+
+
+def test_token_bucket():
+    """Debe permitir rafagas de ``burst`` y despues ``rate`` por segundo"""
+    bucket = TokenBucket(rate=2, burst=3, now=0)
+    assert [bucket.take(0) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take(0) == 0.5
+    assert bucket.take(0.5) == 0
+    assert bucket.take(0.5) == 0.5
+    # No acumula mas de ``burst``
+    assert [bucket.take(100) for _ in range(4)][-1] == 0.5
+
+
+def test_rate_limit():
+    """Debe rechazar al comercio que excede su token bucket sin afectar a
+    los demas
+    """
+    now = [0.0]
+    controller = _controller(rate=1, burst=1, timer=lambda: now[0])
+
+    async def run():
+        await controller.acquire(1)
+        controller.release(1)
+        with pytest.raises(TooManyRequestsError) as error:
+            await controller.acquire(1)
+        assert error.value.headers == {"Retry-After": "1"}
+        await controller.acquire(2)
+        controller.release(2)
+        now[0] = 1
+        await controller.acquire(1)
+        controller.release(1)
+
+    asyncio.run(run())
+    assert controller.shed["rate"] == 1
+
+
+def test_concurrency_limit():
+    """Debe limitar las peticiones simultaneas por comercio"""
+    controller = _controller(max_concurrency=2)
+
+    async def run():
+        await controller.acquire(1)
+        await controller.acquire(1)
+        with pytest.raises(TooManyRequestsError):
+            await controller.acquire(1)
+        await controller.acquire(2)
+        controller.release(1)
+        await controller.acquire(1)
+
+    asyncio.run(run())
+    assert controller.shed["concurrency"] == 1
+    assert controller.inflight == 3
+
+
+def test_global_queue():
+    """Debe encolar hasta ``max_queue`` peticiones y rechazar el resto"""
+    controller = _controller(max_inflight=1, max_queue=1, queue_timeout=5)
+
+    async def run():
+        await controller.acquire(1)
+        waiting = asyncio.ensure_future(controller.acquire(2))
+        await asyncio.sleep(0)
+        assert controller.queued == 1
+        with pytest.raises(ServiceOverloadedError):
+            await controller.acquire(3)
+
+        # El lugar pasa al primero de la cola
+        controller.release(1)
+        await waiting
+        assert (controller.inflight, controller.queued) == (1, 0)
+        controller.release(2)
+        assert controller.inflight == 0
+
+    asyncio.run(run())
+    assert controller.shed["queue_full"] == 1
+
+
+def test_global_queue_timeout():
+    """Debe rechazar la peticion que espera mas de ``queue_timeout``"""
+    controller = _controller(max_inflight=1, max_queue=1, queue_timeout=0.01)
+
+    async def run():
+        await controller.acquire(1)
+        with pytest.raises(ServiceOverloadedError):
+            await controller.acquire(2)
+        assert controller.queued == 0
+        controller.release(1)
+        await controller.acquire(2)
+
+    asyncio.run(run())
+    assert controller.shed["queue_timeout"] == 1
+    assert controller.inflight == 1
+
+
+def test_admission_response(comercio, monkeypatch):
+    """Debe rechazar con 429 y el formato de error, y exponer los
+    rechazos en /metrics
+    """
+    monkeypatch.setattr(admission, "rate", 0.001)
+    monkeypatch.setattr(admission, "burst", 1)
+    monkeypatch.setattr(admission, "_buckets", {})
+
+    assert client.get("/empleados", auth=auth).status_code == 200
+    response = client.get("/empleados", auth=auth)
+    assert response.status_code == 429
+    assert response.json() == {"rc": -1008, "msg": "Too many requests"}
+    assert int(response.headers["Retry-After"]) > 0
+    assert admission.inflight == 0
+
+    metrics = client.get("/metrics").text
+    assert 'dapp_admission_shed_total{reason="rate"}' in metrics
+    assert 'dapp_admission{stat="queued"} 0' in metrics
@@ -0,0 +1,102 @@
+import datetime as _dt
+import uuid as _uuid
+from types import SimpleNamespace
+
+from app.config.cache import MISSING, TTLCache
+from app.config.roster_cache import Roster, RosterCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_expiration():
+    """Debe expirar las entradas despues del ttl"""
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=5, timer=timer)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    timer.now = 5
+    assert cache.get("a", MISSING) is MISSING
+    assert cache.stats()["expirations"] == 1
+
+
+def test_lru_eviction():
+    """Debe desalojar la entrada usada menos recientemente"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b", MISSING) is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_negative_cache():
+    """Debe guardar None con su propio ttl y contarlo por separado"""
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=60, timer=timer)
+    cache.set("a", None, ttl=1)
+    assert cache.get("a", MISSING) is None
+
+    timer.now = 1
+    assert cache.get("a", MISSING) is MISSING
+    stats = cache.stats()
+    assert stats["negative_hits"] == 1
+    assert stats["hits"] == 0
+    assert stats["misses"] == 1
+
+
+def test_weight_eviction():
+    """Debe desalojar entradas cuando se pasa del peso maximo"""
+    cache = TTLCache(maxsize=10, ttl=60, maxweight=10, weigher=len)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    assert cache.weight == 10
+
+    cache.set("c", b"1")
+    assert cache.get("a", MISSING) is MISSING
+    assert cache.weight == 6
+    cache.set("b", b"1")
+    assert cache.weight == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_roster_cache_generation():
+    """No debe guardar un listado leido antes de una invalidacion"""
+    cache = RosterCache(maxsize=10, maxbytes=1024, ttl=60)
+    generation = cache.generation(1)
+    cache.invalidate(1)
+    cache.put(1, Roster(1, []), generation)
+    assert cache.get(1) is None
+
+    cache.put(1, Roster(2, []), cache.generation(1))
+    assert cache.get(1).version == 2
+
+
+def test_roster_index():
+    """Debe ubicar a cada empleado dentro del listado serializado"""
+    rows = [
+        SimpleNamespace(
+            uuid=_uuid.uuid4(),
+            nombre=f"Nombre {i}",
+            apellidos="Apellidos",
+            pin=f"{i:06}",
+            fecha_creacion=_dt.datetime(2022, 1, 1),
+            activo=True,
+        )
+        for i in range(3)
+    ]
+    roster = Roster(1, rows)
+    assert roster.list_response().count(b'"pin"') == 3
+    body = roster.empleado_response(str(rows[1].uuid))
+    assert b'"pin":"000001"' in body
+    assert roster.empleado_response("invalid") is None
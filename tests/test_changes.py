@@ -0,0 +1,208 @@
+import datetime as _dt
+import os
+import shutil
+
+from requests.auth import HTTPBasicAuth
+from sqlalchemy import create_engine, delete, event, select, update
+from starlette.testclient import TestClient
+
+from app.cli.tombstones import compact_tombstones
+from app.config.migrations import migrate
+from app.crud.empleado import select_empleado_changes, select_tombstones
+from app.main import app
+from app.models.comercio import Comercio
+from app.models.empleado import Empleado
+from app.routes.empleado import _decode_cursor, _encode_cursor
+from tests.conftest import engine
+
+client = TestClient(app)
+
+auth = HTTPBasicAuth(username="5a25c9f25c334f4197df4d2aafca5fd9", password="")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _changes(**params) -> dict:
+    return client.get("/empleados/changes", params=params, auth=auth).json()
+
+
+def _create(pin: str) -> str:
+    response = client.post(
+        "/empleados",
+        json={"nombre": "Cambio", "apellidos": pin, "pin": pin},
+        auth=auth,
+    )
+    return response.json()["data"]["id"]
+
+
+def _sync(since: str, limit: int) -> tuple:
+    """Sigue el cursor hasta que no hay mas cambios"""
+    empleados, deleted = [], []
+    while True:
+        data = _changes(since=since, limit=limit)
+        empleados += [empleado["id"] for empleado in data["data"]["empleados"]]
+        deleted += data["data"]["deleted"]
+        since = data["next_cursor"]
+        if not data["has_more"]:
+            return empleados, deleted, since
+
+
+def test_changes(comercio, query_budget):
+    """Debe regresar solo lo que cambio despues del cursor"""
+    full = _changes()
+    assert full["rc"] == 0 and not full["has_more"]
+    assert full["data"]["deleted"] == []
+    total = client.get("/empleados/stats", auth=auth).json()["data"]["total"]
+    assert len(full["data"]["empleados"]) == total
+    cursor = full["next_cursor"]
+
+    with query_budget(1):
+        data = _changes(since=cursor)
+    assert data["data"] == {"empleados": [], "deleted": []}
+    assert data["next_cursor"] == cursor
+
+    kept, removed = _create("950001"), _create("950002")
+    client.put(
+        f"/empleados/{kept}",
+        json={
+            "nombre": "Editado",
+            "apellidos": "X",
+            "pin": "950001",
+            "activo": "1",
+        },
+        auth=auth,
+    )
+    client.delete(f"/empleados/{removed}", auth=auth)
+
+    with query_budget(3):
+        data = _changes(since=cursor)
+    assert [empleado["id"] for empleado in data["data"]["empleados"]] == [kept]
+    assert data["data"]["empleados"][0]["nombre_completo"] == "Editado X"
+    assert data["data"]["deleted"] == [removed]
+    assert _changes(since=data["next_cursor"])["data"]["empleados"] == []
+
+    # Un PUT sin cambios no genera un cambio
+    client.put(
+        f"/empleados/{kept}",
+        json={
+            "nombre": "Editado",
+            "apellidos": "X",
+            "pin": "950001",
+            "activo": "1",
+        },
+        auth=auth,
+    )
+    assert _changes(since=data["next_cursor"])["data"]["empleados"] == []
+
+    # Paginado con limit se obtienen los mismos cambios
+    assert _sync(cursor, limit=1)[:2] == ([kept], [removed])
+    client.delete(f"/empleados/{kept}", auth=auth)
+
+
+def test_changes_concurrent_write(comercio):
+    """Un cambio confirmado entre la consulta de empleados y la de borrados
+    no se debe saltar con el cursor
+    """
+    cursor = _changes()["next_cursor"]
+    renamed, removed = _create("950005"), _create("950006")
+    fired = []
+
+    def write(conn, cursor, statement, parameters, context, executemany):
+        if fired or "FROM main_empleado_tombstone" not in statement:
+            return
+        fired.append(statement)
+        with engine.begin() as connection:
+            connection.execute(
+                update(Empleado).filter_by(pin="950005").values(nombre="Otro")
+            )
+            connection.execute(delete(Empleado).filter_by(pin="950006"))
+
+    event.listen(engine, "before_cursor_execute", write)
+    try:
+        data = _changes(since=cursor)
+    finally:
+        event.remove(engine, "before_cursor_execute", write)
+    assert fired
+    assert [row["id"] for row in data["data"]["empleados"]] == [
+        renamed,
+        removed,
+    ]
+    assert data["data"]["deleted"] == []
+
+    data = _changes(since=data["next_cursor"])
+    assert [row["nombre_completo"] for row in data["data"]["empleados"]] == [
+        "Otro 950005"
+    ]
+    assert data["data"]["deleted"] == [removed]
+    client.delete(f"/empleados/{renamed}", auth=auth)
+
+
+def test_changes_invalid_cursor(comercio):
+    assert _changes(since="no valido") == {
+        "rc": -1005,
+        "msg": "Invalid cursor",
+    }
+    # Un cursor mayor que la secuencia actual, por ejemplo de un respaldo
+    change_seq = _decode_cursor(_changes()["next_cursor"])
+    assert _changes(since=_encode_cursor(change_seq + 1)) == {
+        "rc": -1010,
+        "msg": "Expired cursor",
+    }
+
+
+def test_compact_tombstones(comercio):
+    """Los cursores anteriores a la compactacion deben sincronizar desde
+    cero
+    """
+    cursor = _changes()["next_cursor"]
+    client.delete(f"/empleados/{_create('950004')}", auth=auth)
+    assert len(_changes(since=cursor)["data"]["deleted"]) == 1
+
+    tomorrow = _dt.datetime.utcnow() + _dt.timedelta(days=1)
+    assert compact_tombstones(engine, tomorrow, batch_size=1) >= 1
+    assert compact_tombstones(engine, tomorrow) == 0
+    assert _changes(since=cursor) == {"rc": -1010, "msg": "Expired cursor"}
+
+    data = _changes()
+    assert data["rc"] == 0
+    assert _changes(since=data["next_cursor"])["rc"] == 0
+
+
+def test_changes_query_plans():
+    """Las consultas de cambios deben usar sus indices"""
+    for statement, index in (
+        (
+            select_empleado_changes(1, 0, 2**62, 1001),
+            "main_empleado_comercio_id_change_seq_idx",
+        ),
+        (
+            select_tombstones(1, 0, 2**62, 1001),
+            "main_empleado_tombstone_comercio_id_change_seq_idx",
+        ),
+    ):
+        compiled = statement.compile(dialect=engine.dialect)
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        with engine.connect() as connection:
+            plan = connection.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {compiled}", params
+            )
+            steps = [row[-1] for row in plan]
+        assert any(index in step for step in steps), steps
+
+
+def test_migrate_legacy_change_seqs(tmp_path):
+    """Los empleados de la DB original deben tener su secuencia"""
+    db_path = tmp_path / "db.sqlite3"
+    shutil.copy(os.path.join(ROOT, "db.sqlite3"), db_path)
+    legacy_engine = create_engine(f"sqlite:///{db_path}")
+    migrate(legacy_engine)
+    with legacy_engine.connect() as connection:
+        seqs = connection.execute(
+            select(Empleado.comercio_id, Empleado.change_seq)
+        ).all()
+        comercios = dict(
+            connection.execute(select(Comercio.id, Comercio.change_seq)).all()
+        )
+    assert all(change_seq > 0 for _, change_seq in seqs)
+    for comercio_id, change_seq in seqs:
+        assert comercios[comercio_id] >= change_seq
@@ -0,0 +1,178 @@
+import datetime as _dt
+import io
+import json
+import uuid as _uuid
+
+import pytest
+from sqlalchemy import create_engine, insert, select, update
+
+from app.cli import roster
+from app.config.migrations import migrate
+from app.crud.comercio import reconcile_counters, select_counter_drift
+from app.models.comercio import Comercio
+from app.models.empleado import Empleado
+
+API_KEY = _uuid.UUID("5a25c9f25c334f4197df4d2aafca5fd9")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite3'}")
+    migrate(engine)
+    with engine.begin() as connection:
+        for comercio_id in (1, 2):
+            connection.execute(
+                insert(Comercio.__table__).values(
+                    id=comercio_id,
+                    uuid=_uuid.uuid4(),
+                    nombre=f"Comercio {comercio_id}",
+                    activo=True,
+                    api_key=API_KEY if comercio_id == 1 else _uuid.uuid4(),
+                    fecha_creacion=_dt.datetime.utcnow(),
+                )
+            )
+    return engine
+
+
+def _csv(*rows: str) -> io.StringIO:
+    return io.StringIO("\n".join(("nombre,apellidos,pin,activo",) + rows))
+
+
+def _roster_version(engine, comercio_id: int) -> int:
+    with engine.connect() as connection:
+        return connection.execute(
+            select(Comercio.roster_version).filter_by(id=comercio_id)
+        ).scalar()
+
+
+def test_find_comercio(engine):
+    with engine.connect() as connection:
+        assert roster.find_comercio(connection, "2") == 2
+        assert roster.find_comercio(connection, API_KEY.hex) == 1
+        assert roster.find_comercio(connection, "no-existe") is None
+
+
+def test_import_rejects(engine):
+    """Debe mandar los PIN duplicados y los datos incompletos a rejects"""
+    source = _csv(
+        "Ana,Lopez,000001,1",
+        "Luis,Perez,000002,0",
+        "Otro,Perez,000001,1",
+        ",Perez,000003,1",
+    )
+    output = io.StringIO()
+    rejects = roster.RejectWriter(output, "csv")
+    result = roster.import_empleados(
+        engine, 1, roster.read_rows(source, "csv"), rejects, batch_size=2
+    )
+    assert (result.inserted, result.updated, result.rejected) == (2, 0, 2)
+    lines = output.getvalue().splitlines()
+    assert lines[0] == "nombre,apellidos,pin,activo,error"
+    assert "Otro,Perez,000001,1,Duplicated PIN" in lines
+    assert ",Perez,000003,1,Incomplete data" in lines
+
+    with engine.connect() as connection:
+        activos = dict(
+            connection.execute(
+                select(Empleado.pin, Empleado.activo).filter_by(comercio_id=1)
+            ).all()
+        )
+    assert activos == {"000001": True, "000002": False}
+
+
+def test_import_commit_every(engine):
+    """Debe hacer commit y aumentar la version cada commit_every filas"""
+    rows = [f"Nombre,{pin},{pin:06},1" for pin in range(10)]
+    roster.import_empleados(
+        engine,
+        1,
+        roster.read_rows(_csv(*rows), "csv"),
+        roster.RejectWriter(None, "csv"),
+        batch_size=2,
+        commit_every=4,
+    )
+    assert _roster_version(engine, 1) == 3
+
+
+def test_export_import_roundtrip(engine):
+    """Debe exportar y volver a importar los mismos empleados"""
+    roster.import_empleados(
+        engine,
+        1,
+        roster.read_rows(_csv("Ana,Lopez,000001,1", "Luis,Perez,2,0"), "csv"),
+        roster.RejectWriter(None, "csv"),
+    )
+    output = io.StringIO()
+    assert roster.export_empleados(engine, 1, output, "ndjson") == 2
+    exported = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [row["pin"] for row in exported] == ["000001", "2"]
+    assert exported[1]["activo"] is False
+
+    # Sin upsert los mismos uuid se rechazan, con upsert se editan
+    output.seek(0)
+    rejects = roster.RejectWriter(None, "ndjson")
+    result = roster.import_empleados(
+        engine, 1, roster.read_rows(output, "ndjson"), rejects
+    )
+    assert (result.inserted, result.rejected) == (0, 2)
+
+    edited = [{**row, "nombre": "Editado"} for row in exported]
+    result = roster.import_empleados(
+        engine, 1, edited, roster.RejectWriter(None, "ndjson"), upsert=True
+    )
+    assert (result.inserted, result.updated) == (0, 2)
+
+    output = io.StringIO()
+    roster.export_empleados(engine, 1, output, "csv")
+    lines = output.getvalue().splitlines()
+    assert lines[0] == ",".join(roster.FIELDS)
+    assert all(",Editado," in line for line in lines[1:])
+
+
+def _counters(engine, comercio_id: int):
+    with engine.connect() as connection:
+        return tuple(
+            connection.execute(
+                select(
+                    Comercio.empleados_total, Comercio.empleados_activos
+                ).filter_by(id=comercio_id)
+            ).one()
+        )
+
+
+def test_import_counters_and_reconcile(engine):
+    """Los triggers deben mantener los contadores al importar y
+    ``reconcile`` debe corregirlos si se desajustan
+    """
+    roster.import_empleados(
+        engine,
+        1,
+        roster.read_rows(_csv("Ana,Lopez,000001,1", "Luis,Perez,2,0"), "csv"),
+        roster.RejectWriter(None, "csv"),
+    )
+    assert _counters(engine, 1) == (2, 1)
+    assert _counters(engine, 2) == (0, 0)
+
+    output = io.StringIO()
+    roster.export_empleados(engine, 1, output, "ndjson")
+    exported = [json.loads(line) for line in output.getvalue().splitlines()]
+    activos = [{**row, "activo": True} for row in exported]
+    roster.import_empleados(
+        engine, 1, activos, roster.RejectWriter(None, "ndjson"), upsert=True
+    )
+    assert _counters(engine, 1) == (2, 2)
+
+    with engine.begin() as connection:
+        connection.execute(
+            update(Comercio.__table__)
+            .where(Comercio.id == 2)
+            .values(empleados_total=5)
+        )
+        drift = connection.execute(select_counter_drift()).all()
+        assert [(row.id, row.empleados_total, row.total) for row in drift] == [
+            (2, 5, 0)
+        ]
+        connection.execute(reconcile_counters())
+        assert connection.execute(select_counter_drift()).all() == []
+    assert _counters(engine, 1) == (2, 2)
+    assert _counters(engine, 2) == (0, 0)
@@ -0,0 +1,69 @@
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from app.config.db import engine_options, get_async_database_url
+from app.config.settings import Settings
+from app.crud.empleado import update_empleado
+from app.models.comercio import Comercio
+from app.models.empleado import Empleado
+
+
+def test_sqlite_engine_options():
+    """SQLite no usa pool, el timeout se usa para esperar el lock"""
+    settings = Settings(db_statement_timeout=5000)
+    options = engine_options("sqlite:///db.sqlite3", settings)
+    assert not options["echo"]
+    assert "pool_size" not in options
+    assert options["connect_args"] == {
+        "check_same_thread": False,
+        "timeout": 5,
+    }
+
+
+def test_postgresql_engine_options():
+    """PostgreSQL debe usar el pool y el statement_timeout configurados"""
+    settings = Settings(db_pool_size=5, db_max_overflow=2)
+    options = engine_options("postgresql://user@localhost/dapp", settings)
+    assert options["pool_size"] == 5
+    assert options["max_overflow"] == 2
+    assert options["pool_pre_ping"]
+    assert options["connect_args"] == {"options": "-c statement_timeout=30000"}
+
+    url = "postgresql+asyncpg://user@localhost/dapp"
+    options = engine_options(url, settings)
+    assert options["connect_args"] == {
+        "server_settings": {"statement_timeout": "30000"}
+    }
+
+
+def test_async_database_url():
+    """Debe derivar la url async de database_url si no se define"""
+    settings = Settings(database_url="postgresql://user@localhost/dapp")
+    url = get_async_database_url(settings)
+    assert url == "postgresql+asyncpg://user@localhost/dapp"
+    settings = Settings(async_database_url="sqlite+aiosqlite:///otra.db")
+    assert get_async_database_url(settings) == "sqlite+aiosqlite:///otra.db"
+
+
+def test_postgresql_schema():
+    """Los modelos deben generar BIGSERIAL y UUID nativo en PostgreSQL"""
+    dialect = postgresql.dialect()
+    comercio = str(CreateTable(Comercio.__table__).compile(dialect=dialect))
+    empleado = str(CreateTable(Empleado.__table__).compile(dialect=dialect))
+
+    assert "id BIGSERIAL NOT NULL" in comercio
+    assert "api_key UUID NOT NULL" in comercio
+    assert "id BIGSERIAL NOT NULL" in empleado
+    assert "uuid UUID" in empleado
+    assert "comercio_id BIGINT NOT NULL" in empleado
+
+
+def test_update_empleado_returning():
+    """En PostgreSQL la edicion debe regresar la fila en el mismo UPDATE"""
+    statement = update_empleado(
+        1, "0f348928-3463-4e2d-b677-b9acc8f89438", {"pin": "1"}, True
+    )
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("UPDATE main_empleado SET pin=")
+    assert "RETURNING main_empleado.id, main_empleado.uuid" in sql
+    assert postgresql.dialect().full_returning
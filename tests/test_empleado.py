@@ -1,12 +1,21 @@
+import json
 import uuid as _uuid
 from typing import List
 
 import pytest
 from requests import Response
 from requests.auth import HTTPBasicAuth
+from sqlalchemy import create_engine, update
 from starlette.testclient import TestClient
 
+from app.config import db as _db
+from app.config.authentication import auth_cache
+from app.config.roster_cache import roster_cache
+from app.crud.comercio import bump_roster_version
 from app.main import app
+from app.models.comercio import Comercio
+from app.models.empleado import Empleado
+from tests.conftest import SQLALCHEMY_DATABASE_URL, TestingSessionLocal
 
 client = TestClient(app)
 
@@ -82,6 +91,56 @@ def test_get_all_empleados():
         _validate_response_empleado(empleado)
 
 
+def test_get_empleados_paginated():
+    """Debe paginar por cursor cuando se envia limit"""
+    response: Response = client.get("/empleados?limit=1", auth=auth)
+    data = response.json()
+    assert response.status_code == 200
+    assert data["rc"] == 0
+    assert len(data["data"]) == 1
+    assert data["next_cursor"]
+    _validate_response_empleado(data["data"][0])
+    first_id = data["data"][0]["id"]
+
+    response = client.get(
+        f"/empleados?limit=1&cursor={data['next_cursor']}", auth=auth
+    )
+    data = response.json()
+    assert data["rc"] == 0
+    assert len(data["data"]) == 1
+    assert data["data"][0]["id"] != first_id
+    assert data["next_cursor"] is None
+
+
+def test_get_empleados_stream():
+    """Debe regresar el mismo listado por streaming en JSON y NDJSON"""
+    expected = _get_all_empleados()
+
+    response: Response = client.get("/empleados?stream=1", auth=auth)
+    data = response.json()
+    assert response.status_code == 200
+    assert data["rc"] == 0
+    assert data["msg"] == "Ok"
+    assert data["data"] == expected
+
+    response = client.get(
+        "/empleados", auth=auth, headers={"Accept": "application/x-ndjson"}
+    )
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["rc"] for line in lines] == [0] * len(expected)
+    assert [line["data"] for line in lines] == expected
+
+
+def test_get_empleados_invalid_cursor():
+    """Debe regresar Invalid cursor si el cursor no es valido"""
+    response: Response = client.get("/empleados?cursor=NO_VALIDO", auth=auth)
+    data = response.json()
+    assert response.status_code == 200
+    assert data["rc"] == -1005
+    assert data["msg"] == "Invalid cursor"
+
+
 def test_get_empleados():
     """Debe regresar Please enter a valid id cuando sea PUT/DELETE"""
 
@@ -191,6 +250,24 @@ def test_update_empleado_ok():
     assert _uuid.UUID(empleado["id"])
 
 
+def test_update_empleado_no_exists_uuid():
+    """Debe regresar Invalid id si el uuid no existe o no es valido"""
+    payload = {
+        "nombre": "Leonardo",
+        "apellidos": "Pineda",
+        "pin": "123123",
+        "activo": None,
+    }
+    for uuid in (str(_uuid.uuid4()), "NO VALIDO"):
+        response: Response = client.put(
+            f"/empleados/{uuid}", json=payload, auth=auth
+        )
+        data = response.json()
+        assert response.status_code == 200
+        assert data["rc"] == -1002
+        assert data["msg"] == "Invalid id"
+
+
 def test_update_empleado_invalid():
     """Debe regresar invalid data cuando faltan datos
 
@@ -278,6 +355,152 @@ def test_update_empleado_activo():
     assert empleado["activo"]
 
 
+# ETag
+def test_get_empleados_etag():
+    """Debe regresar 304 mientras no cambien los empleados del comercio"""
+    response: Response = client.get("/empleados", auth=auth)
+    etag = response.headers["ETag"]
+    empleados = response.json()["data"]
+
+    response = client.get(
+        "/empleados", auth=auth, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.content
+
+    response = client.head("/empleados", auth=auth)
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+    assert response.headers["X-Total-Count"] == str(len(empleados))
+
+    uuid = empleados[0]["id"]
+    response = client.get(
+        f"/empleados/{uuid}", auth=auth, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    # Cualquier escritura cambia el ETag
+    response = client.put(
+        f"/empleados/{uuid}",
+        json={
+            "nombre": "Leonardo",
+            "apellidos": "Pineda",
+            "pin": empleados[0]["pin"],
+            "activo": None,
+        },
+        auth=auth,
+    )
+    assert response.json()["rc"] == 0
+    response = client.get(
+        "/empleados", auth=auth, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["rc"] == 0
+
+
+def test_get_empleados_roster_cache():
+    """Debe responder desde el cache igual que desde la DB e invalidarlo
+    con cada escritura
+    """
+    roster_cache.clear()
+    response: Response = client.get("/empleados", auth=auth)
+    assert roster_cache.get(1) is not None
+    hits = roster_cache.stats()["hits"]
+
+    cached: Response = client.get("/empleados", auth=auth)
+    assert roster_cache.stats()["hits"] == hits + 1
+    assert cached.json() == response.json()
+    assert cached.headers["ETag"] == response.headers["ETag"]
+
+    empleado = response.json()["data"][0]
+    cached = client.get(f"/empleados/{empleado['id']}", auth=auth)
+    assert cached.json() == {"rc": 0, "msg": "Ok", "data": empleado}
+    cached = client.get(f"/empleados/{_uuid.uuid4()}", auth=auth)
+    assert cached.json()["rc"] == -1002
+    cached = client.get("/empleados/invalid-uuid", auth=auth)
+    assert cached.json()["rc"] == -1002
+
+    response = client.put(
+        f"/empleados/{empleado['id']}",
+        json={
+            "nombre": "Cache",
+            "apellidos": "Pineda",
+            "pin": empleado["pin"],
+            "activo": None,
+        },
+        auth=auth,
+    )
+    assert response.json()["rc"] == 0
+    assert roster_cache.get(1) is None
+    response = client.get(f"/empleados/{empleado['id']}", auth=auth)
+    assert response.json()["data"]["nombre_completo"].startswith("Cache ")
+
+
+def _write_from_other_worker(current_pin: str, **values) -> None:
+    """Edita al empleado como otro worker, con su propio engine y sin
+    invalidar los caches de este proceso
+    """
+    other = create_engine(SQLALCHEMY_DATABASE_URL)
+    with other.begin() as connection:
+        connection.execute(
+            update(Empleado)
+            .where(Empleado.comercio_id == 1, Empleado.pin == current_pin)
+            .values(**values)
+        )
+        connection.execute(bump_roster_version(1))
+    other.dispose()
+
+
+def test_roster_cache_other_worker():
+    """Una escritura de otro worker se debe ver en la siguiente peticion,
+    sin esperar a que expire el cache
+    """
+    roster_cache.clear()
+    response: Response = client.get("/empleados", auth=auth)
+    empleado = response.json()["data"][0]
+    etag = response.headers["ETag"]
+    assert client.get("/empleados", auth=auth).headers["ETag"] == etag
+
+    _write_from_other_worker(empleado["pin"], nombre="Otro Worker")
+    response = client.get(
+        "/empleados", headers={"If-None-Match": etag}, auth=auth
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    nombres = {e["id"]: e["nombre_completo"] for e in response.json()["data"]}
+    assert nombres[empleado["id"]].startswith("Otro Worker ")
+
+    _write_from_other_worker(empleado["pin"], nombre="Tercero")
+    response = client.get(f"/empleados/{empleado['id']}", auth=auth)
+    assert response.json()["data"]["nombre_completo"].startswith("Tercero ")
+
+
+def test_write_unknown_empleado(monkeypatch):
+    """Un PUT o DELETE que no cambia ninguna fila no debe invalidar los
+    caches ni mandar las lecturas del comercio al primario
+    """
+    monkeypatch.setattr(_db, "_recent_writes", _db.TTLCache(100, ttl=60))
+    generation = roster_cache.generation(1)
+    unknown = str(_uuid.uuid4())
+    response = client.put(
+        f"/empleados/{unknown}",
+        json={"nombre": "X", "apellidos": "Y", "pin": "990001", "activo": 1},
+        auth=auth,
+    )
+    assert response.json()["rc"] == -1002
+    for uuid in (unknown, "invalid-uuid"):
+        response = client.delete(f"/empleados/{uuid}", auth=auth)
+        assert response.json()["rc"] == -1002
+    response = client.request(
+        "DELETE", "/empleados/bulk", json=[unknown], auth=auth
+    )
+    assert response.json()["data"][0]["rc"] == -1002
+    assert roster_cache.generation(1) == generation
+    assert not _db.wrote_recently(1)
+
+
 # Authentications
 def test_authentication():
     """Debe regresar un codigo 401 cuando no este authenticado
@@ -317,3 +540,250 @@ def test_authentication():
     assert response.status_code == 401
     assert data["rc"] == -401
     assert data["msg"] == "API Key invalida"
+
+
+def test_authentication_cache():
+    """Debe usar el cache de authentication e invalidarlo al editar el
+    comercio
+    """
+    api_key = _uuid.UUID(auth.username)
+    hits = auth_cache.stats()["hits"]
+    response: Response = client.get("/empleados", auth=auth)
+    assert response.json()["rc"] == 0
+    assert auth_cache.stats()["hits"] == hits + 1
+    assert auth_cache.get(api_key).id == 1
+
+    db = TestingSessionLocal()
+    comercio = db.query(Comercio).filter_by(api_key=api_key).first()
+    comercio.telefono_contacto = "5555555555"
+    db.commit()
+    db.close()
+    assert auth_cache.get(api_key, None) is None
+
+
+# POST bulk empleados
+def test_add_empleados_bulk():
+    """Debe crear los empleados y reportar los PIN duplicados por fila"""
+    payload = [
+        {"nombre": "Ana", "apellidos": "Lopez", "pin": "900001"},
+        {"nombre": "Saul", "apellidos": "Pineda", "pin": "000001"},
+        {"nombre": "Luis", "apellidos": "Perez", "pin": "900002"},
+        {"nombre": "Otro", "apellidos": "Perez", "pin": "900002"},
+    ]
+    response: Response = client.post(
+        "/empleados/bulk", json=payload, auth=auth
+    )
+    data = response.json()
+    assert response.status_code == 200
+    assert data["rc"] == 0
+    assert [row["rc"] for row in data["data"]] == [0, -1003, 0, -1003]
+    assert data["data"][1] == {"rc": -1003, "msg": "Duplicated PIN"}
+    assert data["data"][0]["data"]["nombre_completo"] == "Ana Lopez"
+    assert "nombre" not in data["data"][0]["data"]
+
+    created = {e["id"]: e for e in _get_all_empleados()}
+    for row in (data["data"][0], data["data"][2]):
+        assert created[row["data"]["id"]] == row["data"]
+
+
+def _bulk_uuids() -> dict:
+    return {e["pin"]: e["id"] for e in _get_all_empleados()}
+
+
+def test_update_empleados_bulk():
+    """Debe editar solo los campos enviados y reportar errores por fila"""
+    uuids = _bulk_uuids()
+    payload = [
+        {"id": uuids["900001"], "activo": "0"},
+        {"id": uuids["900002"], "activo": "0", "pin": "900003"},
+        {"id": uuids["900001"], "nombre": "Repetido"},
+        {"id": str(_uuid.uuid4()), "activo": "0"},
+        {"id": "invalid-uuid", "activo": "0"},
+        {"id": uuids["000001"], "pin": "900003"},
+    ]
+    response: Response = client.patch(
+        "/empleados/bulk", json=payload, auth=auth
+    )
+    data = response.json()
+    assert response.status_code == 200
+    rcs = [row["rc"] for row in data["data"]]
+    assert rcs == [0, 0, -1002, -1002, -1002, -1003]
+    assert data["data"][2] == {"rc": -1002, "msg": "Invalid id"}
+    assert data["data"][5] == {"rc": -1003, "msg": "Duplicated PIN"}
+    assert data["data"][0]["data"]["nombre_completo"] == "Ana Lopez"
+    assert not data["data"][0]["data"]["activo"]
+    assert data["data"][1]["data"]["pin"] == "900003"
+
+    current = {e["id"]: e for e in _get_all_empleados()}
+    assert not current[uuids["900002"]]["activo"]
+    assert current[uuids["000001"]]["pin"] == "000001"
+
+
+def test_update_empleados_bulk_pin_changes():
+    """Un PIN se libera solo si se acepta el cambio de quien lo tiene, los
+    rechazos no deben afectar al resto de la peticion
+    """
+    payload = [
+        {"nombre": "Pin", "apellidos": pin, "pin": pin}
+        for pin in ("930001", "930002", "930003", "930004", "930005")
+    ]
+    client.post("/empleados/bulk", json=payload, auth=auth)
+    uuids = _bulk_uuids()
+    x, y, z, a, b = (uuids[f"93000{number}"] for number in range(1, 6))
+
+    payload = [
+        # El PIN de Y solo se libera si Y cambia, pero Z conserva 930003
+        {"id": x, "pin": "930002"},
+        {"id": y, "pin": "930003"},
+        {"id": z, "activo": "0"},
+        # Intercambio entre A y B
+        {"id": a, "pin": "930005"},
+        {"id": b, "pin": "930004"},
+    ]
+    response: Response = client.patch(
+        "/empleados/bulk", json=payload, auth=auth
+    )
+    data = response.json()
+    assert data["rc"] == 0
+    assert [row["rc"] for row in data["data"]] == [-1003] * 2 + [0] + [
+        -1003
+    ] * 2
+    assert not data["data"][2]["data"]["activo"]
+
+    # Una cadena en cualquier orden: X toma el PIN de Y y Y uno libre
+    payload = [
+        {"id": x, "pin": "930002"},
+        {"id": y, "pin": "930006"},
+        {"id": a, "pin": "930001"},
+    ]
+    response = client.patch("/empleados/bulk", json=payload, auth=auth)
+    assert [row["rc"] for row in response.json()["data"]] == [0, 0, 0]
+    current = _bulk_uuids()
+    assert [current[pin] for pin in ("930001", "930002", "930006")] == [
+        a,
+        x,
+        y,
+    ]
+    client.request(
+        "DELETE", "/empleados/bulk", json=[x, y, z, a, b], auth=auth
+    )
+
+
+def test_delete_empleados_bulk():
+    """Debe remover los empleados existentes y reportar el resto por fila"""
+    uuids = _bulk_uuids()
+    ids = [uuids["900001"], str(_uuid.uuid4()), uuids["900003"], "invalid"]
+    response: Response = client.request(
+        "DELETE", "/empleados/bulk", json=ids, auth=auth
+    )
+    data = response.json()
+    assert response.status_code == 200
+    assert data["data"] == [
+        {"rc": 0, "msg": "Ok"},
+        {"rc": -1002, "msg": "Invalid id"},
+        {"rc": 0, "msg": "Ok"},
+        {"rc": -1002, "msg": "Invalid id"},
+    ]
+
+    current = _bulk_uuids()
+    assert "900001" not in current
+    assert "900003" not in current
+
+
+def _verify_pin(pin: str) -> dict:
+    response = client.post(
+        "/empleados/verify-pin", json={"pin": pin}, auth=auth
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_verify_pin():
+    """Debe regresar el empleado activo del PIN y seguir las escrituras"""
+    response = _request_add_empleado(
+        {"nombre": "Reloj", "apellidos": "Checador", "pin": "910001"}
+    )
+    empleado = response.json()["data"]
+    data = _verify_pin("910001")
+    assert data == {"rc": 0, "msg": "Ok", "data": empleado}
+    assert _verify_pin("910002")["rc"] == -1006
+
+    client.put(
+        f"/empleados/{empleado['id']}",
+        json={
+            "nombre": "Reloj",
+            "apellidos": "Checador",
+            "pin": "910002",
+            "activo": "0",
+        },
+        auth=auth,
+    )
+    assert _verify_pin("910001")["rc"] == -1006
+    assert _verify_pin("910002") == {"rc": -1007, "msg": "Inactive employee"}
+
+    client.delete(f"/empleados/{empleado['id']}", auth=auth)
+    assert _verify_pin("910002")["rc"] == -1006
+    assert _verify_pin("910001")["rc"] == -1006
+
+
+def test_verify_pin_other_worker():
+    """Desactivar o cambiar el PIN en otro worker se debe ver en la
+    siguiente validacion, sin esperar a que expire el cache
+    """
+    response = _request_add_empleado(
+        {"nombre": "Reloj", "apellidos": "Worker", "pin": "910003"}
+    )
+    uuid = response.json()["data"]["id"]
+    assert _verify_pin("910003")["rc"] == 0
+    assert _verify_pin("910003")["rc"] == 0
+
+    _write_from_other_worker("910003", activo=False)
+    assert _verify_pin("910003")["rc"] == -1007
+    _write_from_other_worker("910003", pin="910004")
+    assert _verify_pin("910003")["rc"] == -1006
+    client.delete(f"/empleados/{uuid}", auth=auth)
+
+
+def test_get_empleados_stats():
+    """Los contadores deben coincidir con los empleados despues de crear,
+    editar y remover
+    """
+    response = _request_add_empleado(
+        {"nombre": "Contador", "apellidos": "Stats", "pin": "920001"}
+    )
+    uuid = response.json()["data"]["id"]
+    client.put(
+        f"/empleados/{uuid}",
+        json={
+            "nombre": "Contador",
+            "apellidos": "Stats",
+            "pin": "920001",
+            "activo": "0",
+        },
+        auth=auth,
+    )
+    client.post(
+        "/empleados/bulk",
+        json=[{"nombre": "Contador", "apellidos": "Bulk", "pin": "920002"}],
+        auth=auth,
+    )
+
+    empleados = _get_all_empleados()
+    activos = sum(1 for empleado in empleados if empleado["activo"])
+    response = client.get("/empleados/stats", auth=auth)
+    assert response.json() == {
+        "rc": 0,
+        "msg": "Ok",
+        "data": {
+            "total": len(empleados),
+            "activos": activos,
+            "inactivos": len(empleados) - activos,
+        },
+    }
+    head = client.head("/empleados", auth=auth)
+    assert head.headers["X-Total-Count"] == str(len(empleados))
+
+    client.delete(f"/empleados/{uuid}", auth=auth)
+    data = client.get("/empleados/stats", auth=auth).json()["data"]
+    assert data["total"] == len(empleados) - 1
+    assert data["inactivos"] == len(empleados) - activos - 1
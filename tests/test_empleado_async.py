@@ -0,0 +1,125 @@
+import uuid as _uuid
+
+from requests import Response
+from requests.auth import HTTPBasicAuth
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.testclient import TestClient
+
+from app.config.db import get_async_db
+from app.main import create_app
+from app.routes.empleado_async import get_empleado as get_empleado_async
+from tests.conftest import SQLALCHEMY_DATABASE_URL
+
+async_engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://")
+)
+TestingAsyncSessionLocal = sessionmaker(
+    bind=async_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+app = create_app(db_async=True)
+app.dependency_overrides[get_async_db] = override_get_async_db
+client = TestClient(app)
+
+auth = HTTPBasicAuth(username="5a25c9f25c334f4197df4d2aafca5fd9", password="")
+
+
+def test_async_routes_replace_sync_routes():
+    """Debe usar las rutas async sin cambiar el orden de las rutas"""
+    sync_app = create_app(db_async=False)
+    assert [route.path for route in app.routes] == [
+        route.path for route in sync_app.routes
+    ]
+    endpoints = [getattr(route, "endpoint", None) for route in app.routes]
+    assert get_empleado_async in endpoints
+
+
+def test_async_crud(comercio):
+    """Debe crear, obtener, editar y remover un empleado en modo async"""
+    cursor = client.get("/empleados/changes", auth=auth).json()["next_cursor"]
+    response: Response = client.post(
+        "/empleados",
+        json={"nombre": "Async", "apellidos": "Test", "pin": "700001"},
+        auth=auth,
+    )
+    data = response.json()
+    assert data["rc"] == 0
+    assert data["data"]["nombre_completo"] == "Async Test"
+    uuid = data["data"]["id"]
+
+    response = client.post(
+        "/empleados",
+        json={"nombre": "Async", "apellidos": "Test", "pin": "700001"},
+        auth=auth,
+    )
+    assert response.json()["rc"] == -1003
+
+    response = client.get(f"/empleados/{uuid}", auth=auth)
+    assert response.json()["data"]["id"] == uuid
+
+    response = client.post(
+        "/empleados/verify-pin", json={"pin": "700001"}, auth=auth
+    )
+    assert response.json()["data"]["id"] == uuid
+
+    response = client.get("/empleados/stats", auth=auth)
+    data = response.json()["data"]
+    assert data["total"] == data["activos"] + data["inactivos"] >= 1
+
+    response = client.put(
+        f"/empleados/{uuid}",
+        json={
+            "nombre": "Async",
+            "apellidos": "Editado",
+            "pin": "700001",
+            "activo": "0",
+        },
+        auth=auth,
+    )
+    data = response.json()
+    assert data["rc"] == 0
+    assert data["data"]["nombre_completo"] == "Async Editado"
+    assert not data["data"]["activo"]
+
+    response = client.get("/empleados", auth=auth)
+    assert uuid in [empleado["id"] for empleado in response.json()["data"]]
+
+    response = client.get(
+        "/empleados", params={"activo": "false", "q": "async edit"}, auth=auth
+    )
+    assert [empleado["id"] for empleado in response.json()["data"]] == [uuid]
+
+    response = client.get(
+        "/empleados/changes", params={"since": cursor}, auth=auth
+    )
+    assert [e["id"] for e in response.json()["data"]["empleados"]] == [uuid]
+
+    response = client.delete(f"/empleados/{uuid}", auth=auth)
+    assert response.json()["rc"] == 0
+    response = client.delete(f"/empleados/{uuid}", auth=auth)
+    assert response.json()["rc"] == -1002
+
+    response = client.get(
+        "/empleados/changes", params={"since": cursor}, auth=auth
+    )
+    assert response.json()["data"] == {"empleados": [], "deleted": [uuid]}
+
+
+def test_async_errors():
+    """Debe regresar los mismos errores que las rutas sync"""
+    response: Response = client.get("/empleados/NO VALIDO", auth=auth)
+    assert response.json() == {"rc": -1002, "msg": "Invalid id"}
+
+    response = client.get(f"/empleados/{_uuid.uuid4()}", auth=auth)
+    assert response.json() == {"rc": -1002, "msg": "Invalid id"}
+
+    response = client.get("/empleados")
+    assert response.status_code == 401
+    assert response.json()["rc"] == -401
@@ -0,0 +1,58 @@
+import shutil
+
+from sqlalchemy import create_engine, create_mock_engine
+
+from app.cli import __main__ as cli
+from app.config import indexes
+from app.config.indexes import apply_indexes, check_query_plans
+from tests.conftest import engine
+
+
+def test_query_plans_use_indexes():
+    """Ninguna consulta frecuente debe recorrer toda la tabla"""
+    assert check_query_plans(engine) == {}
+
+
+def test_apply_indexes_legacy_db(tmp_path):
+    """Debe crear los indices faltantes en la DB original una sola vez"""
+    db_path = tmp_path / "db.sqlite3"
+    shutil.copy("db.sqlite3", db_path)
+    legacy_engine = create_engine(f"sqlite:///{db_path}")
+
+    assert "get_auth" in check_query_plans(legacy_engine)
+    with legacy_engine.begin() as connection:
+        assert apply_indexes(connection) == [
+            "main_comercio_api_key_uniq",
+            "main_empleado_comercio_id_activo_idx",
+            "main_empleado_comercio_id_uuid_idx",
+        ]
+        assert apply_indexes(connection) == []
+    assert check_query_plans(legacy_engine) == {}
+
+
+def test_check_query_plans_postgresql(monkeypatch):
+    """En PostgreSQL un Seq Scan en cualquier nivel del plan es un error"""
+    plans = {
+        "get_auth": [
+            "Limit  (cost=0.15..8.17 rows=1 width=4)",
+            "->  Index Scan using main_comercio_api_key_uniq on main_comercio",
+        ],
+        "get_empleados": [
+            "Sort  (cost=10.46..10.47 rows=3 width=1100)",
+            "->  Seq Scan on main_empleado  (cost=0.00..10.44 rows=3)",
+        ],
+    }
+    monkeypatch.setattr(indexes, "explain_query_plans", lambda _: plans)
+    postgresql = create_mock_engine("postgresql://", None)
+    assert list(check_query_plans(postgresql)) == ["get_empleados"]
+
+
+def test_explain_unsupported_backend(monkeypatch, capsys):
+    """El comando debe terminar con un mensaje y no con un traceback"""
+    monkeypatch.setattr(
+        cli, "get_engine", lambda: create_mock_engine("mssql://", None)
+    )
+    assert cli.main(["explain"]) == 2
+    assert "Solo se soporta EXPLAIN en postgresql, sqlite" in (
+        capsys.readouterr().out
+    )
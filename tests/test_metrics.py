@@ -0,0 +1,48 @@
+from requests.auth import HTTPBasicAuth
+from starlette.testclient import TestClient
+
+from app.config.metrics import Counter, Histogram, Registry, http_requests
+from app.main import app
+
+client = TestClient(app)
+
+auth = HTTPBasicAuth(username="5a25c9f25c334f4197df4d2aafca5fd9", password="")
+
+
+def test_render_text_format():
+    """Debe generar contadores e histogramas acumulados"""
+    registry = Registry()
+    counter = registry.register(Counter("test_total", "Ayuda", ("rc",)))
+    histogram = registry.register(
+        Histogram("test_seconds", "Ayuda", buckets=(0.1, 1))
+    )
+    counter.inc("-1002")
+    counter.inc("-1002")
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE test_total counter" in lines
+    assert 'test_total{rc="-1002"} 2' in lines
+    assert 'test_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{le="1"} 2' in lines
+    assert 'test_seconds_bucket{le="+Inf"} 2' in lines
+    assert "test_seconds_count 2" in lines
+
+
+def test_metrics_endpoint(comercio):
+    """Debe medir las peticiones por ruta y los errores por rc"""
+    route = ("GET", "/empleados/{uuid}", "200")
+    requests = http_requests.value(*route)
+    response = client.get("/empleados/invalid-uuid", auth=auth)
+    assert response.json()["rc"] == -1002
+    assert http_requests.value(*route) == requests + 1
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'dapp_errors_total{rc="-1002"}' in response.text
+    assert (
+        'dapp_http_request_duration_seconds_count{method="GET",'
+        'route="/empleados/{uuid}"}' in response.text
+    )
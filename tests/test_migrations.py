@@ -0,0 +1,55 @@
+import os
+import shutil
+import subprocess
+import sys
+
+from sqlalchemy import create_engine, inspect
+
+from app.config.indexes import check_query_plans
+from app.config.migrations import MIGRATIONS, applied_versions, migrate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_migrate_new_db(tmp_path):
+    """Debe crear el esquema completo y no repetir migraciones"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite3'}")
+    assert migrate(engine) == MIGRATIONS
+    assert migrate(engine) == []
+
+    tables = inspect(engine).get_table_names()
+    assert {"main_comercio", "main_empleado"} <= set(tables)
+    with engine.connect() as connection:
+        assert applied_versions(connection) == [m.version for m in MIGRATIONS]
+
+
+def test_migrate_legacy_db(tmp_path):
+    """Debe actualizar la DB original sin perder datos"""
+    db_path = tmp_path / "db.sqlite3"
+    shutil.copy(os.path.join(ROOT, "db.sqlite3"), db_path)
+    engine = create_engine(f"sqlite:///{db_path}")
+    with engine.connect() as connection:
+        count = connection.exec_driver_sql(
+            "SELECT COUNT(*) FROM main_empleado"
+        ).scalar()
+
+    assert migrate(engine) == MIGRATIONS
+    assert check_query_plans(engine) == {}
+    with engine.connect() as connection:
+        assert (
+            connection.exec_driver_sql(
+                "SELECT COUNT(*) FROM main_empleado"
+            ).scalar()
+            == count
+        )
+
+
+def test_import_without_ddl(tmp_path):
+    """Importar la aplicacion no debe crear ni tocar la base de datos"""
+    subprocess.run(
+        [sys.executable, "-c", "import app.main"],
+        cwd=tmp_path,
+        env={**os.environ, "PYTHONPATH": ROOT},
+        check=True,
+    )
+    assert not (tmp_path / "db.sqlite3").exists()
@@ -0,0 +1,230 @@
+"""Numero maximo de sentencias SQL por ruta
+
+Los caches del proceso se limpian antes de cada prueba, por lo que cada
+ruta incluye la consulta de ``get_auth`` salvo que se indique lo contrario.
+"""
+import itertools
+from typing import List
+
+import pytest
+from requests.auth import HTTPBasicAuth
+from starlette.testclient import TestClient
+
+from app.config.authentication import auth_cache
+from app.config.pin_cache import pin_cache
+from app.config.roster_cache import roster_cache
+from app.main import app
+
+client = TestClient(app)
+
+auth = HTTPBasicAuth(username="5a25c9f25c334f4197df4d2aafca5fd9", password="")
+
+
+@pytest.fixture(autouse=True)
+def cold_caches(comercio):
+    auth_cache.clear()
+    roster_cache.clear()
+    pin_cache.clear()
+
+
+# PIN unicos en la sesion de pruebas, fuera de los que usan otros modulos
+_pins = itertools.count(600000)
+
+
+def _next_pin() -> str:
+    return f"{next(_pins):06}"
+
+
+def _create_empleados(count: int) -> List[dict]:
+    pins = [_next_pin() for _ in range(count)]
+    payload = [
+        {"nombre": "Presupuesto", "apellidos": pin, "pin": pin} for pin in pins
+    ]
+    response = client.post("/empleados/bulk", json=payload, auth=auth)
+    rows = response.json()["data"]
+    assert all(row["rc"] == 0 for row in rows), rows
+    return [row["data"] for row in rows]
+
+
+def test_need_id(query_budget):
+    with query_budget(0):
+        client.put("/empleados", auth=auth)
+        client.delete("/empleados", auth=auth)
+
+
+def test_metrics(query_budget):
+    with query_budget(0):
+        client.get("/metrics")
+
+
+@pytest.mark.parametrize(
+    "params,headers",
+    [
+        ({}, {}),
+        ({"limit": 10}, {}),
+        ({"stream": 1}, {}),
+        ({}, {"Accept": "application/x-ndjson"}),
+    ],
+)
+def test_get_empleados(query_budget, params, headers):
+    """auth, version y empleados sin importar cuantos empleados hay"""
+    _create_empleados(1)
+    with query_budget(3) as small:
+        client.get("/empleados", params=params, headers=headers, auth=auth)
+
+    _create_empleados(50)
+    roster_cache.clear()
+    with query_budget(3) as large:
+        client.get("/empleados", params=params, headers=headers, auth=auth)
+    assert len(large) == len(small)
+
+
+def test_get_empleados_cached(query_budget):
+    """Con los caches llenos el listado y un empleado solo leen la version
+    para ver las escrituras de otros workers
+    """
+    empleados = client.get("/empleados", auth=auth).json()["data"]
+    with query_budget(1):
+        client.get("/empleados", auth=auth)
+    with query_budget(1):
+        client.get(f"/empleados/{empleados[0]['id']}", auth=auth)
+
+
+def test_get_empleados_changes(query_budget):
+    """auth, secuencia del comercio, cambios y borrados sin importar
+    cuantos empleados hay; sin cambios solo la secuencia
+    """
+    cursor = client.get("/empleados/changes", auth=auth).json()["next_cursor"]
+    _create_empleados(50)
+    empleado = _create_empleados(1)[0]
+    client.delete(f"/empleados/{empleado['id']}", auth=auth)
+    auth_cache.clear()
+    with query_budget(4):
+        response = client.get(
+            "/empleados/changes", params={"since": cursor}, auth=auth
+        )
+    data = response.json()
+    assert len(data["data"]["empleados"]) == 50
+    assert data["data"]["deleted"] == [empleado["id"]]
+    with query_budget(1):
+        client.get(
+            "/empleados/changes",
+            params={"since": data["next_cursor"]},
+            auth=auth,
+        )
+
+
+def test_get_empleados_stats(query_budget):
+    """auth y contadores del comercio sin importar cuantos empleados hay"""
+    with query_budget(2):
+        client.get("/empleados/stats", auth=auth)
+
+
+def test_verify_pin(query_budget):
+    """auth, version y el empleado por PIN, despues solo la version"""
+    empleado = _create_empleados(1)[0]
+    auth_cache.clear()
+    with query_budget(3):
+        client.post(
+            "/empleados/verify-pin", json={"pin": empleado["pin"]}, auth=auth
+        )
+    with query_budget(1):
+        client.post(
+            "/empleados/verify-pin", json={"pin": empleado["pin"]}, auth=auth
+        )
+
+
+def test_get_empleados_not_modified(query_budget):
+    """auth y version"""
+    etag = client.get("/empleados", params={"limit": 1}, auth=auth).headers[
+        "ETag"
+    ]
+    auth_cache.clear()
+    with query_budget(2):
+        response = client.get(
+            "/empleados",
+            params={"limit": 1},
+            headers={"If-None-Match": etag},
+            auth=auth,
+        )
+    assert response.status_code == 304
+
+
+def test_head_empleados(query_budget):
+    """auth y version con el total en una sola consulta"""
+    with query_budget(2):
+        client.head("/empleados", auth=auth)
+
+
+def test_get_empleado(query_budget):
+    """auth, version y empleado"""
+    empleado = _create_empleados(1)[0]
+    with query_budget(3):
+        client.get(f"/empleados/{empleado['id']}", auth=auth)
+
+
+def test_create_empleado(query_budget):
+    """auth, insert y version"""
+    pin = _next_pin()
+    with query_budget(3):
+        client.post(
+            "/empleados",
+            json={"nombre": "Presupuesto", "apellidos": pin, "pin": pin},
+            auth=auth,
+        )
+
+
+def test_create_empleados_bulk(query_budget):
+    """auth, PIN existentes, un insert por lote y version"""
+    with query_budget(4):
+        _create_empleados(50)
+
+
+def test_update_empleado(query_budget):
+    """auth, UPDATE ... RETURNING (SQLite 3.35+) y version"""
+    empleado = _create_empleados(1)[0]
+    auth_cache.clear()
+    with query_budget(3) as statements:
+        response = client.put(
+            f"/empleados/{empleado['id']}",
+            json={
+                "nombre": "Editado",
+                "apellidos": "Presupuesto",
+                "pin": empleado["pin"],
+                "activo": "0",
+            },
+            auth=auth,
+        )
+    assert "RETURNING" in statements[1]
+    assert response.json()["data"] == {
+        **empleado,
+        "nombre_completo": "Editado Presupuesto",
+        "activo": False,
+    }
+
+
+def test_update_empleados_bulk(query_budget):
+    """auth, empleados existentes, un update por grupo de cambios, version
+    y lectura de las filas editadas
+    """
+    empleados = _create_empleados(50)
+    auth_cache.clear()
+    payload = [{"id": empleado["id"], "activo": "0"} for empleado in empleados]
+    with query_budget(5):
+        client.patch("/empleados/bulk", json=payload, auth=auth)
+
+
+def test_delete_empleado(query_budget):
+    """auth, delete y version"""
+    empleado = _create_empleados(1)[0]
+    auth_cache.clear()
+    with query_budget(3):
+        client.delete(f"/empleados/{empleado['id']}", auth=auth)
+
+
+def test_delete_empleados_bulk(query_budget):
+    """auth, empleados existentes, delete y version"""
+    ids = [empleado["id"] for empleado in _create_empleados(50)]
+    auth_cache.clear()
+    with query_budget(4):
+        client.request("DELETE", "/empleados/bulk", json=ids, auth=auth)
@@ -0,0 +1,76 @@
+import pytest
+from requests.auth import HTTPBasicAuth
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from starlette.testclient import TestClient
+
+from app.config import db as _db
+from app.config.authentication import auth_cache
+from app.config.roster_cache import roster_cache
+from app.config.settings import settings
+from app.main import app
+
+client = TestClient(app)
+
+auth = HTTPBasicAuth(username="5a25c9f25c334f4197df4d2aafca5fd9", password="")
+
+REPLICA_URL = "sqlite:///file:db_test.sqlite3?mode=ro&uri=true"
+
+
+@pytest.fixture
+def replica(comercio, monkeypatch):
+    """Configura la DB de pruebas en modo solo lectura como replica y
+    regresa las sentencias que se ejecutan en ella
+    """
+    monkeypatch.setattr(settings, "database_replica_urls", [REPLICA_URL])
+    monkeypatch.setattr(_db, "_recent_writes", _db.TTLCache(100, ttl=60))
+    _db.get_replica_engines.cache_clear()
+    auth_cache.clear()
+    roster_cache.clear()
+
+    statements = []
+    engine = _db.get_replica_engines()[0]
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(engine, "before_cursor_execute", count)
+    engine.dispose()
+    _db.get_replica_engines.cache_clear()
+
+
+def test_replica_is_read_only(replica):
+    with _db.get_replica_engines()[0].connect() as connection:
+        with pytest.raises(OperationalError, match="readonly"):
+            connection.execute(text("DELETE FROM main_empleado"))
+
+
+def test_read_routes_use_replica(replica):
+    """Las lecturas deben ir a la replica y, despues de que el comercio
+    escribe, al primario durante ``db_read_your_writes`` segundos
+    """
+    response = client.get("/empleados/stats", auth=auth)
+    assert response.json()["rc"] == 0
+    # get_auth y los contadores
+    assert len(replica) == 2
+
+    response = client.post(
+        "/empleados",
+        json={"nombre": "Replica", "apellidos": "Test", "pin": "930001"},
+        auth=auth,
+    )
+    assert response.json()["rc"] == 0
+    # La escritura usa el primario, get_auth ya esta en cache
+    assert len(replica) == 2
+
+    response = client.post(
+        "/empleados/verify-pin", json={"pin": "930001"}, auth=auth
+    )
+    assert response.json()["rc"] == 0
+    assert len(replica) == 2
+
+    _db._recent_writes.clear()
+    client.get("/empleados/stats", auth=auth)
+    assert len(replica) == 3
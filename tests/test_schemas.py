@@ -0,0 +1,45 @@
+import datetime as _dt
+import json
+import uuid as _uuid
+
+from app.main import app
+from app.models.empleado import Empleado
+from app.schemas.empleado import (
+    EmpleadoResponse,
+    EmpleadoSchema,
+    serialize_empleado,
+)
+
+
+def test_serialize_empleado():
+    """Debe regresar lo mismo que EmpleadoResponse con el exclude"""
+    empleado = Empleado(
+        uuid=_uuid.uuid4(),
+        nombre="Saul",
+        apellidos="Pineda",
+        pin="000001",
+        fecha_creacion=_dt.datetime(2021, 7, 23, 22, 5, 8, 585083),
+        activo=False,
+    )
+    response = EmpleadoResponse(data=EmpleadoSchema.from_orm(empleado))
+    expected = json.loads(
+        response.json(exclude={"data": {"nombre", "apellidos", "uuid"}})
+    )
+
+    assert serialize_empleado(empleado) == expected["data"]
+    assert expected["data"]["fecha_creacion"] == "2021-07-23T22:05:08.585083Z"
+
+
+def test_openapi_response_models():
+    """Las rutas de lectura deben seguir documentando sus response_model"""
+    paths = app.openapi()["paths"]
+    responses = {
+        "/empleados": paths["/empleados"]["get"]["responses"],
+        "/empleados/{uuid}": paths["/empleados/{uuid}"]["get"]["responses"],
+    }
+    schema = responses["/empleados"]["200"]["content"]["application/json"]
+    assert schema["schema"]["$ref"].endswith("/EmpleadosResponse")
+    schema = responses["/empleados/{uuid}"]["200"]["content"]
+    assert schema["application/json"]["schema"]["$ref"].endswith(
+        "/EmpleadoResponse"
+    )
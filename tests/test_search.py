@@ -0,0 +1,177 @@
+import datetime as _dt
+import uuid as _uuid
+from typing import Dict, List
+
+from requests.auth import HTTPBasicAuth
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import postgresql
+from starlette.testclient import TestClient
+
+from app.crud.empleado import search_conditions, select_empleados
+from app.main import app
+from app.models.comercio import Comercio
+from app.models.empleado import Empleado
+from tests.conftest import engine
+
+client = TestClient(app)
+
+auth = HTTPBasicAuth(username="5a25c9f25c334f4197df4d2aafca5fd9", password="")
+
+EMPLEADOS = {
+    "800001": {"nombre": "Ana María", "apellidos": "Lopez Perez"},
+    "800002": {"nombre": "Anabel", "apellidos": "Lopera"},
+    "800003": {"nombre": "Bruno", "apellidos": "Alvarez"},
+}
+
+
+def _search(**params) -> List[str]:
+    """Pines de los empleados de este modulo que regresa la busqueda"""
+    response = client.get("/empleados", params=params, auth=auth)
+    assert response.status_code == 200
+    return sorted(
+        e["pin"] for e in response.json()["data"] if e["pin"] in EMPLEADOS
+    )
+
+
+def _uuids() -> Dict[str, str]:
+    data = client.get("/empleados", auth=auth).json()["data"]
+    return {e["pin"]: e["id"] for e in data}
+
+
+def test_search_empleados(comercio):
+    """Debe filtrar por activo, prefijos de nombre/apellidos y texto"""
+    for pin, empleado in EMPLEADOS.items():
+        response = client.post(
+            "/empleados", json={**empleado, "pin": pin}, auth=auth
+        )
+        assert response.json()["rc"] == 0
+    client.patch(
+        "/empleados/bulk",
+        json=[{"id": _uuids()["800003"], "activo": "0"}],
+        auth=auth,
+    )
+
+    assert _search(nombre="ANA") == ["800001", "800002"]
+    assert _search(nombre="anab") == ["800002"]
+    assert _search(apellidos="lop") == ["800001", "800002"]
+    assert _search(activo="false") == ["800003"]
+    assert _search(activo="true", nombre="bru") == []
+    # Cada palabra es prefijo de una palabra, sin importar acentos
+    assert _search(q="lopez an") == ["800001"]
+    assert _search(q="maria perez") == ["800001"]
+    assert _search(q="lop") == ["800001", "800002"]
+    assert _search(q="%") == _search()
+
+
+def test_search_empleados_paginated():
+    """Los filtros se deben combinar con la paginacion"""
+    first = client.get(
+        "/empleados", params={"nombre": "ana", "limit": 1}, auth=auth
+    ).json()
+    assert [e["pin"] for e in first["data"]] == ["800001"]
+    second = client.get(
+        "/empleados",
+        params={"nombre": "ana", "limit": 1, "cursor": first["next_cursor"]},
+        auth=auth,
+    ).json()
+    assert [e["pin"] for e in second["data"]] == ["800002"]
+    assert second["next_cursor"] is None
+
+
+def test_search_empleados_after_write():
+    """El indice de texto debe seguir las ediciones y eliminaciones"""
+    uuids = _uuids()
+    client.patch(
+        "/empleados/bulk",
+        json=[{"id": uuids["800002"], "nombre": "Beatriz"}],
+        auth=auth,
+    )
+    assert _search(q="anabel") == []
+    assert _search(q="beatriz") == ["800002"]
+
+    client.delete(f"/empleados/{uuids['800003']}", auth=auth)
+    assert _search(q="bruno") == []
+
+
+def test_search_by_comercio():
+    """El MATCH de FTS5 solo debe regresar empleados del comercio"""
+    now = _dt.datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Comercio.__table__).values(
+                id=2,
+                uuid=_uuid.uuid4(),
+                nombre="Comercio 2",
+                activo=True,
+                api_key=_uuid.uuid4(),
+                fecha_creacion=now,
+            )
+        )
+        connection.execute(
+            insert(Empleado.__table__).values(
+                uuid=_uuid.uuid4(),
+                nombre="Ana",
+                apellidos="Otro Comercio",
+                pin="800001",
+                fecha_creacion=now,
+                activo=True,
+                comercio_id=2,
+            )
+        )
+    try:
+        with engine.connect() as connection:
+            for comercio_id, q, expected in (
+                (1, "ana", {1}),
+                (2, "ana", {2}),
+                (2, "comercio", {2}),
+                # El comercio_id no se busca como texto
+                (2, "2", set()),
+            ):
+                (condition,) = search_conditions("sqlite", comercio_id, q=q)
+                found = connection.execute(
+                    select(Empleado.comercio_id).where(condition).distinct()
+                )
+                assert set(found.scalars()) == expected, q
+        assert _search(q="comercio") == []
+    finally:
+        with engine.begin() as connection:
+            connection.execute(delete(Empleado).filter_by(comercio_id=2))
+            connection.execute(delete(Comercio).filter_by(id=2))
+
+
+def test_search_postgresql():
+    """En PostgreSQL se deben usar to_tsquery y LIKE sobre lower()"""
+    conditions = search_conditions(
+        "postgresql", 1, nombre="a_b", q="ana lopez"
+    )
+    statement = select_empleados(1, conditions=conditions)
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "lower(main_empleado.nombre) LIKE" in sql
+    assert "to_tsvector('simple'," in sql
+    assert "@@ to_tsquery(" in sql
+    params = statement.compile(dialect=postgresql.dialect()).params
+    assert "a\\_b%" in params.values()
+    assert "ana:* & lopez:*" in params.values()
+
+
+def test_search_query_plans():
+    """Los prefijos y el texto deben usar sus indices en SQLite"""
+    for filters, index in (
+        ({"nombre": "a"}, "main_empleado_comercio_id_nombre_idx"),
+        ({"apellidos": "a"}, "main_empleado_comercio_id_apellidos_idx"),
+        ({"q": "a"}, "main_empleado_fts VIRTUAL TABLE INDEX"),
+    ):
+        conditions = search_conditions("sqlite", 1, **filters)
+        compiled = select_empleados(1, conditions=conditions).compile(
+            dialect=engine.dialect
+        )
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        with engine.connect() as connection:
+            plan = connection.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {compiled}", params
+            )
+            steps = [row[-1] for row in plan]
+        assert any(index in step for step in steps), steps
+        assert not any(
+            step.startswith("SCAN main_empleado ") for step in steps
+        )
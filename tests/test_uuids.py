@@ -0,0 +1,213 @@
+import datetime as _dt
+import uuid as _uuid
+
+import pytest
+from requests.auth import HTTPBasicAuth
+from sqlalchemy import create_engine, func, insert, select
+from starlette.testclient import TestClient
+
+from app.cli import __main__ as cli
+from app.cli import roster, uuids
+from app.config.authentication import auth_cache
+from app.config.migrations import migrate
+from app.config.pin_cache import pin_cache
+from app.config.roster_cache import roster_cache
+from app.config.settings import settings
+from app.main import app
+from app.models.comercio import Comercio
+from app.models.empleado import Empleado
+from tests.conftest import engine as test_engine
+
+client = TestClient(app)
+
+auth = HTTPBasicAuth(username="5a25c9f25c334f4197df4d2aafca5fd9", password="")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite3'}")
+    migrate(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Comercio.__table__).values(
+                id=1,
+                uuid=_uuid.uuid4(),
+                nombre="Comercio 1",
+                activo=True,
+                api_key=_uuid.uuid4(),
+                fecha_creacion=_dt.datetime.utcnow(),
+            )
+        )
+        connection.execute(
+            insert(Empleado.__table__),
+            [
+                {
+                    "uuid": _uuid.uuid4(),
+                    "nombre": "Empleado",
+                    "apellidos": str(number),
+                    "pin": f"{number:06}",
+                    "fecha_creacion": _dt.datetime.utcnow(),
+                    "activo": True,
+                    "comercio_id": 1,
+                }
+                for number in range(5)
+            ],
+        )
+    return engine
+
+
+@pytest.fixture
+def uuid_storage(monkeypatch):
+    """Cambia el formato de los uuid y al terminar regresa
+    la DB de pruebas a texto
+    """
+
+    def configure(binary: bool, mixed: bool):
+        monkeypatch.setattr(settings, "uuid_binary", binary)
+        monkeypatch.setattr(settings, "uuid_mixed", mixed)
+        auth_cache.clear()
+        roster_cache.clear()
+        pin_cache.clear()
+
+    yield configure
+    for uuid_column in uuids.UUID_COLUMNS:
+        uuids.convert_column(test_engine, uuid_column, binary=False)
+    auth_cache.clear()
+    roster_cache.clear()
+
+
+class Interrupt(Exception):
+    pass
+
+
+class InterruptedProgress(roster.Progress):
+    def add(self, rows: int = 1):
+        super().add(rows)
+        raise Interrupt()
+
+
+def _stored(engine, uuid_column) -> list:
+    raw = uuids._raw_table(uuid_column)
+    with engine.connect() as connection:
+        return connection.execute(
+            select(raw.c[uuid_column.name]).order_by(raw.c.id)
+        ).all()
+
+
+def test_convert_column(engine):
+    """Debe convertir por lotes, continuar despues de una interrupcion y
+    regresar exactamente a los valores originales
+    """
+    column = Empleado.__table__.c.uuid
+    original = _stored(engine, column)
+    with engine.connect() as connection:
+        ids = (
+            connection.execute(select(Empleado.uuid).order_by(Empleado.id))
+            .scalars()
+            .all()
+        )
+        assert uuids.count_pending(connection, column, binary=True) == 5
+
+    with pytest.raises(Interrupt):
+        uuids.convert_column(
+            engine,
+            column,
+            binary=True,
+            batch_size=2,
+            progress=InterruptedProgress("Convertidos", 0),
+        )
+    with engine.connect() as connection:
+        assert uuids.count_pending(connection, column, binary=True) == 3
+        # Se leen las filas de los dos formatos
+        assert connection.execute(
+            select(Empleado.uuid).order_by(Empleado.id)
+        ).scalars().all() == (ids)
+
+    assert uuids.convert_column(engine, column, True, batch_size=2) == 3
+    assert uuids.convert_column(engine, column, True, batch_size=2) == 0
+    with engine.connect() as connection:
+        assert connection.execute(
+            select(func.typeof(Empleado.uuid)).distinct()
+        ).scalars().all() == ["blob"]
+        assert connection.execute(
+            select(Empleado.uuid).order_by(Empleado.id)
+        ).scalars().all() == (ids)
+
+    assert uuids.convert_column(engine, column, binary=False) == 5
+    assert _stored(engine, column) == original
+
+
+def test_uuid_migrate_requires_mixed(engine, monkeypatch, capsys):
+    """Sin DAPP_UUID_MIXED el comando no debe convertir nada"""
+    monkeypatch.setattr(cli, "get_engine", lambda: engine)
+    monkeypatch.setattr(settings, "uuid_binary", True)
+    monkeypatch.setattr(settings, "uuid_mixed", False)
+    column = Empleado.__table__.c.uuid
+    assert cli.main(["uuid-migrate", "--to", "binary"]) == 1
+    assert "DAPP_UUID_MIXED=1" in capsys.readouterr().err
+    with engine.connect() as connection:
+        assert uuids.count_pending(connection, column, binary=True) == 5
+
+    monkeypatch.setattr(settings, "uuid_mixed", True)
+    assert cli.main(["uuid-migrate", "--to", "binary"]) == 0
+    with engine.connect() as connection:
+        assert uuids.count_pending(connection, column, binary=True) == 0
+
+
+def test_mixed_storage_api(comercio, uuid_storage):
+    """La API debe responder igual durante y despues de la migracion"""
+    uuid_storage(binary=True, mixed=True)
+    response = client.post(
+        "/empleados",
+        json={"nombre": "Binario", "apellidos": "Test", "pin": "940001"},
+        auth=auth,
+    )
+    data = response.json()["data"]
+    uuid = data["id"]
+    assert _uuid.UUID(uuid).hex != uuid
+
+    with test_engine.connect() as connection:
+        assert (
+            connection.execute(
+                select(func.typeof(Empleado.uuid)).filter_by(pin="940001")
+            ).scalar()
+            == "blob"
+        )
+        # El comercio se creo como texto
+        assert uuids.count_pending(
+            connection, Comercio.__table__.c.api_key, binary=True
+        )
+    assert client.get(f"/empleados/{uuid}", auth=auth).json()["data"] == data
+
+    for uuid_column in uuids.UUID_COLUMNS:
+        uuids.convert_column(test_engine, uuid_column, binary=True)
+    uuid_storage(binary=True, mixed=False)
+
+    assert client.get(f"/empleados/{uuid}", auth=auth).json()["data"] == data
+    response = client.get("/empleados", auth=auth)
+    assert uuid in [empleado["id"] for empleado in response.json()["data"]]
+    response = client.post(
+        "/empleados/verify-pin", json={"pin": "940001"}, auth=auth
+    )
+    assert response.json()["data"]["id"] == uuid
+    response = client.get(f"/empleados/{_uuid.UUID(uuid).hex}", auth=auth)
+    assert response.json()["data"]["id"] == uuid
+
+    response = client.put(
+        f"/empleados/{uuid}",
+        json={
+            "nombre": "Binario",
+            "apellidos": "Editado",
+            "pin": "940001",
+            "activo": "1",
+        },
+        auth=auth,
+    )
+    assert response.json()["data"] == {
+        **data,
+        "nombre_completo": "Binario Editado",
+    }
+
+    response = client.get("/empleados/NO VALIDO", auth=auth)
+    assert response.json() == {"rc": -1002, "msg": "Invalid id"}
+    assert client.delete(f"/empleados/{uuid}", auth=auth).json()["rc"] == 0